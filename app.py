@@ -1,19 +1,109 @@
 import os
+import copy
+import hashlib
+import json
 import logging
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+import multiprocessing
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from flask import (Flask, Blueprint, Response, current_app, make_response, render_template, request, redirect,
+                   url_for, flash, session, jsonify)
 from werkzeug.middleware.proxy_fix import ProxyFix
-from models import Teacher, Subject, Section
-from generator import generate_timetable
-from exporter import format_timetable_for_web
-from conflicts import detect_teacher_conflicts, get_conflict_summary, suggest_conflict_resolution, apply_conflict_resolution
+from models import Subject, Section, WeekConfig
+from serialization import (build_teacher, build_rooms, assignment_teacher_names, build_sections_from_config,
+                           restore_sections, grid_names, count_unchanged_cells, serialize_sections,
+                           find_affected_sections, section_teacher_names, teacher_grid)
+from cache import ResultCache, MemoCache
+from storage import TimetableStore
+from assets import AssetPipeline
+from compression import Compressor, matching_etag
+from collab import EditRooms, StaleEdit
+from journal import JournalStore
+from editing import find_block, move_block, swap_blocks
+from workspaces import Workspace, WorkspaceRegistry, WorkspaceSessionInterface, enter_workspace, leave_workspace, SHARED_KEYS
+from jobs import FairScheduler, QueueFull
+from config import PROFILES, DEFAULT_PROFILE
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Modules only some requests need (generation, conflict checks, rendering grids) are
+# imported where they are used, so a worker starts without them; see preload()
+LAZY_MODULES = ('generator', 'exporter', 'conflicts', 'assignment', 'diff')
+
+bp = Blueprint('main', __name__)
+SAVED_PER_PAGE = 12
+
+
+class Services:
+    """Storage, caches and queues of one app, shared by all its requests"""
+    def __init__(self, app):
+        config = app.config
+
+        def instance_dir(key, name):
+            return config[key] or os.path.join(app.instance_path, name)
+
+        # Bundled, fingerprinted CSS/JS served with long-lived cache headers
+        self.assets = AssetPipeline(app.static_folder).init_app(app)
+        # gzip/brotli for large pages and JSON
+        self.compressor = Compressor(config['COMPRESS_MIN_SIZE']).init_app(app)
+
+        # Best generated solution per problem fingerprint, shared by users without a workspace (workspaces have their own)
+        result_cache = ResultCache(instance_dir('TIMETABLE_CACHE_DIR', 'generation_cache'), config['TIMETABLE_CACHE_SIZE'])
+        # Saved timetables live on the server (the session only carries the store id) so listing stays cheap
+        timetable_store = TimetableStore(instance_dir('TIMETABLE_STORE_DIR', 'saved_timetables'))
+        # Undo/redo journals of working timetables, one per user (store id) or shared edit session
+        edit_journals = JournalStore(instance_dir('TIMETABLE_JOURNAL_DIR', 'edit_journals'))
+        # Storage and caches of users who have not joined a workspace
+        self.personal_space = Workspace(None, 'Personal', timetable_store, result_cache, edit_journals)
+
+        # Shared edit sessions live in this process, so run one worker process with several threads
+        self.edit_rooms = EditRooms()
+
+        # Institution workspaces keep their shared data on the server, each with its own storage and caches
+        self.workspaces = WorkspaceRegistry(instance_dir('WORKSPACE_DIR', 'workspaces'), config['TIMETABLE_CACHE_SIZE'])
+        app.session_interface = WorkspaceSessionInterface(self.workspaces)
+
+        # Generations run on a few worker threads that take workspaces (and users without one) in turn
+        self.generation_jobs = FairScheduler(config['GENERATION_WORKERS'])
+        # Spawned, not forked: this process runs threads, and forking those is unsafe
+        self.generation_pool = (ProcessPoolExecutor(config['GENERATION_PROCESSES'],
+                                                    mp_context=multiprocessing.get_context("spawn"))
+                                if config['GENERATION_PROCESSES'] else None)
+
+
+def create_app(profile=None):
+    """Create the app with a configuration profile (default: APP_PROFILE, else production)"""
+    profile = profile or os.environ.get("APP_PROFILE", DEFAULT_PROFILE)
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile '{profile}'. Use one of: {', '.join(PROFILES)}")
+
+    app = Flask(__name__)
+    app.config.from_object(PROFILES[profile])
+    logging.basicConfig(level=app.config['LOG_LEVEL'])
+    # basicConfig does nothing once the root logger has handlers; the profile's level still applies
+    logging.getLogger().setLevel(app.config['LOG_LEVEL'])
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
+
+    app.extensions['timetable'] = Services(app)
+    app.register_blueprint(bp)
+    return app
+
+
+def preload(app):
+    """
+    Load what every worker would otherwise load on its first requests: the lazily
+    imported modules and the compiled templates. Run once in a preforking server's
+    master process so the workers share it instead of each building its own.
+    """
+    import importlib
+    for name in LAZY_MODULES:
+        importlib.import_module(name)
+    for template in app.jinja_env.list_templates():
+        app.jinja_env.get_template(template)
+
+
+def services():
+    return current_app.extensions['timetable']
 
-# Create the Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
 # Initialize session data structure
 def init_session():
@@ -23,25 +113,48 @@ def init_session():
         session['subjects'] = []
     if 'sections' not in session:
         session['sections'] = []
-    if 'saved_timetables' not in session:
-        session['saved_timetables'] = []
+    if 'store_id' not in session:
+        session['store_id'] = uuid.uuid4().hex
+    if 'saved_timetables' in session:
+        # Move timetables saved in the session by older versions into the store
+        for saved in session.pop('saved_timetables'):
+            current_space().store.add(session['store_id'], saved)
+    if 'rooms' not in session:
+        session['rooms'] = []
+
+def current_space():
+    """The workspace the browser joined, or the storage of users without one"""
+    return services().workspaces.get(session.get('workspace')) or services().personal_space
 
-@app.route('/')
+def run_generation(sections, pinned_sections=None, **options):
+    """Generate on the job queue, in the lane of the user's workspace and with that workspace's cache"""
+    from generator import generate_timetable_with_loads
+    space = current_space()
+    lane = space.lane if space.id else f"user-{session['store_id']}"
+    return services().generation_jobs.run(lane, generate_timetable_with_loads, sections, pinned_sections,
+                               cache=space.cache, executor=services().generation_pool, timeout=current_app.config['GENERATION_TIMEOUT'], **options)
+
+def build_week():
+    """Get the week configuration (days, periods, lunch positions, half-days) for this session"""
+    return WeekConfig.from_dict(session.get('week'))
+
+@bp.route('/')
 def index():
     init_session()
     return render_template('index.html')
 
-@app.route('/teachers')
+@bp.route('/teachers')
 def teachers():
+    from generator import LOAD_POLICIES
     init_session()
     teachers = []
     for teacher_data in session['teachers']:
-        teacher = Teacher(teacher_data['name'], teacher_data['max_load'])
+        teacher = build_teacher(teacher_data)
         # Calculate current load based on section assignments
         current_load = 0
         for section_data in session.get('sections', []):
             for assignment in section_data.get('subject_assignments', []):
-                if assignment.get('teacher') == teacher.name:
+                if teacher.name in assignment_teacher_names(assignment):
                     # Find the subject to get periods per week
                     for subject_data in session.get('subjects', []):
                         if subject_data['name'] == assignment['subject']:
@@ -49,9 +162,24 @@ def teachers():
                             break
         teacher.current_load = current_load
         teachers.append(teacher)
-    return render_template('teachers.html', teachers=teachers)
+    return render_template('teachers.html', teachers=teachers, week=build_week(),
+                           load_policy=session.get('load_policy', 'flexible'), load_policies=LOAD_POLICIES)
+
+@bp.route('/set_load_policy', methods=['POST'])
+def set_load_policy():
+    """Choose how strictly the generator enforces teacher max loads"""
+    from generator import LOAD_POLICIES
+    init_session()
+    policy = request.form.get('load_policy', '')
+    if policy not in LOAD_POLICIES:
+        flash(f'Unknown load policy {policy}.', 'error')
+        return redirect(url_for('.teachers'))
+    session['load_policy'] = policy
+    session.modified = True
+    flash(f'Teacher load policy set to {policy}.', 'success')
+    return redirect(url_for('.teachers'))
 
-@app.route('/add_teacher', methods=['POST'])
+@bp.route('/add_teacher', methods=['POST'])
 def add_teacher():
     init_session()
     name = request.form.get('name', '').strip()
@@ -59,28 +187,54 @@ def add_teacher():
     
     if not name:
         flash('Teacher name is required', 'error')
-        return redirect(url_for('teachers'))
+        return redirect(url_for('.teachers'))
     
     if not max_load or max_load <= 0:
         flash('Maximum load must be a positive number', 'error')
-        return redirect(url_for('teachers'))
+        return redirect(url_for('.teachers'))
     
     # Check if teacher already exists
     for teacher in session['teachers']:
         if teacher['name'].lower() == name.lower():
             flash('Teacher with this name already exists', 'error')
-            return redirect(url_for('teachers'))
+            return redirect(url_for('.teachers'))
     
     session['teachers'].append({
         'name': name,
         'max_load': max_load,
-        'current_load': 0
+        'current_load': 0,
+        'unavailable': []
     })
     session.modified = True
     flash(f'Teacher {name} added successfully', 'success')
-    return redirect(url_for('teachers'))
+    return redirect(url_for('.teachers'))
 
-@app.route('/delete_teacher/<teacher_name>')
+@bp.route('/set_teacher_availability/<teacher_name>', methods=['POST'])
+def set_teacher_availability(teacher_name):
+    """Store the periods a teacher cannot be scheduled in"""
+    init_session()
+    teacher_data = next((t for t in session['teachers'] if t['name'] == teacher_name), None)
+    if not teacher_data:
+        flash(f'Teacher {teacher_name} not found.', 'error')
+        return redirect(url_for('.teachers'))
+    
+    # Checkbox values are "day-period" pairs of unavailable slots
+    week = build_week()
+    unavailable = []
+    for value in request.form.getlist('unavailable'):
+        try:
+            day, period = (int(part) for part in value.split('-'))
+        except ValueError:
+            continue
+        if 0 <= day < week.days and 0 <= period < week.periods_per_day:
+            unavailable.append([day, period])
+    
+    teacher_data['unavailable'] = sorted(unavailable)
+    session.modified = True
+    flash(f'Availability for {teacher_name} updated ({len(unavailable)} unavailable periods).', 'success')
+    return redirect(url_for('.teachers'))
+
+@bp.route('/delete_teacher/<teacher_name>')
 def delete_teacher(teacher_name):
     init_session()
     # Check if teacher is being used in any section
@@ -89,17 +243,18 @@ def delete_teacher(teacher_name):
             for assignment in section_data['subject_assignments']:
                 if assignment.get('teacher_name') == teacher_name:
                     flash(f'Cannot delete teacher {teacher_name} as they are assigned to a subject in section {section_data["name"]}', 'error')
-                    return redirect(url_for('teachers'))
+                    return redirect(url_for('.teachers'))
     
     session['teachers'] = [t for t in session['teachers'] if t['name'] != teacher_name]
     session.modified = True
     flash(f'Teacher {teacher_name} deleted successfully', 'success')
-    return redirect(url_for('teachers'))
+    return redirect(url_for('.teachers'))
 
-@app.route('/subjects')
+@bp.route('/subjects')
 def subjects():
     init_session()
-    teachers = [Teacher(t['name'], t['max_load']) for t in session['teachers']]
+    teachers = [build_teacher(t) for t in session['teachers']]
+    rooms = build_rooms(session['rooms'])
     subjects = []
     for subject_data in session['subjects']:
         subject = Subject(
@@ -108,12 +263,14 @@ def subjects():
             subject_data['is_lab'],
             subject_data['block_size']
         )
-        # Attach assigned teachers list for template rendering
+        # Attach assigned teachers list and room for template rendering
         subject.teachers = subject_data.get('teachers', [])
+        subject.room = rooms.get(subject_data.get('room'))
+        subject.batches = subject_data.get('batches', 1)
         subjects.append(subject)
-    return render_template('subjects.html', subjects=subjects, teachers=teachers)
+    return render_template('subjects.html', subjects=subjects, teachers=teachers, rooms=list(rooms.values()))
 
-@app.route('/add_subject', methods=['POST'])
+@bp.route('/add_subject', methods=['POST'])
 def add_subject():
     # Add teachers to the subject
     teachers = request.form.getlist('teachers')
@@ -123,37 +280,108 @@ def add_subject():
     periods_per_week = request.form.get('periods_per_week', type=int)
     is_lab = 'is_lab' in request.form
     block_size = request.form.get('block_size', type=int) if is_lab else 1
+    room = (request.form.get('room') or None) if is_lab else None
+    batches = (request.form.get('batches', type=int) or 1) if is_lab else 1
+    batch_rooms = request.form.getlist('batch_rooms') if is_lab else []
     
     if not name:
         flash('Subject name is required', 'error')
-        return redirect(url_for('subjects'))
+        return redirect(url_for('.subjects'))
     
     if not periods_per_week or periods_per_week <= 0:
         flash('Periods per week must be a positive number', 'error')
-        return redirect(url_for('subjects'))
+        return redirect(url_for('.subjects'))
     
     if is_lab and (not block_size or block_size <= 0):
         flash('Block size must be a positive number for lab subjects', 'error')
-        return redirect(url_for('subjects'))
+        return redirect(url_for('.subjects'))
+    
+    if batches < 1 or len(batch_rooms) > batches - 1:
+        flash('Choose at most one extra room per additional lab batch', 'error')
+        return redirect(url_for('.subjects'))
     
     # Check if subject already exists
     for subject in session['subjects']:
         if subject['name'].lower() == name.lower():
             flash('Subject with this name already exists', 'error')
-            return redirect(url_for('subjects'))
+            return redirect(url_for('.subjects'))
     
     session['subjects'].append({
         'name': name,
         'periods_per_week': periods_per_week,
         'is_lab': is_lab,
         'block_size': block_size or 1,
-        'teachers': teachers
+        'teachers': teachers,
+        'room': room,
+        'batches': batches,
+        'batch_rooms': batch_rooms
     })
     session.modified = True
     flash(f'Subject {name} added successfully', 'success')
-    return redirect(url_for('subjects'))
+    return redirect(url_for('.subjects'))
+
+@bp.route('/add_room', methods=['POST'])
+def add_room():
+    init_session()
+    name = request.form.get('name', '').strip()
+    capacity = request.form.get('capacity', type=int)
+    room_type = request.form.get('room_type', 'lab').strip() or 'lab'
+    
+    if not name:
+        flash('Room name is required', 'error')
+        return redirect(url_for('.subjects'))
+    
+    if not capacity or capacity <= 0:
+        flash('Room capacity must be a positive number', 'error')
+        return redirect(url_for('.subjects'))
+    
+    for room in session['rooms']:
+        if room['name'].lower() == name.lower():
+            flash('Room with this name already exists', 'error')
+            return redirect(url_for('.subjects'))
+    
+    session['rooms'].append({
+        'name': name,
+        'capacity': capacity,
+        'room_type': room_type
+    })
+    session.modified = True
+    flash(f'Room {name} added successfully', 'success')
+    return redirect(url_for('.subjects'))
+
+@bp.route('/delete_room/<room_name>')
+def delete_room(room_name):
+    init_session()
+    for subject in session['subjects']:
+        # Rooms of extra lab batches are in use as well
+        if subject.get('room') == room_name or room_name in subject.get('batch_rooms', []):
+            flash(f'Cannot delete room {room_name} as it is used by subject {subject["name"]}', 'error')
+            return redirect(url_for('.subjects'))
+    
+    session['rooms'] = [r for r in session['rooms'] if r['name'] != room_name]
+    session.modified = True
+    flash(f'Room {room_name} deleted successfully', 'success')
+    return redirect(url_for('.subjects'))
+
+@bp.route('/assign_room_to_subject/<subject_name>', methods=['POST'])
+def assign_room_to_subject(subject_name):
+    init_session()
+    room_name = request.form.get('room') or None
+    if room_name and not any(r['name'] == room_name for r in session['rooms']):
+        flash(f'Room {room_name} not found.', 'error')
+        return redirect(url_for('.subjects'))
+    
+    subject = next((s for s in session['subjects'] if s['name'] == subject_name), None)
+    if not subject:
+        flash(f'Subject {subject_name} not found.', 'error')
+        return redirect(url_for('.subjects'))
+    
+    subject['room'] = room_name
+    session.modified = True
+    flash(f'Room for {subject_name} updated.', 'success')
+    return redirect(url_for('.subjects'))
 
-@app.route('/delete_subject/<subject_name>')
+@bp.route('/delete_subject/<subject_name>')
 def delete_subject(subject_name):
     init_session()
     # Check if subject is being used in any section
@@ -162,21 +390,21 @@ def delete_subject(subject_name):
             for assignment in section_data['subject_assignments']:
                 if assignment.get('subject_name') == subject_name:
                     flash(f'Cannot delete subject {subject_name} as it is assigned to section {section_data["name"]}', 'error')
-                    return redirect(url_for('subjects'))
+                    return redirect(url_for('.subjects'))
         elif 'subject_names' in section_data and subject_name in section_data['subject_names']:
             flash(f'Cannot delete subject {subject_name} as it is assigned to section {section_data["name"]}', 'error')
-            return redirect(url_for('subjects'))
+            return redirect(url_for('.subjects'))
     
     session['subjects'] = [s for s in session['subjects'] if s['name'] != subject_name]
     session.modified = True
     flash(f'Subject {subject_name} deleted successfully', 'success')
-    return redirect(url_for('subjects'))
+    return redirect(url_for('.subjects'))
 
 
-@app.route('/sections')
+@bp.route('/sections')
 def sections():
     init_session()
-    teachers = [Teacher(t['name'], t['max_load']) for t in session['teachers']]
+    teachers = [build_teacher(t) for t in session['teachers']]
     subjects = []
     for subject_data in session['subjects']:
         subject = Subject(
@@ -186,6 +414,7 @@ def sections():
             subject_data['block_size']
         )
         subject.teachers = subject_data.get('teachers', [])
+        subject.batches = subject_data.get('batches', 1)
         subjects.append(subject)
     # Prepare section data with subject-teacher assignments
     section_list = []
@@ -195,10 +424,12 @@ def sections():
         for subj_name in section_data.get('subject_names', []):
             subj = next((s for s in subjects if s.name == subj_name), None)
             teacher_name = None
+            batch_teachers = []
             for a in assignments:
                 if a['subject'] == subj_name:
                     teacher_name = a['teacher']
-            section_subjects.append({'subject': subj, 'teacher': teacher_name})
+                    batch_teachers = a.get('batch_teachers', [])
+            section_subjects.append({'subject': subj, 'teacher': teacher_name, 'batch_teachers': batch_teachers})
         section_list.append({
             'name': section_data['name'],
             'year': section_data['year'],
@@ -206,7 +437,7 @@ def sections():
         })
     return render_template('sections.html', sections=section_list, subjects=subjects, teachers=teachers)
     
-@app.route('/assign_teachers_to_subject/<subject_name>', methods=['POST'])
+@bp.route('/assign_teachers_to_subject/<subject_name>', methods=['POST'])
 def assign_teachers_to_subject(subject_name):
     init_session()
     selected_teachers = request.form.getlist('teachers')
@@ -221,10 +452,10 @@ def assign_teachers_to_subject(subject_name):
         flash(f'Teachers assigned to {subject_name} successfully.', 'success')
     else:
         flash(f'Subject {subject_name} not found.', 'error')
-    return redirect(url_for('subjects'))
+    return redirect(url_for('.subjects'))
 
 
-@app.route('/add_section', methods=['POST'])
+@bp.route('/add_section', methods=['POST'])
 def add_section():
     init_session()
     name = request.form.get('name', '').strip()
@@ -237,22 +468,31 @@ def add_section():
         subject_data = next((s for s in session['subjects'] if s['name'] == subj_name), None)
         if subject_data and teacher and teacher not in subject_data.get('teachers', []):
             flash(f'Teacher {teacher} is not assigned to subject {subj_name}.', 'error')
-            return redirect(url_for('sections'))
-        subject_assignments.append({'subject': subj_name, 'teacher': teacher})
+            return redirect(url_for('.sections'))
+        # Split-batch labs take one extra teacher per additional batch
+        batch_teachers = [t for t in request.form.getlist(f'batch_teachers_for_{subj_name}') if t and t != teacher]
+        if subject_data and batch_teachers:
+            if len(batch_teachers) > subject_data.get('batches', 1) - 1:
+                flash(f'{subj_name} has only {subject_data.get("batches", 1)} batch(es); choose fewer batch teachers.', 'error')
+                return redirect(url_for('.sections'))
+            if any(t not in subject_data.get('teachers', []) for t in batch_teachers):
+                flash(f'Batch teachers for {subj_name} must be assigned to the subject.', 'error')
+                return redirect(url_for('.sections'))
+        subject_assignments.append({'subject': subj_name, 'teacher': teacher, 'batch_teachers': batch_teachers})
     if not name:
         flash('Section name is required', 'error')
-        return redirect(url_for('sections'))
+        return redirect(url_for('.sections'))
     if not year:
         flash('Year is required', 'error')
-        return redirect(url_for('sections'))
+        return redirect(url_for('.sections'))
     if not subject_names:
         flash('At least one subject must be selected', 'error')
-        return redirect(url_for('sections'))
+        return redirect(url_for('.sections'))
     # Check if section already exists
     for section in session['sections']:
         if section['name'].lower() == name.lower():
             flash('Section with this name already exists', 'error')
-            return redirect(url_for('sections'))
+            return redirect(url_for('.sections'))
     session['sections'].append({
         'name': name,
         'year': year,
@@ -261,22 +501,123 @@ def add_section():
     })
     session.modified = True
     flash(f'Section {name} added successfully', 'success')
-    return redirect(url_for('sections'))
+    return redirect(url_for('.sections'))
 
-@app.route('/delete_section/<section_name>')
+@bp.route('/delete_section/<section_name>')
 def delete_section(section_name):
     init_session()
     session['sections'] = [s for s in session['sections'] if s['name'] != section_name]
     session.modified = True
     flash(f'Section {section_name} deleted successfully', 'success')
-    return redirect(url_for('sections'))
+    return redirect(url_for('.sections'))
+
+@bp.route('/auto_assign_teachers', methods=['POST'])
+def auto_assign_teachers():
+    """Pick a balanced teacher for section subjects from each subject's qualified teachers"""
+    from assignment import assign_teachers
+    init_session()
+    overwrite = 'overwrite' in request.form
+    teachers = {t['name']: build_teacher(t) for t in session['teachers']}
+    subject_templates = {s['name']: s for s in session['subjects']}
+    
+    assignments, loads, unassigned = assign_teachers(session['sections'], subject_templates, teachers, overwrite)
+    
+    for section_data in session['sections']:
+        existing = {a['subject']: a for a in section_data.get('subject_assignments', [])}
+        updated = []
+        for subject_name in section_data.get('subject_names', []):
+            assignment = dict(existing.get(subject_name, {'subject': subject_name, 'teacher': None}))
+            if (section_data['name'], subject_name) in assignments:
+                assignment['teacher'] = assignments[(section_data['name'], subject_name)]
+                # A batch teacher cannot also be the main teacher
+                assignment['batch_teachers'] = [t for t in assignment.get('batch_teachers', [])
+                                                if t != assignment['teacher']]
+            updated.append(assignment)
+        section_data['subject_assignments'] = updated
+    session.modified = True
+    
+    flash(f'Automatically assigned teachers to {len(assignments)} section subject(s).', 'success')
+    overloaded = [f'{name} ({load}/{teachers[name].max_load})' for name, load in loads.items()
+                  if load > teachers[name].max_load]
+    if overloaded:
+        flash(f'Some teachers are still over their maximum load: {", ".join(overloaded)}. '
+              f'Qualify more teachers for their subjects or raise their load.', 'warning')
+    if unassigned:
+        flash('No qualified teacher for: ' + ', '.join(f'{subj} in {sec}' for sec, subj in unassigned) +
+              '. Assign teachers to these subjects first.', 'error')
+    return redirect(url_for('.sections'))
 
-@app.route('/generate_timetable')
+@bp.route('/week_settings', methods=['GET', 'POST'])
+def week_settings():
+    """Configure the shape of the teaching week shared by all sections"""
+    init_session()
+    
+    if request.method == 'GET':
+        return render_template('week_settings.html', week=build_week())
+    
+    day_names = [d.strip() for d in request.form.get('day_names', '').split(',') if d.strip()]
+    periods_per_day = request.form.get('periods_per_day', type=int)
+    
+    if not day_names:
+        flash('At least one teaching day is required', 'error')
+        return redirect(url_for('.week_settings'))
+    
+    if not periods_per_day or not 1 <= periods_per_day <= 12:
+        flash('Periods per day must be between 1 and 12', 'error')
+        return redirect(url_for('.week_settings'))
+    
+    # Lunch positions are entered as "year:position" pairs, e.g. "1:3, default:4"
+    lunch_positions = {}
+    for entry in request.form.get('lunch_positions', '').split(','):
+        if not entry.strip():
+            continue
+        year, _, position = entry.partition(':')
+        try:
+            position = int(position)
+        except ValueError:
+            flash(f'Invalid lunch position "{entry.strip()}". Use year:position, e.g. 1:3', 'error')
+            return redirect(url_for('.week_settings'))
+        if not 0 <= position <= periods_per_day:
+            flash(f'Lunch position {position} is outside the {periods_per_day} teaching periods', 'error')
+            return redirect(url_for('.week_settings'))
+        lunch_positions[year.strip().lower()] = position
+    lunch_positions.setdefault('default', min(4, periods_per_day))
+    
+    # Half-days are entered as "day name:periods" pairs, e.g. "Saturday:4"
+    half_days = {}
+    for entry in request.form.get('half_days', '').split(','):
+        if not entry.strip():
+            continue
+        day_name, _, periods = entry.partition(':')
+        matching = [i for i, name in enumerate(day_names) if name.lower() == day_name.strip().lower()]
+        try:
+            periods = int(periods)
+        except ValueError:
+            matching = []
+        if not matching or not 0 <= periods <= periods_per_day:
+            flash(f'Invalid half-day "{entry.strip()}". Use day name:periods, e.g. Saturday:4', 'error')
+            return redirect(url_for('.week_settings'))
+        half_days[str(matching[0])] = periods
+    
+    session['week'] = WeekConfig(day_names, periods_per_day, lunch_positions, half_days).to_dict()
+    session.modified = True
+    flash('Week settings saved. Regenerate timetables to apply them.', 'success')
+    return redirect(url_for('.week_settings'))
+
+@bp.route('/generate_timetable')
 def generate_timetable_view():
+    from conflicts import detect_teacher_conflicts, get_conflict_summary, suggest_conflict_resolution
+    from exporter import format_timetable_for_web
     init_session()
     if not session['sections']:
         flash('No sections available. Please add at least one section.', 'error')
-        return redirect(url_for('sections'))
+        return redirect(url_for('.sections'))
+    
+    # Incremental mode re-solves only the sections affected by configuration changes
+    incremental = request.args.get('mode') == 'incremental' and bool(session.get('generated_sections'))
+    # Cached mode serves the best timetable already generated for this exact configuration
+    prefer_cached = request.args.get('mode') == 'cached'
+    previous_sections = session.get('generated_sections', [])
     
     # Force regeneration by clearing any existing generated timetables
     if 'generated_sections' in session:
@@ -288,41 +629,55 @@ def generate_timetable_view():
         for teacher_data in session['teachers']:
             teacher_data['current_load'] = 0
         # Create objects from session data
-        teachers = {t['name']: Teacher(t['name'], t['max_load']) for t in session['teachers']}
+        teachers = {t['name']: build_teacher(t) for t in session['teachers']}
         
         # Create a subject template lookup for creating section-specific instances
         subject_templates = {}
         for subject_data in session['subjects']:
             subject_templates[subject_data['name']] = subject_data
-            
-        sections = []
-        for section_data in session['sections']:
-            subject_assignments = []
-            for assignment in section_data.get('subject_assignments', []):
-                subject_name = assignment['subject']
-                teacher_name = assignment['teacher']
-                
-                # Create a NEW subject instance for this specific section assignment
-                if subject_name in subject_templates and teacher_name:
-                    template = subject_templates[subject_name]
-                    # Create a separate subject instance for this section
-                    subject_instance = Subject(
-                        template['name'],
-                        template['periods_per_week'],
-                        template['is_lab'],
-                        template['block_size']
-                    )
-                    
-                    teacher_obj = teachers.get(teacher_name)
-                    if teacher_obj:
-                        # Assign the specific teacher to this section's subject instance
-                        subject_instance.teacher = teacher_obj
-                        subject_assignments.append((subject_instance, teacher_obj))
-                        
-            section = Section(section_data['name'], section_data['year'], subject_assignments)
-            sections.append(section)
+        rooms = build_rooms(session['rooms'])
+        week = build_week()
+        
+        section_configs = session['sections']
+        pinned_sections = []
+        if incremental:
+            affected = find_affected_sections(section_configs, previous_sections, subject_templates, teachers, week)
+            configured_names = {s['name'] for s in section_configs}
+            pinned_sections = restore_sections(
+                [s for s in previous_sections if s['name'] in configured_names and s['name'] not in affected],
+                teachers, subject_templates, rooms, week)
+            section_configs = [s for s in section_configs if s['name'] in affected]
+        
+        sections = build_sections_from_config(section_configs, teachers, subject_templates, rooms, week)
+        load_policy = session.get('load_policy', 'flexible')
+        load_report = []
         # Generate timetables
-        generated_sections = generate_timetable(sections)
+        if incremental and not sections:
+            generated_sections = []
+        else:
+            try:
+                # Re-solved sections are repaired from their previous grids to keep them stable
+                generated_sections, load_report = run_generation(
+                    sections, pinned_sections, load_policy=load_policy, prefer_cached=prefer_cached,
+                    warm_start=grid_names(previous_sections) if incremental else None)
+            except QueueFull:
+                raise
+            except Exception:
+                if not incremental:
+                    raise
+                # The partial repair could not fit around the pinned grids; rebuild everything
+                flash('Incremental regeneration was not possible, so all sections were regenerated.', 'warning')
+                pinned_sections = []
+                sections = build_sections_from_config(session['sections'], teachers, subject_templates, rooms, week)
+                generated_sections, load_report = run_generation(sections, load_policy=load_policy)
+        
+        # Keep the configured section order for display and storage
+        section_order = {s['name']: i for i, s in enumerate(session['sections'])}
+        generated_sections = sorted(generated_sections + pinned_sections, key=lambda s: section_order[s.name])
+        
+        if incremental and pinned_sections:
+            flash(f'Incremental regeneration: re-solved {len(section_configs)} section(s), '
+                  f'kept {len(pinned_sections)} unchanged.', 'success')
         
         # Detect conflicts
         conflicts = detect_teacher_conflicts(generated_sections)
@@ -330,43 +685,8 @@ def generate_timetable_view():
         suggestions = suggest_conflict_resolution(conflicts, generated_sections) if conflicts else []
         
         # Store generated sections in session for editing with complete teacher assignment data
-        session['generated_sections'] = []
-        for section in generated_sections:
-            # Convert section to serializable format with complete teacher assignments
-            subject_assignments = []
-            for subject in section.subjects:
-                if subject.teacher:
-                    subject_assignments.append({
-                        'subject': subject.name,
-                        'teacher': subject.teacher.name
-                    })
-            
-            section_data = {
-                'name': section.name,
-                'year': section.year,
-                'subject_names': [s.name for s in section.subjects],
-                'subject_assignments': subject_assignments,
-                'timetable': []
-            }
-            
-            # Store timetable with complete subject and teacher data
-            for day in range(6):
-                day_schedule = []
-                for period in range(7):
-                    subject = section.timetable[day][period]
-                    if subject:
-                        day_schedule.append({
-                            'name': subject.name,
-                            'teacher': subject.teacher.name if subject.teacher else 'Unassigned',
-                            'is_lab': subject.is_lab,
-                            'block_size': getattr(subject, 'block_size', 1)
-                        })
-                    else:
-                        day_schedule.append(None)
-                section_data['timetable'].append(day_schedule)
-            
-            session['generated_sections'].append(section_data)
-        
+        session['generated_sections'] = serialize_sections(generated_sections)
+        session['load_report'] = load_report
         session.modified = True
         
         # Format timetables for web display
@@ -378,75 +698,83 @@ def generate_timetable_view():
         # Show conflict warnings if any
         if conflicts:
             flash(f"⚠️ {len(conflicts)} teacher scheduling conflicts detected! Check the conflicts tab for details.", 'warning')
+        overloaded = [row for row in load_report if row['overload']]
+        if overloaded:
+            flash('Teachers over their maximum load: ' +
+                  ', '.join(f"{row['teacher']} ({row['load']}/{row['max_load']})" for row in overloaded), 'warning')
         
         return render_template('timetable.html', 
                              timetables=timetables,
                              conflicts=conflict_summary,
                              suggestions=suggestions,
-                             has_conflicts=len(conflicts) > 0)
+                             has_conflicts=len(conflicts) > 0,
+                             load_report=load_report,
+                             load_policy=load_policy)
     
     except Exception as e:
         flash(f'Error generating timetable: {str(e)}', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
+
+def edit_data():
+    """The timetable and configuration the user's own edits work on"""
+    return {
+        'sections': session.get('generated_sections', []),
+        'teachers': session['teachers'],
+        'subjects': session['subjects'],
+        'rooms': session['rooms'],
+        'week': session.get('week')
+    }
+
+def active_edit_room():
+    """The shared edit session the user joined, if it still exists"""
+    room_id = session.get('collab_room')
+    room = services().edit_rooms.get(room_id) if room_id else None
+    if room_id and not room:
+        session.pop('collab_room', None)
+    return room
+
+def restore_edit_sections(data, names=None):
+    """Rebuild Section objects from edit data, optionally only the named sections"""
+    teachers = {t['name']: build_teacher(t) for t in data['teachers']}
+    subject_templates = {subject_data['name']: subject_data for subject_data in data['subjects']}
+    stored = [s for s in data['sections'] if names is None or s['name'] in names]
+    return restore_sections(stored, teachers, subject_templates, build_rooms(data['rooms']), WeekConfig.from_dict(data['week']))
+
+def conflict_messages(data, space=None):
+    """The set of conflict messages of edit data, used to broadcast what an edit added or resolved"""
+    from conflicts import detect_teacher_conflicts, get_conflict_summary
+    def detect():
+        conflicts = detect_teacher_conflicts(restore_edit_sections(data))
+        return frozenset(conflict['message'] for conflict in get_conflict_summary(conflicts)) if conflicts else frozenset()
+    # Undo, redo and broadcasts keep asking about the same timetables, so results are kept per workspace
+    return (space or current_space()).conflicts.get(MemoCache.key(data), detect)
 
-@app.route('/edit_timetable')
+@bp.route('/edit_timetable')
 def edit_timetable():
     """Display timetables in edit mode with conflict information"""
+    from conflicts import detect_teacher_conflicts, get_conflict_summary, suggest_conflict_resolution
+    from exporter import format_timetable_for_web
     init_session()
     
-    if 'generated_sections' not in session or not session['generated_sections']:
+    room = active_edit_room()
+    if room:
+        data, version = room.snapshot()
+        journal = room.journal
+        page_version = content_version('room', room.id, version)
+    elif 'generated_sections' not in session or not session['generated_sections']:
         flash('No timetables generated yet. Please generate timetables first.', 'error')
-        return redirect(url_for('generate_timetable_view'))
-    
-    # Reconstruct sections from session data for conflict detection
-    teachers = {t['name']: Teacher(t['name'], t['max_load']) for t in session['teachers']}
+        return redirect(url_for('.generate_timetable_view'))
+    else:
+        data, version = edit_data(), None
+        journal = user_journal()
+        # Undo and redo can return to earlier content, so the journal position is part of the version
+        page_version = content_version('edit', data, session.get('load_report'), journal.position, len(journal.entries))
+    not_modified = not_modified_response(page_version)
+    if not_modified:
+        return not_modified
     
-    # Create subject templates for reference
-    subject_templates = {}
-    for subject_data in session['subjects']:
-        subject_templates[subject_data['name']] = subject_data
-    
-    sections = []
-    for section_data in session['generated_sections']:
-        # Create subject assignments with proper teacher assignments from stored data
-        section_subject_instances = {}  # Track subject instances for this specific section
-        subject_assignments = []
-        
-        for assignment in section_data.get('subject_assignments', []):
-            subject_name = assignment['subject']
-            teacher_name = assignment['teacher']
-            
-            if subject_name in subject_templates and teacher_name in teachers:
-                template = subject_templates[subject_name]
-                # Create a NEW subject instance specifically for this section
-                subject_instance = Subject(
-                    template['name'],
-                    template['periods_per_week'],
-                    template['is_lab'],
-                    template['block_size']
-                )
-                subject_instance.teacher = teachers[teacher_name]
-                section_subject_instances[subject_name] = subject_instance
-                subject_assignments.append((subject_instance, teachers[teacher_name]))
-        
-        section = Section(section_data['name'], section_data['year'], subject_assignments)
-        
-        # Reconstruct timetable from stored data with proper section-specific subject instances
-        for day in range(6):
-            for period in range(7):
-                stored_subject = section_data['timetable'][day][period]
-                if stored_subject:
-                    subject_name = stored_subject['name']
-                    teacher_name = stored_subject.get('teacher', '')
-                    
-                    # Use the section-specific subject instance
-                    if subject_name in section_subject_instances:
-                        subject_instance = section_subject_instances[subject_name]
-                        # Ensure teacher is properly assigned from stored data
-                        if teacher_name and teacher_name in teachers:
-                            subject_instance.teacher = teachers[teacher_name]
-                        section.timetable[day][period] = subject_instance
-        sections.append(section)
+    # Reconstruct sections from the edit data for conflict detection
+    sections = restore_edit_sections(data)
     
     # Detect current conflicts
     conflicts = detect_teacher_conflicts(sections)
@@ -459,11 +787,122 @@ def edit_timetable():
         timetable_data = format_timetable_for_web(section)
         timetables.append(timetable_data)
     
-    return render_template('edit_timetable.html',
-                         timetables=timetables,
-                         conflicts=conflict_summary,
-                         suggestions=suggestions,
-                         has_conflicts=len(conflicts) > 0)
+    return versioned_response(render_template('edit_timetable.html',
+                                              timetables=timetables,
+                                              conflicts=conflict_summary,
+                                              suggestions=suggestions,
+                                              has_conflicts=len(conflicts) > 0,
+                                              room=room,
+                                              version=version,
+                                              can_undo=journal.can_undo(),
+                                              can_redo=journal.can_redo()), page_version)
+
+@bp.route('/edit_timetable/section/<section_name>')
+def edit_timetable_section(section_name):
+    """One section's editable grid, so the edit page can refresh a single section after a change"""
+    from exporter import format_timetable_for_web
+    init_session()
+    
+    room = active_edit_room()
+    data = room.snapshot()[0] if room else edit_data()
+    section_data = next((s for s in data['sections'] if s['name'] == section_name), None)
+    if not section_data:
+        return jsonify({'success': False, 'message': 'Section not found'}), 404
+    
+    def render():
+        sections = restore_edit_sections(data, {section_name})
+        return render_template('_edit_section.html', timetable=format_timetable_for_web(sections[0]), room=room)
+    # Every client in a shared session fetches the same card after a change; render it once
+    key = MemoCache.key(section_data, data['teachers'], data['subjects'], data['rooms'], data['week'], room is not None)
+    return current_space().fragments.get(key, render)
+
+@bp.route('/collab/start', methods=['POST'])
+def start_collaboration():
+    """Share the current timetable as an edit session others can join"""
+    init_session()
+    
+    if not session.get('generated_sections'):
+        return jsonify({'success': False, 'message': 'No timetable to share'})
+    
+    space = current_space()
+    room = services().edit_rooms.create(edit_data(), lambda data: conflict_messages(data, space),
+                             lambda room_id: space.journals.get(f'room-{room_id}'))
+    session['collab_room'] = room.id
+    
+    return jsonify({'success': True, 'message': 'Shared editing started. Send the link to your colleagues.',
+                    'room_id': room.id, 'join_url': url_for('.join_collaboration', room_id=room.id, _external=True)})
+
+@bp.route('/collab/join/<room_id>')
+def join_collaboration(room_id):
+    """Join a shared edit session; edits then go to the shared timetable"""
+    init_session()
+    
+    if not services().edit_rooms.get(room_id):
+        flash('This shared editing session has ended.', 'error')
+        return redirect(url_for('.index'))
+    
+    session['collab_room'] = room_id
+    flash('You joined a shared editing session. Changes by others appear as they happen.', 'success')
+    return redirect(url_for('.edit_timetable'))
+
+@bp.route('/collab/leave', methods=['POST'])
+def leave_collaboration():
+    """Leave the shared edit session and go back to editing your own timetable"""
+    init_session()
+    
+    session.pop('collab_room', None)
+    return jsonify({'success': True, 'message': 'You left the shared editing session.'})
+
+@bp.route('/collab/<room_id>/events')
+def collaboration_events(room_id):
+    """Server-Sent Events stream of changes in a shared edit session"""
+    room = services().edit_rooms.get(room_id)
+    if not room:
+        return jsonify({'success': False, 'message': 'Shared editing session not found'}), 404
+    
+    since = request.headers.get('Last-Event-ID', type=int) or request.args.get('since', 0, type=int)
+    return current_app.response_class(room.stream(since), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def content_version(key, *parts):
+    """
+    Version of a page: a hash of the data it is rendered from (and the asset bundles it
+    links) plus when that hash last changed, remembered per page key in the session.
+    None while messages are waiting to be flashed, since those pages must not be cached.
+    """
+    if session.get('_flashes'):
+        return None
+    payload = json.dumps([parts, services().assets.manifest], sort_keys=True, default=str)
+    version = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    versions = session.setdefault('content_versions', {})
+    if versions.get(key, [None])[0] != version:
+        versions[key] = [version, int(time.time())]
+        session.modified = True
+    return versions[key]
+
+def versioned_response(response, page_version, etag=None):
+    """Attach the page version as ETag and Last-Modified so browsers revalidate instead of refetching"""
+    response = make_response(response)
+    if page_version:
+        response.set_etag(etag or page_version[0])
+        response.last_modified = page_version[1]
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+    return response
+
+def not_modified_response(page_version):
+    """A 304 response when the client already has this version of the page, otherwise None"""
+    if not page_version:
+        return None
+    etag = matching_etag(request, page_version[0])
+    since = request.if_modified_since
+    if etag or (not request.if_none_match and since and since.timestamp() >= page_version[1]):
+        return versioned_response(current_app.response_class(status=304), page_version, etag)
+    return None
+
+def current_timetable_version():
+    return content_version('current', session['generated_sections'], session['teachers'], session['subjects'],
+                           session['rooms'], session.get('week'), session.get('load_report'))
 
 def display_index_to_timetable_index(display_period, lunch_position):
     """Convert display period index (0-7 including lunch) to timetable index (0-6 teaching periods)"""
@@ -474,25 +913,13 @@ def display_index_to_timetable_index(display_period, lunch_position):
     else:
         return display_period - 1  # After lunch, subtract 1
 
-@app.route('/move_subject', methods=['POST'])
-def move_subject():
-    """Move a subject from one time slot to another"""
-    init_session()
-    
-    data = request.get_json()
-    section_name = data.get('section_name')
-    from_day = data.get('from_day')
-    from_period = data.get('from_period')
-    to_day = data.get('to_day')
-    to_period = data.get('to_period')
-    
-    # Find the section in stored data
-    section_data = next((s for s in session['generated_sections'] if s['name'] == section_name), None)
-    if not section_data:
-        return jsonify({'success': False, 'message': 'Section not found'})
-    
-    # Get lunch position (assume 4th position - between 3rd and 4th period)
-    lunch_position = 4
+def section_lunch_position(section_data, data):
+    """Lunch position of a stored section in the edit data's week"""
+    return WeekConfig.from_dict(data.get('week')).lunch_position_for(section_data['year'])
+
+def move_cell(section_data, data, from_day, from_period, to_day, to_period):
+    """Move a subject (a whole block for labs) given display indices; returns (success, message, touched slots)"""
+    lunch_position = section_lunch_position(section_data, data)
     
     # Convert display indices to timetable indices
     from_timetable_period = display_index_to_timetable_index(from_period, lunch_position)
@@ -500,76 +927,199 @@ def move_subject():
     
     # Check if trying to move from/to lunch slot
     if from_timetable_period is None:
-        return jsonify({'success': False, 'message': 'Cannot move from lunch period'})
+        return False, 'Cannot move from lunch period', []
     if to_timetable_period is None:
-        return jsonify({'success': False, 'message': 'Cannot move to lunch period'})
+        return False, 'Cannot move to lunch period', []
     
-    # Get subject from source position
-    source_subject = section_data['timetable'][from_day][from_timetable_period]
-    if not source_subject:
-        return jsonify({'success': False, 'message': 'No subject at source position'})
+    return move_block(section_data, data, from_day, from_timetable_period, to_day, to_timetable_period)
+
+def swap_cells(section_data, data, slot1_day, slot1_period, slot2_day, slot2_period):
+    """Swap two subjects (whole blocks for labs) given display indices; returns (success, message, touched slots)"""
+    lunch_position = section_lunch_position(section_data, data)
     
-    # Check if destination is empty
-    dest_subject = section_data['timetable'][to_day][to_timetable_period]
-    if dest_subject:
-        return jsonify({'success': False, 'message': 'Destination slot is occupied'})
+    # Convert display indices to timetable indices
+    slot1_timetable_period = display_index_to_timetable_index(slot1_period, lunch_position)
+    slot2_timetable_period = display_index_to_timetable_index(slot2_period, lunch_position)
     
-    # Move the subject
-    section_data['timetable'][to_day][to_timetable_period] = source_subject
-    section_data['timetable'][from_day][from_timetable_period] = None
-    session.modified = True
+    # Check if trying to swap with lunch slot
+    if slot1_timetable_period is None or slot2_timetable_period is None:
+        return False, 'Cannot swap with lunch period', []
     
-    return jsonify({'success': True, 'message': f'Moved {source_subject["name"]} successfully'})
+    return swap_blocks(section_data, data, slot1_day, slot1_timetable_period, slot2_day, slot2_timetable_period)
 
-@app.route('/swap_subjects', methods=['POST'])
-def swap_subjects():
-    """Swap two subjects between time slots"""
-    init_session()
-    
+def apply_edit(section_name, change_fn):
+    """
+    Apply a cell edit to the shared edit session the user joined, or else to their own
+    timetable. Returns a JSON response with the new version and the conflict delta.
+    """
     data = request.get_json()
-    section_name = data.get('section_name')
-    slot1_day = data.get('slot1_day')
-    slot1_period = data.get('slot1_period')
-    slot2_day = data.get('slot2_day')
-    slot2_period = data.get('slot2_period')
+    room = active_edit_room()
+    if room:
+        try:
+            success, message, event = room.apply(section_name, data.get('base_version', 0), change_fn,
+                                                 data.get('client_id'))
+        except StaleEdit as e:
+            return jsonify({'success': False, 'stale': True, 'message': str(e), 'version': e.version}), 409
+        if not success:
+            return jsonify({'success': False, 'message': message})
+        return edit_response(message, event['section'], room.journal, event['conflicts'], event['version'])
     
     # Find the section in stored data
-    section_data = next((s for s in session['generated_sections'] if s['name'] == section_name), None)
+    section_data = next((s for s in session.get('generated_sections', []) if s['name'] == section_name), None)
     if not section_data:
         return jsonify({'success': False, 'message': 'Section not found'})
     
-    # Get lunch position (assume 4th position - between 3rd and 4th period)
-    lunch_position = 4
+    journal = user_journal()
+    conflicts_before = conflict_messages(edit_data())
+    timetable_before = copy.deepcopy(section_data['timetable'])
+    success, message, touched = change_fn(section_data, edit_data())
+    if not success:
+        return jsonify({'success': False, 'message': message})
+    session.modified = True
+    journal.record(session['generated_sections'], section_name,
+                   [{'day': day, 'period': period, 'before': timetable_before[day][period],
+                     'after': section_data['timetable'][day][period]} for day, period in touched], message)
     
-    # Convert display indices to timetable indices
-    slot1_timetable_period = display_index_to_timetable_index(slot1_period, lunch_position)
-    slot2_timetable_period = display_index_to_timetable_index(slot2_period, lunch_position)
+    return edit_response(message, section_name, journal, conflict_delta(conflicts_before))
+
+def user_journal():
+    """The journal of the user's own timetable, restarted if that timetable was replaced"""
+    journal = current_space().journals.get(session['store_id'])
+    if session.get('generated_sections'):
+        journal.ensure(session['generated_sections'])
+    return journal
+
+def conflict_delta(conflicts_before):
+    """Conflicts an edit of the user's own timetable added and resolved"""
+    conflicts_after = conflict_messages(edit_data())
+    return {'added': sorted(conflicts_after - conflicts_before),
+            'removed': sorted(conflicts_before - conflicts_after),
+            'count': len(conflicts_after)}
+
+def edit_response(message, section_name, journal, conflicts, version=None):
+    return jsonify({'success': True, 'message': message, 'section': section_name, 'version': version,
+                    'conflicts': conflicts, 'can_undo': journal.can_undo(), 'can_redo': journal.can_redo()})
+
+def step_edit(action):
+    """Undo or redo the last edit of the shared edit session the user joined, or of their own timetable"""
+    data = request.get_json(silent=True) or {}
+    room = active_edit_room()
+    if room:
+        success, message, event = getattr(room, action)(data.get('client_id'))
+        if not success:
+            return jsonify({'success': False, 'message': message})
+        return edit_response(message, event['section'], room.journal, event['conflicts'], event['version'])
+    
+    if not session.get('generated_sections'):
+        return jsonify({'success': False, 'message': 'No timetable to edit'})
+    
+    journal = user_journal()
+    conflicts_before = conflict_messages(edit_data())
+    entry = getattr(journal, action)(session['generated_sections'])
+    if entry is None:
+        return jsonify({'success': False, 'message': f'Nothing to {action}'})
+    session.modified = True
     
-    # Check if trying to swap with lunch slot
-    if slot1_timetable_period is None or slot2_timetable_period is None:
-        return jsonify({'success': False, 'message': 'Cannot swap with lunch period'})
+    verb = 'Undid' if action == 'undo' else 'Redid'
+    return edit_response(f'{verb}: {entry["message"]}', entry['section'], journal, conflict_delta(conflicts_before))
+
+@bp.route('/undo_edit', methods=['POST'])
+def undo_edit():
+    """Revert the last move or swap"""
+    init_session()
+    return step_edit('undo')
+
+@bp.route('/redo_edit', methods=['POST'])
+def redo_edit():
+    """Re-apply the last undone move or swap"""
+    init_session()
+    return step_edit('redo')
+
+@bp.route('/edit_history')
+def edit_history():
+    """Audit trail of edits to the working timetable, newest first"""
+    init_session()
+    
+    room = active_edit_room()
+    journal = room.journal if room else user_journal()
+    return jsonify({'success': True, 'history': journal.history()[::-1],
+                    'can_undo': journal.can_undo(), 'can_redo': journal.can_redo()})
+
+@bp.route('/move_subject', methods=['POST'])
+def move_subject():
+    """Move a subject from one time slot to another"""
+    init_session()
+    
+    data = request.get_json()
+    return apply_edit(data.get('section_name'), lambda section_data, edit: move_cell(
+        section_data, edit, data.get('from_day'), data.get('from_period'), data.get('to_day'), data.get('to_period')))
+
+@bp.route('/swap_subjects', methods=['POST'])
+def swap_subjects():
+    """Swap two subjects between time slots"""
+    init_session()
+    
+    data = request.get_json()
+    return apply_edit(data.get('section_name'), lambda section_data, edit: swap_cells(
+        section_data, edit, data.get('slot1_day'), data.get('slot1_period'), data.get('slot2_day'), data.get('slot2_period')))
+
+@bp.route('/toggle_lock', methods=['POST'])
+def toggle_lock():
+    """Lock or unlock a cell so regeneration keeps it in place"""
+    init_session()
+    
+    data = request.get_json()
+    section_name = data.get('section_name')
+    day = data.get('day')
+    period = data.get('period')
     
-    # Get subjects from both positions
-    subject1 = section_data['timetable'][slot1_day][slot1_timetable_period]
-    subject2 = section_data['timetable'][slot2_day][slot2_timetable_period]
+    section_data = next((s for s in session.get('generated_sections', []) if s['name'] == section_name), None)
+    section_config = next((s for s in session['sections'] if s['name'] == section_name), None)
+    if not section_data or not section_config:
+        return jsonify({'success': False, 'message': 'Section not found'})
     
-    # Swap the subjects
-    section_data['timetable'][slot1_day][slot1_timetable_period] = subject2
-    section_data['timetable'][slot2_day][slot2_timetable_period] = subject1
+    lunch_position = Section(section_data['name'], section_data['year'], [], week=build_week()).get_lunch_period_position()
+    timetable_period = display_index_to_timetable_index(period, lunch_position)
+    if timetable_period is None:
+        return jsonify({'success': False, 'message': 'Cannot lock the lunch period'})
+    
+    cell = section_data['timetable'][day][timetable_period]
+    if not cell:
+        return jsonify({'success': False, 'message': 'Only scheduled periods can be locked'})
+    
+    # Labs are locked and unlocked as a whole block
+    start, size = find_block(section_data['timetable'][day], timetable_period)
+    cell_periods = list(range(start, start + size))
+    
+    locked_slots = section_config.get('locked_slots', [])
+    was_locked = any(slot['day'] == day and slot['period'] == timetable_period for slot in locked_slots)
+    locked_slots = [slot for slot in locked_slots
+                    if not (slot['day'] == day and slot['period'] in cell_periods)]
+    if not was_locked:
+        locked_slots.extend({'day': day, 'period': p, 'subject': cell['name']} for p in cell_periods)
+    locked_slots.sort(key=lambda slot: (slot['day'], slot['period']))
+    
+    section_config['locked_slots'] = locked_slots
+    section_data['locked_slots'] = list(locked_slots)
     session.modified = True
     
-    return jsonify({'success': True, 'message': 'Subjects swapped successfully'})
+    action = 'Unlocked' if was_locked else 'Locked'
+    return jsonify({'success': True, 'locked': not was_locked, 'message': f'{action} {cell["name"]}'})
 
-@app.route('/save_timetable', methods=['POST'])
+@bp.route('/save_timetable', methods=['POST'])
 def save_timetable():
     """Save the current edited timetable permanently"""
     init_session()
     
+    room = active_edit_room()
+    if room:
+        # Keep a copy of the shared timetable as the user's own current timetable too
+        session['generated_sections'] = room.snapshot()[0]['sections']
+    
     if 'generated_sections' not in session or not session['generated_sections']:
         return jsonify({'success': False, 'message': 'No timetable to save'})
     
     # Store the current timetable as saved
-    import time
     timestamp = int(time.time())
     
     saved_timetable = {
@@ -579,82 +1129,98 @@ def save_timetable():
         'created_at': timestamp
     }
     
-    session['saved_timetables'].append(saved_timetable)
-    session.modified = True
+    saved_id = current_space().store.add(session['store_id'], saved_timetable)
     
-    return jsonify({'success': True, 'message': 'Timetable saved successfully!', 'saved_id': timestamp})
+    return jsonify({'success': True, 'message': 'Timetable saved successfully!', 'saved_id': saved_id})
 
-@app.route('/load_saved_timetable/<int:saved_id>')
+@bp.route('/load_saved_timetable/<int:saved_id>')
 def load_saved_timetable(saved_id):
     """Load a previously saved timetable"""
     init_session()
     
-    saved_timetable = next((st for st in session['saved_timetables'] if st['id'] == saved_id), None)
+    saved_timetable = current_space().store.get(session['store_id'], saved_id)
     if not saved_timetable:
         flash('Saved timetable not found.', 'error')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     # Load the saved timetable back into generated_sections
     session['generated_sections'] = saved_timetable['sections'].copy()
     session.modified = True
     
     flash(f'Loaded: {saved_timetable["name"]}', 'success')
-    return redirect(url_for('view_saved_timetable', saved_id=saved_id))
+    return redirect(url_for('.view_saved_timetable', saved_id=saved_id))
 
-@app.route('/saved_timetables')
+@bp.route('/saved_timetables')
 def saved_timetables():
-    """Display all saved timetables"""
+    """Display one page of saved timetables (metadata only, newest first)"""
     init_session()
     
-    saved_timetables = session.get('saved_timetables', [])
-    # Sort by creation date, newest first
-    saved_timetables = sorted(saved_timetables, key=lambda x: x['created_at'], reverse=True)
+    page = max(request.args.get('page', 1, type=int), 1)
+    saved_timetables, total = current_space().store.list(session['store_id'], page, SAVED_PER_PAGE)
+    pages = max((total + SAVED_PER_PAGE - 1) // SAVED_PER_PAGE, 1)
+    if page > pages:
+        return redirect(url_for('.saved_timetables', page=pages))
+    
+    return render_template('saved_timetables.html', saved_timetables=saved_timetables,
+                           page=page, pages=pages, total=total)
+
+def find_timetable_version(version):
+    """Stored sections of a saved timetable id or of the 'current' generated timetable, with a label"""
+    if version == 'current':
+        return session.get('generated_sections'), 'Current timetable'
+    saved = current_space().store.get(session['store_id'], version)
+    return (saved['sections'], saved['name']) if saved else (None, None)
+
+@bp.route('/compare_timetables')
+def compare_timetables():
+    """Show only the cells that changed between two saved versions (or a saved version and the current one)"""
+    from diff import diff_timetables
+    init_session()
     
-    return render_template('saved_timetables.html', saved_timetables=saved_timetables)
+    saved, _ = current_space().store.list(session['store_id'])
+    versions = [(str(st['id']), st['name']) for st in saved]
+    if session.get('generated_sections'):
+        versions.insert(0, ('current', 'Current timetable'))
+    if len(versions) < 2:
+        flash('Save at least two timetables (or save one and generate another) to compare them.', 'error')
+        return redirect(url_for('.saved_timetables'))
+    
+    old_version = request.args.get('old', versions[1][0])
+    new_version = request.args.get('new', versions[0][0])
+    old_sections, old_label = find_timetable_version(old_version)
+    new_sections, new_label = find_timetable_version(new_version)
+    if old_sections is None or new_sections is None:
+        flash('Timetable version not found.', 'error')
+        return redirect(url_for('.saved_timetables'))
+    
+    diff = diff_timetables(old_sections, new_sections)
+    return render_template('compare_timetables.html', diff=diff, versions=versions,
+                           old_version=old_version, new_version=new_version,
+                           old_label=old_label, new_label=new_label, day_names=build_week().day_names)
 
-@app.route('/view_current_timetable')
+@bp.route('/view_current_timetable')
 def view_current_timetable():
     """View the current edited timetable without regenerating"""
+    from conflicts import detect_teacher_conflicts, get_conflict_summary, suggest_conflict_resolution
+    from exporter import format_timetable_for_web
     init_session()
     
     if 'generated_sections' not in session or not session['generated_sections']:
         flash('No timetables available. Please generate timetables first.', 'error')
-        return redirect(url_for('generate_timetable_view'))
+        return redirect(url_for('.generate_timetable_view'))
+    
+    page_version = current_timetable_version()
+    not_modified = not_modified_response(page_version)
+    if not_modified:
+        return not_modified
     
     # Reconstruct sections from session data for conflict detection
-    teachers = {t['name']: Teacher(t['name'], t['max_load']) for t in session['teachers']}
-    subjects_dict = {}
+    teachers = {t['name']: build_teacher(t) for t in session['teachers']}
+    subject_templates = {}
     for subject_data in session['subjects']:
-        subject = Subject(
-            subject_data['name'],
-            subject_data['periods_per_week'],
-            subject_data['is_lab'],
-            subject_data['block_size']
-        )
-        subjects_dict[subject.name] = subject
-    
-    sections = []
-    for section_data in session['generated_sections']:
-        # Create subject assignments with proper teacher assignments from stored data
-        subject_assignments = []
-        for assignment in section_data.get('subject_assignments', []):
-            subj = subjects_dict.get(assignment['subject'])
-            teacher_obj = teachers.get(assignment['teacher'])
-            if subj and teacher_obj:
-                subj.teacher = teacher_obj
-                subject_assignments.append((subj, teacher_obj))
-        
-        section = Section(section_data['name'], section_data['year'], subject_assignments)
-        
-        # Reconstruct timetable from stored data
-        for day in range(6):
-            for period in range(7):
-                stored_subject = section_data['timetable'][day][period]
-                if stored_subject:
-                    subject = subjects_dict.get(stored_subject['name'])
-                    section.timetable[day][period] = subject
-        
-        sections.append(section)
+        subject_templates[subject_data['name']] = subject_data
+    
+    sections = restore_sections(session['generated_sections'], teachers, subject_templates, build_rooms(session['rooms']), build_week())
     
     # Detect conflicts in current timetable
     conflicts = detect_teacher_conflicts(sections)
@@ -667,29 +1233,28 @@ def view_current_timetable():
         timetable_data = format_timetable_for_web(section)
         timetables.append(timetable_data)
     
-    return render_template('timetable.html', 
-                         timetables=timetables,
-                         conflicts=conflict_summary,
-                         suggestions=suggestions,
-                         has_conflicts=len(conflicts) > 0)
+    return versioned_response(render_template('timetable.html', 
+                                              timetables=timetables,
+                                              conflicts=conflict_summary,
+                                              suggestions=suggestions,
+                                              has_conflicts=len(conflicts) > 0), page_version)
 
-@app.route('/delete_saved_timetable/<int:saved_id>', methods=['POST'])
+@bp.route('/delete_saved_timetable/<int:saved_id>', methods=['POST'])
 def delete_saved_timetable(saved_id):
     """Delete a saved timetable"""
     init_session()
     
-    session['saved_timetables'] = [st for st in session['saved_timetables'] if st['id'] != saved_id]
-    session.modified = True
+    if not current_space().store.delete(session['store_id'], saved_id):
+        return jsonify({'success': False, 'message': 'Saved timetable not found'})
     
     return jsonify({'success': True, 'message': 'Timetable deleted successfully'})
 
-@app.template_filter('timestamp_to_date')
+@bp.app_template_filter('timestamp_to_date')
 def timestamp_to_date(timestamp):
     """Convert timestamp to readable date"""
-    import time
     return time.strftime('%Y-%m-%d %H:%M', time.localtime(timestamp))
 
-@app.route('/remove_teacher_from_section/<section_name>/<subject_name>', methods=['POST'])
+@bp.route('/remove_teacher_from_section/<section_name>/<subject_name>', methods=['POST'])
 def remove_teacher_from_section(section_name, subject_name):
     init_session()
     for section in session['sections']:
@@ -697,13 +1262,14 @@ def remove_teacher_from_section(section_name, subject_name):
             for assignment in section.get('subject_assignments', []):
                 if assignment['subject'] == subject_name:
                     assignment['teacher'] = None
+                    assignment['batch_teachers'] = []
                     break
             break
     session.modified = True
     flash(f'Removed teacher from {subject_name} in {section_name}.', 'success')
-    return redirect(url_for('sections'))
+    return redirect(url_for('.sections'))
 
-@app.route('/remove_teacher_from_subject/<subject_name>/<teacher_name>', methods=['POST'])
+@bp.route('/remove_teacher_from_subject/<subject_name>/<teacher_name>', methods=['POST'])
 def remove_teacher_from_subject(subject_name, teacher_name):
     init_session()
     for subject in session['subjects']:
@@ -713,14 +1279,11 @@ def remove_teacher_from_subject(subject_name, teacher_name):
                 session.modified = True
                 flash(f'Removed {teacher_name} from {subject_name}.', 'success')
             break
-    return redirect(url_for('subjects'))
+    return redirect(url_for('.subjects'))
 
-@app.route('/export_data')
+@bp.route('/export_data')
 def export_data():
     """Export all session data as a JSON file"""
-    import json
-    import time
-    from flask import Response
     
     init_session()
     
@@ -728,8 +1291,11 @@ def export_data():
     export_data = {
         'teachers': session.get('teachers', []),
         'subjects': session.get('subjects', []),
+        'rooms': session.get('rooms', []),
+        'week': session.get('week'),
+        'load_policy': session.get('load_policy', 'flexible'),
         'sections': session.get('sections', []),
-        'saved_timetables': session.get('saved_timetables', []),
+        'saved_timetables': current_space().store.all(session['store_id']),
         'generated_sections': session.get('generated_sections', []),
         'export_timestamp': int(time.time()),
         'version': '1.0'
@@ -745,10 +1311,10 @@ def export_data():
         headers={'Content-Disposition': f'attachment; filename={filename}'}
     )
 
-@app.route('/import_data', methods=['GET', 'POST'])
+@bp.route('/import_data', methods=['GET', 'POST'])
 def import_data():
     """Import data from uploaded JSON file"""
-    import json
+    from generator import LOAD_POLICIES
     
     init_session()
     
@@ -757,16 +1323,16 @@ def import_data():
     
     if 'file' not in request.files:
         flash('No file selected', 'error')
-        return redirect(url_for('import_data'))
+        return redirect(url_for('.import_data'))
     
     file = request.files['file']
     if file.filename == '' or file.filename is None:
         flash('No file selected', 'error')
-        return redirect(url_for('import_data'))
+        return redirect(url_for('.import_data'))
     
     if not file.filename.lower().endswith('.json'):
         flash('Please upload a JSON file', 'error')
-        return redirect(url_for('import_data'))
+        return redirect(url_for('.import_data'))
     
     try:
         # Read and parse JSON data
@@ -778,13 +1344,22 @@ def import_data():
         for field in required_fields:
             if field not in imported_data:
                 flash(f'Invalid file format: missing {field} data', 'error')
-                return redirect(url_for('import_data'))
+                return redirect(url_for('.import_data'))
         
         # Import data into session
         session['teachers'] = imported_data['teachers']
         session['subjects'] = imported_data['subjects']
         session['sections'] = imported_data['sections']
-        session['saved_timetables'] = imported_data['saved_timetables']
+        current_space().store.replace_all(session['store_id'], imported_data['saved_timetables'])
+        session['rooms'] = imported_data.get('rooms', [])
+        if imported_data.get('week'):
+            session['week'] = imported_data['week']
+        else:
+            session.pop('week', None)
+        if imported_data.get('load_policy') in LOAD_POLICIES:
+            session['load_policy'] = imported_data['load_policy']
+        else:
+            session.pop('load_policy', None)
         
         # Import generated sections if available
         if 'generated_sections' in imported_data:
@@ -800,64 +1375,41 @@ def import_data():
         summary.append(f"{len(imported_data['saved_timetables'])} saved timetables")
         
         flash(f'Successfully imported: {", ".join(summary)}', 'success')
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
         
     except json.JSONDecodeError:
         flash('Invalid JSON file format', 'error')
-        return redirect(url_for('import_data'))
+        return redirect(url_for('.import_data'))
     except Exception as e:
         flash(f'Error importing file: {str(e)}', 'error')
-        return redirect(url_for('import_data'))
+        return redirect(url_for('.import_data'))
 
-@app.route('/view_saved_timetable/<int:saved_id>')
+@bp.route('/view_saved_timetable/<int:saved_id>')
 def view_saved_timetable(saved_id):
     """View a saved timetable in read-only mode"""
+    from conflicts import detect_teacher_conflicts, get_conflict_summary
+    from exporter import format_timetable_for_web
     init_session()
     
-    saved_timetable = next((st for st in session['saved_timetables'] if st['id'] == saved_id), None)
+    saved_timetable = current_space().store.get(session['store_id'], saved_id)
     if not saved_timetable:
         flash('Saved timetable not found.', 'error')
-        return redirect(url_for('saved_timetables'))
+        return redirect(url_for('.saved_timetables'))
+    
+    page_version = content_version('saved', saved_timetable, session['teachers'], session['subjects'],
+                                   session['rooms'], session.get('week'))
+    not_modified = not_modified_response(page_version)
+    if not_modified:
+        return not_modified
     
     # Reconstruct sections from saved timetable data for display
-    teachers = {t['name']: Teacher(t['name'], t['max_load']) for t in session['teachers']}
+    teachers = {t['name']: build_teacher(t) for t in session['teachers']}
     
     subject_templates = {}
     for subject_data in session['subjects']:
         subject_templates[subject_data['name']] = subject_data
     
-    sections = []
-    for section_data in saved_timetable['sections']:
-        section_subject_instances = {}
-        subject_assignments = []
-        
-        for assignment in section_data.get('subject_assignments', []):
-            subject_name = assignment['subject']
-            teacher_name = assignment['teacher']
-            
-            if subject_name in subject_templates and teacher_name in teachers:
-                template = subject_templates[subject_name]
-                subject_instance = Subject(
-                    template['name'],
-                    template['periods_per_week'],
-                    template['is_lab'],
-                    template['block_size']
-                )
-                subject_instance.teacher = teachers[teacher_name]
-                section_subject_instances[subject_name] = subject_instance
-                subject_assignments.append((subject_instance, teachers[teacher_name]))
-        
-        section = Section(section_data['name'], section_data['year'], subject_assignments)
-        
-        for day in range(6):
-            for period in range(7):
-                stored_subject = section_data['timetable'][day][period]
-                if stored_subject:
-                    subject_name = stored_subject['name']
-                    if subject_name in section_subject_instances:
-                        section.timetable[day][period] = section_subject_instances[subject_name]
-        
-        sections.append(section)
+    sections = restore_sections(saved_timetable['sections'], teachers, subject_templates, build_rooms(session['rooms']), build_week())
     
     conflicts = detect_teacher_conflicts(sections)
     conflict_summary = get_conflict_summary(conflicts)
@@ -867,117 +1419,76 @@ def view_saved_timetable(saved_id):
         timetable_data = format_timetable_for_web(section)
         timetables.append(timetable_data)
     
-    return render_template('view_saved_timetable.html', 
-                         timetables=timetables,
-                         conflicts=conflict_summary,
-                         has_conflicts=len(conflicts) > 0,
-                         saved_id=saved_id,
-                         saved_name=saved_timetable['name'])
+    return versioned_response(render_template('view_saved_timetable.html', 
+                                              timetables=timetables,
+                                              conflicts=conflict_summary,
+                                              has_conflicts=len(conflicts) > 0,
+                                              saved_id=saved_id,
+                                              saved_name=saved_timetable['name']), page_version)
 
-@app.route('/regenerate_saved_timetable/<int:saved_id>')
+@bp.route('/regenerate_saved_timetable/<int:saved_id>')
 def regenerate_saved_timetable(saved_id):
-    """Regenerate a saved timetable with new randomization"""
+    """
+    Regenerate a saved timetable with new randomization, or with ?mode=repair keep
+    its still-valid placements and only re-place what changed or conflicts
+    """
     init_session()
+    repair = request.args.get('mode') == 'repair'
     
-    saved_timetable = next((st for st in session['saved_timetables'] if st['id'] == saved_id), None)
+    saved_timetable = current_space().store.get(session['store_id'], saved_id)
     if not saved_timetable:
         flash('Saved timetable not found.', 'error')
-        return redirect(url_for('saved_timetables'))
+        return redirect(url_for('.saved_timetables'))
     
     if not session['sections']:
         flash('No sections available. Cannot regenerate.', 'error')
-        return redirect(url_for('sections'))
+        return redirect(url_for('.sections'))
     
     try:
         for teacher_data in session['teachers']:
             teacher_data['current_load'] = 0
         
-        teachers = {t['name']: Teacher(t['name'], t['max_load']) for t in session['teachers']}
+        teachers = {t['name']: build_teacher(t) for t in session['teachers']}
         subject_templates = {}
         for subject_data in session['subjects']:
             subject_templates[subject_data['name']] = subject_data
-            
-        sections = []
-        for section_data in session['sections']:
-            subject_assignments = []
-            for assignment in section_data.get('subject_assignments', []):
-                subject_name = assignment['subject']
-                teacher_name = assignment['teacher']
-                
-                if subject_name in subject_templates and teacher_name:
-                    template = subject_templates[subject_name]
-                    subject_instance = Subject(
-                        template['name'],
-                        template['periods_per_week'],
-                        template['is_lab'],
-                        template['block_size']
-                    )
-                    
-                    teacher_obj = teachers.get(teacher_name)
-                    if teacher_obj:
-                        subject_instance.teacher = teacher_obj
-                        subject_assignments.append((subject_instance, teacher_obj))
-                        
-            section = Section(section_data['name'], section_data['year'], subject_assignments)
-            sections.append(section)
+        rooms = build_rooms(session['rooms'])
+        week = build_week()
         
-        generated_sections = generate_timetable(sections)
+        # Locked cells stored with the section configuration survive regeneration
+        sections = build_sections_from_config(session['sections'], teachers, subject_templates, rooms, week)
+        generated_sections, load_report = run_generation(
+            sections, load_policy=session.get('load_policy', 'flexible'),
+            warm_start=grid_names(saved_timetable['sections']) if repair else None)
         
-        session['generated_sections'] = []
-        for section in generated_sections:
-            subject_assignments = []
-            for subject in section.subjects:
-                if subject.teacher:
-                    subject_assignments.append({
-                        'subject': subject.name,
-                        'teacher': subject.teacher.name
-                    })
-            
-            section_data = {
-                'name': section.name,
-                'year': section.year,
-                'subject_assignments': subject_assignments,
-                'timetable': []
-            }
-            
-            for day in range(6):
-                day_schedule = []
-                for period in range(7):
-                    cell = section.timetable[day][period]
-                    if cell:
-                        day_schedule.append({
-                            'name': cell.name,
-                            'is_lab': cell.is_lab,
-                            'teacher': cell.teacher.name if cell.teacher else ''
-                        })
-                    else:
-                        day_schedule.append(None)
-                section_data['timetable'].append(day_schedule)
-            
-            session['generated_sections'].append(section_data)
+        session['generated_sections'] = serialize_sections(generated_sections)
+        session['load_report'] = load_report
         
-        session['saved_timetables'] = [st for st in session['saved_timetables'] if st['id'] != saved_id]
+        current_space().store.delete(session['store_id'], saved_id)
         
-        import time
         new_timestamp = int(time.time())
         new_saved_timetable = {
             'id': new_timestamp,
-            'name': f"Regenerated - {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(new_timestamp))}",
+            'name': f"{'Repaired' if repair else 'Regenerated'} - {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(new_timestamp))}",
             'sections': session['generated_sections'].copy(),
             'created_at': new_timestamp
         }
         
-        session['saved_timetables'].append(new_saved_timetable)
+        new_saved_id = current_space().store.add(session['store_id'], new_saved_timetable)
         session.modified = True
         
-        flash('Timetable regenerated successfully with new randomization!', 'success')
-        return redirect(url_for('view_saved_timetable', saved_id=new_timestamp))
+        if repair:
+            unchanged = count_unchanged_cells(saved_timetable['sections'], session['generated_sections'])
+            flash(f'Timetable repaired: {unchanged} period(s) kept from the saved version.', 'success')
+        else:
+            flash('Timetable regenerated successfully with new randomization!', 'success')
+        return redirect(url_for('.view_saved_timetable', saved_id=new_saved_id))
         
     except Exception as e:
         flash(f'Error regenerating timetable: {str(e)}', 'error')
-        return redirect(url_for('saved_timetables'))
+        return redirect(url_for('.saved_timetables'))
 
-@app.route('/reset_all_data', methods=['POST'])
+@bp.route('/reset_all_data', methods=['POST'])
 def reset_all_data():
     """Reset all data - clears teachers, subjects, sections, saved timetables, and generated sections"""
     init_session()
@@ -985,7 +1496,12 @@ def reset_all_data():
     session['teachers'] = []
     session['subjects'] = []
     session['sections'] = []
-    session['saved_timetables'] = []
+    current_space().store.clear(session['store_id'])
+    current_space().journals.discard(session['store_id'])
+    session['rooms'] = []
+    session.pop('week', None)
+    session.pop('load_policy', None)
+    session.pop('load_report', None)
     if 'generated_sections' in session:
         del session['generated_sections']
     session.modified = True
@@ -993,5 +1509,139 @@ def reset_all_data():
     flash('All data has been reset successfully.', 'success')
     return jsonify({'success': True, 'message': 'All data has been reset successfully.'})
 
+@bp.route('/workspace')
+def workspace():
+    """The institution workspace the browser joined, or forms to create or join one"""
+    init_session()
+    space = current_space()
+    return render_template('workspace.html', workspace=space if space.id else None,
+                           saved_count=space.store.count(session['store_id']),
+                           queued=services().generation_jobs.queued(space.lane) if space.id else 0)
+
+@bp.route('/workspace/create', methods=['POST'])
+def create_workspace():
+    """Start a workspace for an institution from this browser's data"""
+    init_session()
+    name = request.form.get('name', '').strip()
+    if not name:
+        flash('Workspace name is required.', 'error')
+        return redirect(url_for('.workspace'))
+    if session.get('workspace'):
+        flash('Leave your current workspace before creating another.', 'error')
+        return redirect(url_for('.workspace'))
+    
+    space = services().workspaces.create(name, {key: session[key] for key in SHARED_KEYS if key in session})
+    # Saved timetables come along, so the workspace starts with everything this browser had
+    space.store.replace_all(space.id, services().personal_space.store.all(session['store_id']))
+    enter_workspace(session, space)
+    flash(f'Workspace {name} created. Share its join code with your colleagues.', 'success')
+    return redirect(url_for('.workspace'))
+
+@bp.route('/workspace/join', methods=['POST'])
+def join_workspace():
+    """Join an institution's workspace with its join code"""
+    init_session()
+    space = services().workspaces.find(request.form.get('join_code'))
+    if not space:
+        flash('No workspace has that join code.', 'error')
+        return redirect(url_for('.workspace'))
+    if session.get('workspace') == space.id:
+        flash(f'You are already in {space.name}.', 'warning')
+        return redirect(url_for('.workspace'))
+    
+    if session.get('workspace'):
+        leave_workspace(session)
+    enter_workspace(session, space)
+    flash(f'You joined {space.name}. Your own data is kept aside until you leave.', 'success')
+    return redirect(url_for('.index'))
+
+@bp.route('/workspace/leave', methods=['POST'])
+def leave_workspace_view():
+    """Go back to this browser's own data"""
+    init_session()
+    if session.get('workspace'):
+        leave_workspace(session)
+        flash('You left the workspace. Your own data is back.', 'success')
+    return redirect(url_for('.workspace'))
+
+def etag_response(payload):
+    """Compact JSON response with a strong ETag from its content hash; 304 when the client's copy is current"""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(hashlib.sha256(body.encode('utf-8')).hexdigest())
+    # Timetables belong to the session, so caches must revalidate and keep copies per user
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+@bp.route('/api/sections/<section_name>/timetable')
+def api_section_timetable(section_name):
+    """One section's grid as subject names plus a legend of its subjects"""
+    init_session()
+    
+    section_data = next((s for s in session.get('generated_sections', []) if s['name'] == section_name), None)
+    if not section_data:
+        return jsonify({'success': False, 'message': 'Section not found'}), 404
+    
+    week = build_week()
+    teacher_names = section_teacher_names(section_data)
+    subjects = {}
+    grid = []
+    for row in section_data['timetable']:
+        grid.append([cell['name'] if cell else None for cell in row])
+        for cell in row:
+            if cell and cell['name'] not in subjects:
+                subjects[cell['name']] = {
+                    'teachers': teacher_names.get(cell['name'], [cell.get('teacher')]),
+                    'is_lab': cell.get('is_lab', False),
+                    'block_size': cell.get('block_size', 1),
+                    'rooms': [room for room in cell.get('batch_rooms') or [cell.get('room')] if room]
+                }
+    
+    return etag_response({
+        'section': section_data['name'],
+        'year': section_data['year'],
+        'days': week.day_names[:len(grid)],
+        'lunch_position': week.lunch_position_for(section_data['year']),
+        'subjects': subjects,
+        'grid': grid,
+        'locked': sorted({(slot['day'], slot['period']) for slot in section_data.get('locked_slots', [])})
+    })
+
+@bp.route('/api/teachers/<teacher_name>/timetable')
+def api_teacher_timetable(teacher_name):
+    """A teacher's week across all sections; each cell lists the (section, subject) pairs taught then"""
+    init_session()
+    
+    teacher_data = next((t for t in session['teachers'] if t['name'] == teacher_name), None)
+    if not teacher_data:
+        return jsonify({'success': False, 'message': 'Teacher not found'}), 404
+    
+    week = build_week()
+    return etag_response({
+        'teacher': teacher_name,
+        'days': week.day_names,
+        'grid': teacher_grid(session.get('generated_sections', []), teacher_name, week),
+        'unavailable': sorted(build_teacher(teacher_data).unavailable)
+    })
+
+@bp.route('/api/conflicts')
+def api_conflicts():
+    """Teacher and room conflicts in the current timetable"""
+    from conflicts import detect_teacher_conflicts, get_conflict_summary
+    init_session()
+    
+    teachers = {t['name']: build_teacher(t) for t in session['teachers']}
+    subject_templates = {subject_data['name']: subject_data for subject_data in session['subjects']}
+    sections = restore_sections(session.get('generated_sections', []), teachers, subject_templates,
+                                build_rooms(session['rooms']), build_week())
+    conflicts = detect_teacher_conflicts(sections)
+    
+    return etag_response({
+        'count': len(conflicts),
+        'conflicts': get_conflict_summary(conflicts) if conflicts else []
+    })
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    dev_app = create_app('development')
+    dev_app.run(host='0.0.0.0', port=5000, debug=dev_app.config['DEBUG'], use_reloader=dev_app.config['USE_RELOADER'])
@@ -0,0 +1,222 @@
+"""
+Static asset pipeline: vendored third-party files plus the app's own CSS/JS, bundled,
+minified and written to static/dist under content-fingerprinted names.
+
+Bundles are built ahead of time, not when the app starts: ``python assets.py vendor``
+downloads the third-party files into static/vendor and builds static/dist (the deployment
+build step runs it), and ``python assets.py`` rebuilds static/dist from what is already
+there. The app only reads static/dist/manifest.json. Without it (a fresh checkout) pages
+load each source file on its own, from the public CDN for files not vendored yet.
+"""
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import re
+import sys
+import urllib.request
+
+# Vendored file (relative to static/) -> where it is downloaded from
+VENDOR_ASSETS = {
+    'vendor/bootstrap/bootstrap-agent-dark-theme.min.css': 'https://cdn.replit.com/agent/bootstrap-agent-dark-theme.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'vendor/fontawesome/css/all.min.css': 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css',
+    'vendor/animate/animate.min.css': 'https://cdnjs.cloudflare.com/ajax/libs/animate.css/4.1.1/animate.min.css',
+    'vendor/lordicon/lordicon.js': 'https://cdn.lordicon.com/lordicon.js',
+}
+# Font Awesome loads its webfonts relative to its stylesheet
+for font in ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility'):
+    for extension in ('woff2', 'ttf'):
+        VENDOR_ASSETS[f'vendor/fontawesome/webfonts/{font}.{extension}'] = \
+            f'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/webfonts/{font}.{extension}'
+# Animated icons used by the navbar and the home page
+for icon in ('wloilxuq', 'eszyyflr', 'kiynvdns', 'dxjqoygy', 'wxnxiano'):
+    VENDOR_ASSETS[f'vendor/lordicon/icons/{icon}.json'] = f'https://cdn.lordicon.com/{icon}.json'
+
+# Bundle name -> source files (relative to static/) in load order
+BUNDLES = {
+    'app.css': [
+        'vendor/bootstrap/bootstrap-agent-dark-theme.min.css',
+        'vendor/fontawesome/css/all.min.css',
+        'vendor/animate/animate.min.css',
+        'css/base.css',
+    ],
+    'app.js': [
+        'vendor/lordicon/lordicon.js',
+        'vendor/bootstrap/bootstrap.bundle.min.js',
+        'js/base.js',
+    ],
+}
+
+DIST_DIR = 'dist'
+MANIFEST = f'{DIST_DIR}/manifest.json'
+# Fingerprinted files never change, so browsers may keep them for a year
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+CSS_URL = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};:,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def minify_js(js):
+    """Conservative minification: drop indentation, blank lines and whole-line // comments"""
+    lines = (line.strip() for line in js.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+def rebase_css_urls(css, source, bundle_path):
+    """Rewrite relative url() references so they still resolve from the bundle's location"""
+    source_dir = posixpath.dirname(source)
+    bundle_dir = posixpath.dirname(bundle_path)
+
+    def rebase(match):
+        quote, url = match.groups()
+        if re.match(r'^(?:[a-z]+:|/|#)', url):
+            return match.group(0)
+        target = posixpath.normpath(posixpath.join(source_dir, url))
+        return f'url({quote}{posixpath.relpath(target, bundle_dir)}{quote})'
+    return CSS_URL.sub(rebase, css)
+
+
+class AssetPipeline:
+    """Builds the bundles into static/dist and maps bundle names to their fingerprinted URLs"""
+    def __init__(self, static_folder):
+        self.static_folder = static_folder
+        self.manifest = {}  # Bundle name -> fingerprinted path relative to static/
+        self.missing = {}  # Bundle name -> CDN URLs of vendored sources not downloaded yet
+        self.bundled = False  # Whether a built manifest was found
+
+    def source_path(self, name):
+        return os.path.join(self.static_folder, *name.split('/'))
+
+    def build(self):
+        """(Re)build every bundle, keeping only the current fingerprinted file of each"""
+        os.makedirs(self.source_path(DIST_DIR), exist_ok=True)
+        for bundle, sources in BUNDLES.items():
+            stem, extension = bundle.rsplit('.', 1)
+            parts = []
+            self.missing[bundle] = []
+            for source in sources:
+                path = self.source_path(source)
+                if not os.path.exists(path):
+                    self.missing[bundle].append(VENDOR_ASSETS[source])
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                if extension == 'css':
+                    # Rebase against the dist directory (the file name does not matter here)
+                    content = rebase_css_urls(content, source, f'{DIST_DIR}/{bundle}')
+                    content = content if source.endswith('.min.css') else minify_css(content)
+                elif not source.endswith('.min.js') and source.startswith('js/'):
+                    content = minify_js(content)
+                parts.append(content)
+            # A newline (and for scripts a semicolon) keeps concatenated sources apart
+            output = ('\n' if extension == 'css' else ';\n').join(parts).encode('utf-8')
+            digest = hashlib.sha256(output).hexdigest()[:12]
+            name = f'{DIST_DIR}/{stem}.{digest}.{extension}'
+            if not os.path.exists(self.source_path(name)):
+                tmp_path = f'{self.source_path(name)}.{os.getpid()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(output)
+                os.replace(tmp_path, self.source_path(name))
+            self.remove_stale(stem, extension, name)
+            self.manifest[bundle] = name
+            if self.missing[bundle]:
+                logging.warning("Assets not vendored for %s, using CDN: %s", bundle, ', '.join(self.missing[bundle]))
+        with open(self.source_path(MANIFEST), 'w', encoding='utf-8') as f:
+            json.dump({'bundles': self.manifest, 'missing': self.missing}, f, indent=2)
+        self.bundled = True
+        return self.manifest
+
+    def load(self):
+        """Read the manifest written by build(); returns whether one was found"""
+        try:
+            with open(self.source_path(MANIFEST), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        self.manifest = data.get('bundles', {})
+        self.missing = data.get('missing', {})
+        self.bundled = set(self.manifest) == set(BUNDLES)
+        return self.bundled
+
+    def source_urls(self, bundle):
+        """Unbundled fallback: each source of a bundle from static/, or its CDN URL if not vendored"""
+        from flask import url_for
+
+        return [url_for('static', filename=source) if os.path.exists(self.source_path(source))
+                else VENDOR_ASSETS[source] for source in BUNDLES[bundle]]
+
+    def remove_stale(self, stem, extension, current):
+        pattern = re.compile(rf'^{re.escape(stem)}\.[0-9a-f]{{12}}\.{re.escape(extension)}$')
+        for filename in os.listdir(self.source_path(DIST_DIR)):
+            if pattern.match(filename) and f'{DIST_DIR}/{filename}' != current:
+                try:
+                    os.remove(os.path.join(self.source_path(DIST_DIR), filename))
+                except OSError:
+                    pass
+
+    def init_app(self, app):
+        """Load the built bundles and expose ``asset_urls(bundle)`` and ``vendor_url(name)`` to templates"""
+        from flask import request, url_for
+
+        if not self.load():
+            logging.info("Asset bundles not built, serving unbundled sources; run 'python assets.py' to build them")
+
+        def asset_urls(bundle):
+            if not self.bundled:
+                return self.source_urls(bundle)
+            # CDN fallbacks come first so they keep their place before the app's own code
+            return self.missing.get(bundle, []) + [url_for('static', filename=self.manifest[bundle])]
+
+        def vendor_url(name):
+            # A single vendored file (e.g. an icon) referenced directly from a template
+            if os.path.exists(self.source_path(name)):
+                return url_for('static', filename=name)
+            return VENDOR_ASSETS[name]
+
+        def cache_fingerprinted(response):
+            if request.path.startswith(f'{app.static_url_path}/{DIST_DIR}/') and response.status_code == 200:
+                response.cache_control.no_cache = None
+                response.cache_control.public = True
+                response.cache_control.max_age = IMMUTABLE_MAX_AGE
+                response.cache_control.immutable = True
+            return response
+
+        app.add_template_global(asset_urls)
+        app.add_template_global(vendor_url)
+        app.after_request(cache_fingerprinted)
+        return self
+
+
+def vendor(static_folder, force=False):
+    """Download the third-party assets into static/vendor; returns the files fetched"""
+    fetched = []
+    for name, url in VENDOR_ASSETS.items():
+        path = os.path.join(static_folder, *name.split('/'))
+        if os.path.exists(path) and not force:
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        with open(path, 'wb') as f:
+            f.write(data)
+        fetched.append(name)
+    return fetched
+
+
+if __name__ == '__main__':
+    static = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    if sys.argv[1:2] == ['vendor']:
+        for name in vendor(static, force='--force' in sys.argv):
+            print(f'Downloaded {name}')
+    manifest = AssetPipeline(static).build()
+    for bundle, name in manifest.items():
+        print(f'{bundle} -> {name}')
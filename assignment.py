@@ -0,0 +1,263 @@
+"""
+Automatic teacher assignment for section subjects.
+Balances teacher loads across sections with a min-cost flow before timetabling.
+"""
+import heapq
+from collections import deque
+
+from models import year_level
+
+# Cost per period above a teacher's max load (dominates every balancing cost)
+OVERLOAD_COST = 10000
+# Cost per period once a teacher already takes SPREAD_FREE_PERIODS periods of one year
+YEAR_SPREAD_COST = 20
+SPREAD_FREE_PERIODS = 8
+
+
+class MinCostFlow:
+    """Successive shortest path min-cost flow on a residual graph"""
+    def __init__(self):
+        self.graph = []  # node -> list of edge indices
+        self.edges = []  # [to, capacity, cost]
+        self.flow = []
+
+    def add_node(self):
+        self.graph.append([])
+        return len(self.graph) - 1
+
+    def add_edge(self, u, v, capacity, cost):
+        """Add an edge and its residual twin, returning the edge index"""
+        self.graph[u].append(len(self.edges))
+        self.edges.append([v, capacity, cost])
+        self.flow.append(0)
+        self.graph[v].append(len(self.edges))
+        self.edges.append([u, 0, -cost])
+        self.flow.append(0)
+        return len(self.edges) - 2
+
+    def residual(self, e):
+        return self.edges[e][1] - self.flow[e]
+
+    def potentials(self, source):
+        """Shortest distances from source by queue-based Bellman-Ford (costs may be negative)"""
+        dist = [None] * len(self.graph)
+        in_queue = [False] * len(self.graph)
+        dist[source] = 0
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            in_queue[u] = False
+            for e in self.graph[u]:
+                v, _, cost = self.edges[e]
+                if self.residual(e) > 0 and (dist[v] is None or dist[u] + cost < dist[v]):
+                    dist[v] = dist[u] + cost
+                    if not in_queue[v]:
+                        in_queue[v] = True
+                        queue.append(v)
+        return [d if d is not None else 0 for d in dist]
+
+    def solve(self, source, sink, max_flow):
+        """
+        Push up to max_flow units from source to sink at minimum cost, returning (flow, cost).
+
+        One Bellman-Ford pass gives node potentials; after that each round runs Dijkstra on
+        the reduced costs (cost + h[u] - h[v], never negative), updates the potentials and
+        pushes a blocking flow along all the zero reduced cost paths, which are exactly the
+        shortest ones. The unit-capacity load edges then no longer cost a search per period.
+        """
+        total_flow = total_cost = 0
+        h = self.potentials(source)
+        n = len(self.graph)
+        while total_flow < max_flow:
+            dist = [None] * n
+            dist[source] = 0
+            heap = [(0, source)]
+            while heap:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                for e in self.graph[u]:
+                    if self.edges[e][1] - self.flow[e] <= 0:
+                        continue
+                    v, _, cost = self.edges[e]
+                    nd = d + cost + h[u] - h[v]
+                    if dist[v] is None or nd < dist[v]:
+                        dist[v] = nd
+                        heapq.heappush(heap, (nd, v))
+            if dist[sink] is None:
+                break
+            for v in range(n):
+                if dist[v] is not None:
+                    h[v] += dist[v]
+
+            # Every path of zero reduced cost is now a shortest path: push a blocking flow along them
+            pushed = self.blocking_flow(source, sink, h, max_flow - total_flow)
+            total_flow += pushed
+            # h[sink] - h[source] is the real cost of each of those paths
+            total_cost += pushed * (h[sink] - h[source])
+        return total_flow, total_cost
+
+    def admissible(self, e, u, h):
+        """Whether edge e (leaving u) has residual capacity and zero reduced cost"""
+        v, capacity, cost = self.edges[e]
+        return capacity - self.flow[e] > 0 and cost + h[u] - h[v] == 0
+
+    def blocking_flow(self, source, sink, h, limit):
+        """Dinic phases restricted to admissible edges; returns the units pushed (at most ``limit``)"""
+        pushed = 0
+        while pushed < limit:
+            # Levels over admissible edges keep every path short and the search acyclic
+            level = [None] * len(self.graph)
+            level[source] = 0
+            queue = deque([source])
+            while queue:
+                u = queue.popleft()
+                for e in self.graph[u]:
+                    v = self.edges[e][0]
+                    if level[v] is None and self.admissible(e, u, h):
+                        level[v] = level[u] + 1
+                        queue.append(v)
+            if level[sink] is None:
+                break
+            next_edge = [0] * len(self.graph)  # Current-arc pointers: edges already exhausted are skipped
+            while pushed < limit:
+                # Walk one augmenting path source -> sink through the level graph
+                path = []
+                u = source
+                while u != sink:
+                    edges = self.graph[u]
+                    while next_edge[u] < len(edges):
+                        e = edges[next_edge[u]]
+                        v = self.edges[e][0]
+                        if level[v] == level[u] + 1 and self.admissible(e, u, h):
+                            break
+                        next_edge[u] += 1
+                    if next_edge[u] == len(edges):
+                        # Dead end: retreat and never try this node again in this phase
+                        if u == source:
+                            break
+                        level[u] = None
+                        e = path.pop()
+                        u = self.edges[e ^ 1][0]
+                        next_edge[u] += 1
+                        continue
+                    path.append(e)
+                    u = v
+                if u != sink:
+                    break
+                push = min([limit - pushed] + [self.residual(e) for e in path])
+                for e in path:
+                    self.flow[e] += push
+                    self.flow[e ^ 1] -= push
+                pushed += push
+        return pushed
+
+def assign_teachers(section_configs, subject_templates, teachers, overwrite=False):
+    """
+    Compute a balanced teacher for every section subject from the subject's qualified teachers.
+
+    Each section subject needs its periods per week of teaching. Teachers take periods
+    at a cost that grows with their relative load, periods above max load cost
+    OVERLOAD_COST each, and a teacher taking many periods of the same year is penalised
+    so teachers are spread across years. Existing assignments (and batch teachers) are
+    kept and counted unless ``overwrite`` is set. Returns (assignments, loads, unassigned)
+    where assignments maps (section name, subject name) to a teacher name.
+    """
+    loads = {name: 0 for name in teachers}
+    year_loads = {}
+    demands = []
+
+    for section_data in section_configs:
+        year = year_level(section_data['year']) or section_data['year']
+        existing = {a['subject']: a for a in section_data.get('subject_assignments', [])}
+        for subject_name in section_data.get('subject_names', []):
+            template = subject_templates.get(subject_name)
+            if not template:
+                continue
+            assignment = existing.get(subject_name, {})
+            periods = template['periods_per_week']
+            for batch_teacher in assignment.get('batch_teachers', []):
+                if batch_teacher in loads:
+                    loads[batch_teacher] += periods
+            if assignment.get('teacher') in loads and not overwrite:
+                loads[assignment['teacher']] += periods
+                year_loads[(assignment['teacher'], year)] = year_loads.get((assignment['teacher'], year), 0) + periods
+                continue
+            qualified = [name for name in template.get('teachers', []) if name in teachers]
+            demands.append((section_data['name'], subject_name, year, periods, qualified))
+
+    flow = MinCostFlow()
+    source, sink = flow.add_node(), flow.add_node()
+    teacher_nodes = {name: flow.add_node() for name in teachers}
+    teacher_year_nodes = {}
+    total_periods = sum(d[3] for d in demands)
+
+    # Teacher -> sink: one unit edge per period with a cost rising with relative load (convex)
+    for name, node in teacher_nodes.items():
+        max_load = teachers[name].max_load
+        for load in range(loads[name] + 1, max_load + 1):
+            flow.add_edge(node, sink, 1, (100 * load) // max(max_load, 1))
+        flow.add_edge(node, sink, total_periods, OVERLOAD_COST)
+
+    demand_edges = []
+    for section_name, subject_name, year, periods, qualified in demands:
+        demand_node = flow.add_node()
+        flow.add_edge(source, demand_node, periods, 0)
+        edges = {}
+        for name in qualified:
+            key = (name, year)
+            if key not in teacher_year_nodes:
+                # Teacher-year node: the first periods of a year are free, later ones penalised
+                teacher_year_nodes[key] = flow.add_node()
+                free = max(SPREAD_FREE_PERIODS - year_loads.get(key, 0), 0)
+                if free:
+                    flow.add_edge(teacher_year_nodes[key], teacher_nodes[name], free, 0)
+                flow.add_edge(teacher_year_nodes[key], teacher_nodes[name], total_periods, YEAR_SPREAD_COST)
+            edges[name] = flow.add_edge(demand_node, teacher_year_nodes[key], periods, 0)
+        demand_edges.append(edges)
+
+    flow.solve(source, sink, total_periods)
+
+    # Round the fractional split to one teacher per section subject (the one carrying most periods)
+    assignments = {}
+    unassigned = []
+    for (section_name, subject_name, year, periods, qualified), edges in zip(demands, demand_edges):
+        if not edges:
+            unassigned.append((section_name, subject_name))
+            continue
+        teacher_name = max(edges, key=lambda name: (flow.flow[edges[name]], -loads[name]))
+        assignments[(section_name, subject_name)] = teacher_name
+        loads[teacher_name] += periods
+
+    rebalance(assignments, demands, loads, teachers)
+    return assignments, loads, unassigned
+
+
+def load_cost(load, max_load):
+    """Cost of a teacher carrying ``load`` periods, mirroring the flow's convex edge costs"""
+    overload = max(load - max_load, 0)
+    return overload * OVERLOAD_COST + (100 * min(load, max_load) ** 2) // (2 * max(max_load, 1))
+
+
+def rebalance(assignments, demands, loads, teachers, max_rounds=10):
+    """Move rounded section subjects to other qualified teachers while that lowers the total load cost"""
+    for _ in range(max_rounds):
+        improved = False
+        for section_name, subject_name, year, periods, qualified in demands:
+            current = assignments.get((section_name, subject_name))
+            if current is None:
+                continue
+            for name in qualified:
+                if name == current:
+                    continue
+                before = (load_cost(loads[current], teachers[current].max_load) +
+                          load_cost(loads[name], teachers[name].max_load))
+                after = (load_cost(loads[current] - periods, teachers[current].max_load) +
+                         load_cost(loads[name] + periods, teachers[name].max_load))
+                if after < before:
+                    loads[current] -= periods
+                    loads[name] += periods
+                    assignments[(section_name, subject_name)] = current = name
+                    improved = True
+        if not improved:
+            break
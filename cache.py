@@ -0,0 +1,142 @@
+"""
+On-disk cache of generated solutions keyed by a fingerprint of the normalized problem.
+Keeps the best-scoring solution per problem and evicts the least recently used entries.
+Also a small in-memory cache for values derived from timetable data (conflicts, rendered fragments).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from problem import Solution
+
+
+def normalize(value):
+    """Convert a Problem (NamedTuples, tuples, frozensets) into plain, order-independent JSON data"""
+    if isinstance(value, tuple) and hasattr(value, '_asdict'):
+        return {key: normalize(item) for key, item in value._asdict().items()}
+    if isinstance(value, (set, frozenset)):
+        return sorted(normalize(item) for item in value)
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    return value
+
+
+def problem_fingerprint(problem, load_policy='flexible'):
+    """Stable SHA-256 fingerprint of a problem and the generation mode"""
+    data = normalize(problem)
+    # Section order does not change what a valid solution is
+    data['sections'] = sorted(data['sections'], key=lambda section: section['name'])
+    data['pinned'] = sorted(data['pinned'], key=lambda section: section['name'])
+    payload = json.dumps({'problem': data, 'load_policy': load_policy}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def solution_score(solution):
+    """Lower is better: periods above max load across all teachers"""
+    return solution.total_overload()
+
+
+class ResultCache:
+    """Best solution per problem fingerprint, stored as one JSON file each with LRU eviction"""
+    def __init__(self, directory, max_entries=256):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, fingerprint):
+        return os.path.join(self.directory, f'{fingerprint}.json')
+
+    def get(self, fingerprint):
+        """Return the cached Solution for a fingerprint (marking it recently used) or None"""
+        path = self.path(fingerprint)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # File mtime doubles as the LRU timestamp
+        except OSError:
+            pass
+        grids = {name: tuple(tuple(row) for row in grid) for name, grid in data['grids'].items()}
+        return Solution(grids, data['load_table'])
+
+    def store(self, fingerprint, solution):
+        """Store a solution unless an equal or better one is already cached; returns True when stored"""
+        score = solution_score(solution)
+        with self.lock:
+            existing = self.get(fingerprint)
+            if existing is not None and solution_score(existing) <= score:
+                return False
+            data = {
+                'grids': {name: [list(row) for row in grid] for name, grid in solution.grids.items()},
+                'load_table': solution.load_table,
+                'score': score,
+                'created_at': int(time.time())
+            }
+            # Write to a temporary file first so readers never see a partial entry
+            tmp_path = f'{self.path(fingerprint)}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path(fingerprint))
+            self.evict()
+        return True
+
+    def evict(self):
+        """Remove the least recently used entries above max_entries"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.max_entries, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        with self.lock:
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, name))
+
+
+class MemoCache:
+    """In-memory LRU of values computed from JSON data, keyed by a hash of that data"""
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        payload = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key, compute):
+        """The value cached under ``key``, computing and storing it with ``compute()`` on a miss"""
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        # Computed outside the lock; two threads missing together both compute, which is harmless
+        value = compute()
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
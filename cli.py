@@ -0,0 +1,292 @@
+"""
+Headless timetable generation from an /export_data file, for overnight searches and benchmarks.
+
+    python cli.py timetable_data.json -o out --mode full --seed 42 --workers 4 --time-budget 600
+
+Writes out/timetable.json (the input in export format with the generated timetable, so
+it can be imported back into the app), out/teachers.json (each teacher's week) and, with
+openpyxl installed, out/timetable.xlsx with a sheet per section and per teacher.
+Progress goes to stderr; stdout only gets the result line (and --print's timetables).
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import openpyxl
+    from openpyxl.styles import Alignment, Font, PatternFill
+except ImportError:  # openpyxl is optional; only the XLSX output needs it
+    openpyxl = None
+
+from cache import ResultCache
+from exporter import print_section_timetable
+from generator import generate_timetable_with_loads, LOAD_POLICIES
+from models import WeekConfig
+from serialization import (build_teacher, build_rooms, build_sections_from_config, restore_sections, grid_names,
+                           serialize_sections, find_affected_sections, teacher_grid)
+
+logger = logging.getLogger('cli')
+
+MODES = ('full', 'incremental', 'repair', 'cached')
+FORMATS = ('json', 'xlsx', 'teachers')
+
+
+class CommandError(Exception):
+    """A problem with the input or options, reported without a traceback"""
+
+
+def load_data(path):
+    """Read an /export_data file, checking the fields generation needs"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise CommandError(f'Cannot read {path}: {e}')
+    for field in ('teachers', 'subjects', 'sections'):
+        if field not in data:
+            raise CommandError(f'Invalid file format: missing {field} data')
+    if not data['sections']:
+        raise CommandError('No sections available. Add at least one section before generating.')
+    return data
+
+
+def generate_once(data, mode, load_policy, seed=None, executor=None, cache=None):
+    """One generation run over export data, mirroring the app's modes; returns (stored sections, load report)"""
+    teachers = {t['name']: build_teacher(t) for t in data['teachers']}
+    subject_templates = {subject_data['name']: subject_data for subject_data in data['subjects']}
+    rooms = build_rooms(data.get('rooms', []))
+    week = WeekConfig.from_dict(data.get('week'))
+    previous_sections = data.get('generated_sections') or []
+    if mode in ('incremental', 'repair') and not previous_sections:
+        raise CommandError(f'{mode} mode needs a generated timetable in the input file')
+
+    section_configs = data['sections']
+    pinned_sections = []
+    if mode == 'incremental':
+        affected = find_affected_sections(section_configs, previous_sections, subject_templates, teachers, week)
+        configured_names = {s['name'] for s in section_configs}
+        pinned_sections = restore_sections(
+            [s for s in previous_sections if s['name'] in configured_names and s['name'] not in affected],
+            teachers, subject_templates, rooms, week)
+        section_configs = [s for s in section_configs if s['name'] in affected]
+
+    sections = build_sections_from_config(section_configs, teachers, subject_templates, rooms, week)
+    load_report = []
+    if sections:
+        sections, load_report = generate_timetable_with_loads(
+            sections, pinned_sections, load_policy, cache=cache, prefer_cached=mode == 'cached',
+            warm_start=grid_names(previous_sections) if mode in ('incremental', 'repair') else None,
+            executor=executor, seed=seed)
+
+    # Keep the configured section order
+    section_order = {s['name']: i for i, s in enumerate(data['sections'])}
+    generated = sorted(list(sections) + pinned_sections, key=lambda s: section_order[s.name])
+    return generated, load_report
+
+
+def total_overload(load_report):
+    return sum(row['overload'] for row in load_report)
+
+
+def search(data, mode, load_policy, seed=None, workers=0, time_budget=0, cache=None, log=logger.info):
+    """
+    Generate until the time budget is used up, keeping the run with the least teacher
+    overload (a single run without a budget). Returns (sections, load report, stats).
+    """
+    executor = ProcessPoolExecutor(workers) if workers > 1 else None
+    started = time.monotonic()
+    best = None
+    runs = failures = 0
+    last_error = None
+    try:
+        while True:
+            run_seed = seed + runs * 100000 if seed is not None else None
+            runs += 1
+            run_started = time.monotonic()
+            try:
+                sections, load_report = generate_once(data, mode, load_policy, run_seed, executor, cache)
+            except CommandError:
+                raise
+            except Exception as e:
+                failures += 1
+                last_error = e
+                log(f'Run {runs} failed after {time.monotonic() - run_started:.1f}s')
+            else:
+                overload = total_overload(load_report)
+                log(f'Run {runs} finished in {time.monotonic() - run_started:.1f}s, {overload} periods over max load')
+                if best is None or overload < total_overload(best[1]):
+                    best = (sections, load_report)
+            elapsed = time.monotonic() - started
+            # Nothing beats a run without overload, and cached mode gives the same answer every time
+            if (elapsed >= time_budget or mode == 'cached' or
+                    (best is not None and not total_overload(best[1]))):
+                break
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if best is None:
+        raise last_error
+    stats = {'runs': runs, 'failed_runs': failures, 'seconds': round(time.monotonic() - started, 3),
+             'overload': total_overload(best[1])}
+    return best[0], best[1], stats
+
+
+def teacher_views(data, stored_sections, load_report):
+    """Every teacher's week with their load, keyed by teacher name"""
+    week = WeekConfig.from_dict(data.get('week'))
+    loads = {row['teacher']: row for row in load_report}
+    views = {}
+    for teacher_data in data['teachers']:
+        name = teacher_data['name']
+        views[name] = {
+            'days': week.day_names,
+            'grid': teacher_grid(stored_sections, name, week),
+            'load': loads.get(name, {}).get('load', 0),
+            'max_load': teacher_data['max_load'],
+            'unavailable': sorted(build_teacher(teacher_data).unavailable)
+        }
+    return views
+
+
+def write_json(path, payload):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+
+
+def sheet_title(workbook, title):
+    """A valid, unused worksheet title (at most 31 characters, none of []:*?/\\)"""
+    title = ''.join('_' if char in '[]:*?/\\' else char for char in title)[:31] or 'Sheet'
+    candidate, number = title, 2
+    while candidate in workbook.sheetnames:
+        suffix = f' ({number})'
+        candidate, number = title[:31 - len(suffix)] + suffix, number + 1
+    return candidate
+
+
+def write_grid_sheet(workbook, title, week, rows, lunch_position=None):
+    """A sheet with a day per row and a column per period, with a lunch column for sections"""
+    sheet = workbook.create_sheet(sheet_title(workbook, title))
+    header = ['Day'] + [f'Period {period + 1}' for period in range(week.periods_per_day)]
+    if lunch_position is not None:
+        header.insert(lunch_position + 1, 'LUNCH')
+    sheet.append(header)
+    for cell in sheet[1]:
+        cell.font = Font(bold=True)
+    for day, row in enumerate(rows):
+        values = [week.day_names[day]] + [value if week.is_teaching_slot(day, period) else ''
+                                          for period, value in enumerate(row)]
+        if lunch_position is not None:
+            values.insert(lunch_position + 1, 'LUNCH')
+        sheet.append(values)
+    lab_fill = PatternFill('solid', fgColor='DDEBF7')
+    for row in sheet.iter_rows(min_row=2):
+        for cell in row:
+            cell.alignment = Alignment(wrap_text=True, vertical='center')
+            if isinstance(cell.value, str) and cell.value.endswith('(Lab)'):
+                cell.fill = lab_fill
+    sheet.column_dimensions['A'].width = 12
+    return sheet
+
+
+def write_xlsx(path, data, stored_sections, load_report, views):
+    """Workbook with teacher loads, a sheet per section and a sheet per teacher"""
+    week = WeekConfig.from_dict(data.get('week'))
+    workbook = openpyxl.Workbook()
+    loads_sheet = workbook.active
+    loads_sheet.title = 'Loads'
+    loads_sheet.append(['Teacher', 'Load', 'Max load', 'Overload'])
+    for row in load_report:
+        loads_sheet.append([row['teacher'], row['load'], row['max_load'], row['overload']])
+
+    for section_data in stored_sections:
+        rows = [[f"{cell['name']}{' (Lab)' if cell.get('is_lab') else ''}\n{cell.get('teacher', '')}" if cell else ''
+                 for cell in row[:week.periods_per_day]] for row in section_data['timetable'][:week.days]]
+        write_grid_sheet(workbook, section_data['name'], week, rows, week.lunch_position_for(section_data['year']))
+    for name, view in views.items():
+        rows = [['\n'.join(f'{section} {subject}' for section, subject in cell) if cell else '' for cell in row]
+                for row in view['grid']]
+        write_grid_sheet(workbook, f'T - {name}', week, rows)
+    workbook.save(path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Generate timetables from an exported data file without the web app.')
+    parser.add_argument('input', help='JSON file saved with Export in the app')
+    parser.add_argument('-o', '--output', default='output', help='directory for the results (default: output)')
+    parser.add_argument('--mode', choices=MODES, default='full',
+                        help='full: from scratch; incremental: re-solve only changed sections; '
+                             'repair: keep what still fits of the file\'s timetable; cached: reuse the cached best')
+    parser.add_argument('--load-policy', choices=LOAD_POLICIES, help='default: the policy saved in the file')
+    parser.add_argument('--seed', type=int, help='make the search reproducible')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='processes solving independent departments in parallel (default: none)')
+    parser.add_argument('--time-budget', type=float, default=0,
+                        help='seconds to keep searching for a timetable with less teacher overload')
+    parser.add_argument('--cache', help='directory of the generation result cache (needed by --mode cached)')
+    parser.add_argument('--formats', default='json,teachers',
+                        help=f'comma-separated outputs from {", ".join(FORMATS)} (default: json,teachers)')
+    parser.add_argument('--print', action='store_true', help='also print each section\'s timetable')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every generation attempt to stderr')
+    args = parser.parse_args(argv)
+    args.formats = [name.strip() for name in args.formats.split(',') if name.strip()]
+    unknown = [name for name in args.formats if name not in FORMATS]
+    if unknown:
+        parser.error(f'unknown format(s): {", ".join(unknown)}')
+    if 'xlsx' in args.formats and openpyxl is None:
+        parser.error('XLSX output needs openpyxl (pip install openpyxl)')
+    if args.mode == 'cached' and not args.cache:
+        parser.error('--mode cached needs --cache')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, stream=sys.stderr,
+                        format='%(message)s')
+    try:
+        data = load_data(args.input)
+        load_policy = args.load_policy or data.get('load_policy') or 'flexible'
+        cache = ResultCache(args.cache) if args.cache else None
+        sections, load_report, stats = search(data, args.mode, load_policy, args.seed, args.workers,
+                                              args.time_budget, cache)
+    except CommandError as e:
+        print(f'Error: {e}', file=sys.stderr)
+        return 2
+    except Exception as e:
+        print(f'Error generating timetable: {e}', file=sys.stderr)
+        return 1
+
+    if args.print:
+        for section in sections:
+            print_section_timetable(section)
+
+    stored_sections = serialize_sections(sections)
+    os.makedirs(args.output, exist_ok=True)
+    written = []
+    if 'json' in args.formats:
+        result = dict(data, generated_sections=stored_sections, load_report=load_report, load_policy=load_policy,
+                      export_timestamp=int(time.time()),
+                      generation=dict(stats, mode=args.mode, seed=args.seed, workers=args.workers))
+        result.setdefault('saved_timetables', [])
+        write_json(os.path.join(args.output, 'timetable.json'), result)
+        written.append('timetable.json')
+    views = teacher_views(data, stored_sections, load_report)
+    if 'teachers' in args.formats:
+        write_json(os.path.join(args.output, 'teachers.json'), views)
+        written.append('teachers.json')
+    if 'xlsx' in args.formats:
+        write_xlsx(os.path.join(args.output, 'timetable.xlsx'), data, stored_sections, load_report, views)
+        written.append('timetable.xlsx')
+
+    print(f"Generated {len(sections)} sections in {stats['seconds']}s ({stats['runs']} run(s), "
+          f"{stats['overload']} periods over max load); wrote {', '.join(written)} to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Shared edit sessions for editing one timetable together.
+
+A room holds the timetable and configuration everyone in it edits, a version number
+bumped on every change, and the version at which each cell last changed. A change made
+against an older version is accepted unless one of the cells it touches changed since
+then (optimistic concurrency per cell). Accepted changes are broadcast as events that
+Server-Sent Events streams wait on.
+"""
+import copy
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+# Idle rooms are dropped after this many seconds
+ROOM_TTL = 12 * 3600
+# Events kept per room for clients catching up after a reconnect
+EVENT_HISTORY = 500
+# Seconds between keep-alive comments on an idle event stream
+HEARTBEAT_INTERVAL = 15
+# Seconds an event stream stays open without a change; browsers reconnect on their own
+STREAM_MAX_IDLE = 30 * 60
+
+
+class StaleEdit(Exception):
+    """Raised when an edit touches cells changed since the version the client last saw"""
+    def __init__(self, cells, version):
+        super().__init__('Someone else changed this part of the timetable. It has been refreshed; try again.')
+        self.cells = cells
+        self.version = version
+
+
+class EditRoom:
+    """One shared timetable under edit, with its version history and waiting event streams"""
+    def __init__(self, room_id, data, conflict_fn, journal=None):
+        self.id = room_id
+        self.data = copy.deepcopy(data)  # sections, teachers, subjects, rooms, week
+        self.conflict_fn = conflict_fn  # data -> set of conflict messages
+        self.journal = journal  # Optional EditJournal for undo/redo
+        if self.journal:
+            # The room's timetable only changes through the journaled edits below, so it is never re-validated
+            self.journal.start(self.data['sections'])
+        self.version = 0
+        self.cell_versions = {}  # (section, day, period) -> version of its last change
+        self.events = deque(maxlen=EVENT_HISTORY)
+        self.conflicts = conflict_fn(self.data)
+        self.condition = threading.Condition()
+        self.touched_at = time.time()
+        self.closed = False
+
+    def snapshot(self):
+        """A copy of the shared data and the version it corresponds to"""
+        with self.condition:
+            return copy.deepcopy(self.data), self.version
+
+    def apply(self, section_name, base_version, change_fn, author=None):
+        """
+        Run ``change_fn(section_data, data) -> (success, message, touched slots)`` on a section.
+
+        Raises StaleEdit (and undoes the change) when a touched slot changed after
+        ``base_version``. Returns (success, message, event) where event is the
+        broadcast change, or None when the change was refused.
+        """
+        with self.condition:
+            self.touched_at = time.time()
+            section_data = next((s for s in self.data['sections'] if s['name'] == section_name), None)
+            if section_data is None:
+                return False, 'Section not found', None
+            backup = copy.deepcopy(section_data)
+            success, message, touched = change_fn(section_data, self.data)
+            if not success:
+                return False, message, None
+
+            stale = [slot for slot in touched if self.cell_versions.get((section_name,) + tuple(slot), 0) > base_version]
+            if stale:
+                section_data.clear()
+                section_data.update(backup)
+                raise StaleEdit(stale, self.version)
+
+            if self.journal:
+                self.journal.record(self.data['sections'], section_name,
+                                    [{'day': day, 'period': period, 'before': backup['timetable'][day][period],
+                                      'after': section_data['timetable'][day][period]} for day, period in touched],
+                                    message, author)
+            return True, message, self.broadcast(section_data, touched, message, author)
+
+    def undo(self, author=None):
+        """Undo the room's last edit for everyone; returns (success, message, event)"""
+        return self.step(self.journal.undo, 'Undid', 'undo', author)
+
+    def redo(self, author=None):
+        """Redo the room's last undone edit for everyone; returns (success, message, event)"""
+        return self.step(self.journal.redo, 'Redid', 'redo', author)
+
+    def step(self, journal_step, verb, action, author):
+        with self.condition:
+            self.touched_at = time.time()
+            entry = journal_step(self.data['sections'])
+            if entry is None:
+                return False, f'Nothing to {action}', None
+            section_data = next(s for s in self.data['sections'] if s['name'] == entry['section'])
+            message = f'{verb}: {entry["message"]}'
+            touched = [(cell['day'], cell['period']) for cell in entry['cells']]
+            return True, message, self.broadcast(section_data, touched, message, author)
+
+    def broadcast(self, section_data, touched, message, author):
+        """Bump the version, stamp the touched cells and publish the change (call with the condition held)"""
+        self.version += 1
+        for day, period in touched:
+            self.cell_versions[(section_data['name'], day, period)] = self.version
+        conflicts = self.conflict_fn(self.data)
+        event = {
+            'version': self.version,
+            'author': author,
+            'section': section_data['name'],
+            'message': message,
+            'cells': [{'day': day, 'period': period, 'cell': section_data['timetable'][day][period]}
+                      for day, period in touched],
+            'conflicts': {'added': sorted(conflicts - self.conflicts),
+                          'removed': sorted(self.conflicts - conflicts),
+                          'count': len(conflicts)}
+        }
+        self.conflicts = conflicts
+        self.events.append(event)
+        self.condition.notify_all()
+        return event
+
+    def events_since(self, version, timeout=HEARTBEAT_INTERVAL):
+        """Events after ``version``, waiting up to ``timeout`` seconds for one to arrive"""
+        with self.condition:
+            if self.version <= version:
+                self.condition.wait(timeout)
+            return [event for event in self.events if event['version'] > version]
+
+    def close(self):
+        """Mark the room as gone and wake its event streams so they end"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def stream(self, since=0, max_idle=STREAM_MAX_IDLE):
+        """
+        Server-Sent Events for every change after ``since``, with keep-alive comments in between.
+        Ends when the room is closed or nothing changed for ``max_idle`` seconds, so an
+        abandoned stream does not hold a worker thread for good.
+        """
+        yield f'retry: 3000\nevent: hello\ndata: {json.dumps({"version": self.version})}\n\n'
+        last_change = time.time()
+        while not self.closed:
+            events = self.events_since(since)
+            if not events:
+                if self.closed or time.time() - last_change > max_idle:
+                    return
+                yield ': keep-alive\n\n'
+                continue
+            last_change = time.time()
+            for event in events:
+                since = event['version']
+                yield f'id: {since}\nevent: change\ndata: {json.dumps(event)}\n\n'
+
+
+class EditRooms:
+    """In-process registry of shared edit sessions"""
+    def __init__(self, ttl=ROOM_TTL):
+        self.ttl = ttl
+        self.rooms = {}
+        self.lock = threading.Lock()
+
+    def create(self, data, conflict_fn, journal_fn=None):
+        """Open a room on a copy of ``data``; ``journal_fn(room_id)`` supplies its undo journal"""
+        room_id = uuid.uuid4().hex[:12]
+        room = EditRoom(room_id, data, conflict_fn, journal_fn(room_id) if journal_fn else None)
+        with self.lock:
+            self.expire()
+            self.rooms[room.id] = room
+        return room
+
+    def get(self, room_id):
+        with self.lock:
+            self.expire()
+            return self.rooms.get(room_id)
+
+    def expire(self):
+        """Drop rooms idle past the TTL and end their event streams (call with the lock held)"""
+        cutoff = time.time() - self.ttl
+        for room_id in [room_id for room_id, room in self.rooms.items() if room.touched_at < cutoff]:
+            self.rooms.pop(room_id).close()
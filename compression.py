@@ -0,0 +1,68 @@
+"""
+gzip/brotli compression of text responses above a size threshold.
+Each encoded representation gets its own strong ETag so conditional requests keep working.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+COMPRESSIBLE_TYPES = {'text/html', 'text/css', 'text/plain', 'text/javascript',
+                      'application/javascript', 'application/json'}
+MINIMUM_SIZE = 1024
+
+
+def encoded_etags(etag):
+    """The ETag of a response body and of each of its compressed representations"""
+    return [etag, f'{etag}-gzip', f'{etag}-br']
+
+
+def matching_etag(request, etag):
+    """The representation ETag of this body that the client's If-None-Match holds, or None"""
+    return next((tag for tag in encoded_etags(etag) if request.if_none_match.contains_weak(tag)), None)
+
+
+class Compressor:
+    """after_request hook compressing large text responses with the best encoding the client accepts"""
+    def __init__(self, minimum_size=MINIMUM_SIZE, gzip_level=6, brotli_quality=5):
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def choose_encoding(self, request):
+        accepted = request.accept_encodings
+        candidates = [('br', accepted['br'])] if brotli else []
+        candidates.append(('gzip', accepted['gzip']))
+        encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+        return encoding if quality > 0 else None
+
+    def compress(self, response):
+        from flask import request
+
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed or
+                'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.choose_encoding(request)
+        data = response.get_data()
+        if not encoding or len(data) < self.minimum_size:
+            return response
+
+        if encoding == 'br':
+            response.set_data(brotli.compress(data, quality=self.brotli_quality))
+        else:
+            response.set_data(gzip.compress(data, compresslevel=self.gzip_level))
+        response.headers['Content-Encoding'] = encoding
+
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{encoding}', weak)
+            # The view compared against the plain ETag; compare again against this representation's
+            response = response.make_conditional(request)
+        return response
+
+    def init_app(self, app):
+        app.after_request(self.compress)
+        return self
@@ -0,0 +1,51 @@
+"""
+Configuration profiles for create_app, chosen by name or by the APP_PROFILE environment variable.
+Paths left as None default to directories in the app's instance folder.
+"""
+import os
+
+
+class Config:
+    SECRET_KEY = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+    DEBUG = False
+    TESTING = False
+    USE_RELOADER = False
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+
+    # Responses smaller than this are not compressed
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
+
+    TIMETABLE_CACHE_DIR = os.environ.get("TIMETABLE_CACHE_DIR")
+    TIMETABLE_CACHE_SIZE = int(os.environ.get("TIMETABLE_CACHE_SIZE", "256"))
+    TIMETABLE_STORE_DIR = os.environ.get("TIMETABLE_STORE_DIR")
+    TIMETABLE_JOURNAL_DIR = os.environ.get("TIMETABLE_JOURNAL_DIR")
+    WORKSPACE_DIR = os.environ.get("WORKSPACE_DIR")
+
+    # Threads running generations, seconds a request waits for one, and processes solving
+    # independent departments in parallel (0 solves them in turn)
+    GENERATION_WORKERS = int(os.environ.get("GENERATION_WORKERS", "2"))
+    GENERATION_TIMEOUT = int(os.environ.get("GENERATION_TIMEOUT", "300"))
+    GENERATION_PROCESSES = int(os.environ.get("GENERATION_PROCESSES", "0"))
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    USE_RELOADER = True
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "DEBUG")
+
+
+class ProductionConfig(Config):
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "WARNING")
+
+
+class TestingConfig(Config):
+    TESTING = True
+    LOG_LEVEL = os.environ.get("LOG_LEVEL", "WARNING")
+
+
+PROFILES = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+DEFAULT_PROFILE = 'production'
@@ -6,37 +6,57 @@ Helps identify and resolve teacher scheduling conflicts across sections.
 def detect_teacher_conflicts(sections):
     """
     Detect scheduling conflicts where teachers are assigned to multiple sections
-    at the same time slot.
+    at the same time slot, teachers are scheduled while unavailable, or a shared
+    room is booked by more sections than its capacity.
     
     Returns a list of conflicts with details about the clashing assignments.
     """
     conflicts = []
-    days = 6
-    periods = 7
     
     # Create a mapping of teacher -> time slot -> sections
     teacher_schedule = {}
+    # Same mapping for shared rooms, checked against room capacity
+    room_schedule = {}
+    rooms = {}
     
     for section in sections:
-        for day in range(days):
-            for period in range(periods):
+        for day in range(section.week.days):
+            for period in range(section.week.periods_per_day):
                 subject = section.timetable[day][period]
                 if subject and subject.teacher:
-                    teacher_name = subject.teacher.name
                     time_slot = (day, period)
-                    
-                    if teacher_name not in teacher_schedule:
-                        teacher_schedule[teacher_name] = {}
-                    
-                    if time_slot not in teacher_schedule[teacher_name]:
-                        teacher_schedule[teacher_name][time_slot] = []
-                    
-                    teacher_schedule[teacher_name][time_slot].append({
+                    assignment = {
                         'section': section,
                         'subject': subject,
                         'day': day,
                         'period': period
-                    })
+                    }
+                    
+                    # Split-batch labs occupy every batch teacher in the same slot
+                    for teacher in subject.get_session_teachers():
+                        teacher_name = teacher.name
+                        
+                        if teacher_name not in teacher_schedule:
+                            teacher_schedule[teacher_name] = {}
+                        
+                        if time_slot not in teacher_schedule[teacher_name]:
+                            teacher_schedule[teacher_name][time_slot] = []
+                        
+                        teacher_schedule[teacher_name][time_slot].append(assignment)
+                        
+                        # Teacher scheduled in a slot marked as unavailable
+                        if not teacher.is_available(day, period):
+                            conflicts.append({
+                                'teacher': teacher_name,
+                                'day': day,
+                                'period': period,
+                                'assignments': [assignment],
+                                'conflict_type': 'teacher_unavailable'
+                            })
+                    
+                    for room in subject.get_session_rooms():
+                        rooms[room.name] = room
+                        room_schedule.setdefault(room.name, {}).setdefault(time_slot, []).append(assignment)
     
     # Find conflicts (teacher in multiple sections at same time)
     for teacher_name, schedule in teacher_schedule.items():
@@ -51,6 +71,20 @@ def detect_teacher_conflicts(sections):
                     'conflict_type': 'teacher_overlap'
                 })
     
+    # Find room conflicts (more sections in a room than it can hold)
+    for room_name, schedule in room_schedule.items():
+        for time_slot, assignments in schedule.items():
+            if len(assignments) > rooms[room_name].capacity:
+                day, period = time_slot
+                conflicts.append({
+                    'teacher': None,
+                    'room': room_name,
+                    'day': day,
+                    'period': period,
+                    'assignments': assignments,
+                    'conflict_type': 'room_overlap'
+                })
+    
     return conflicts
 
 def get_conflict_summary(conflicts):
@@ -61,22 +95,30 @@ def get_conflict_summary(conflicts):
         return "No scheduling conflicts detected."
     
     summary = []
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
     
     for conflict in conflicts:
-        day_name = days[conflict['day']]
+        day_name = conflict['assignments'][0]['section'].week.day_names[conflict['day']]
         period_num = conflict['period'] + 1
         teacher = conflict['teacher']
         
         sections = [assign['section'].name for assign in conflict['assignments']]
         subjects = [assign['subject'].name for assign in conflict['assignments']]
         
+        if conflict['conflict_type'] == 'room_overlap':
+            teacher = conflict['room']
+            message = f"Room {teacher} is booked by more sections ({', '.join(sections)}) than it can hold at {day_name}, Period {period_num}"
+        elif conflict['conflict_type'] == 'teacher_unavailable':
+            message = f"Teacher {teacher} is unavailable at {day_name}, Period {period_num} but is scheduled in {', '.join(sections)}"
+        else:
+            message = f"Teacher {teacher} is scheduled in multiple sections ({', '.join(sections)}) at {day_name}, Period {period_num}"
+        
         summary.append({
             'teacher': teacher,
             'time': f"{day_name}, Period {period_num}",
             'sections': sections,
             'subjects': subjects,
-            'message': f"Teacher {teacher} is scheduled in multiple sections ({', '.join(sections)}) at {day_name}, Period {period_num}"
+            'type': conflict['conflict_type'],
+            'message': message
         })
     
     return summary
@@ -88,21 +130,25 @@ def suggest_conflict_resolution(conflicts, sections):
     suggestions = []
     
     for conflict in conflicts:
-        teacher = conflict['teacher']
+        teacher = conflict['teacher'] or conflict.get('room')
         day = conflict['day']
         period = conflict['period']
         assignments = conflict['assignments']
         
+        # Keep first assignment and move the others; an unavailable slot has to be vacated entirely
+        to_move = assignments if conflict['conflict_type'] == 'teacher_unavailable' else assignments[1:]
+        
         # Find alternative time slots for conflicting assignments
-        for i, assignment in enumerate(assignments[1:], 1):  # Keep first assignment, move others
+        for assignment in to_move:
             section = assignment['section']
             subject = assignment['subject']
             
             # Find free slots for this subject
             alternative_slots = []
-            for alt_day in range(6):
-                for alt_period in range(7):
-                    if section.timetable[alt_day][alt_period] is None:
+            for alt_day in range(section.week.days):
+                for alt_period in range(section.week.periods_on(alt_day)):
+                    if (section.timetable[alt_day][alt_period] is None and
+                            subject.teacher.is_available(alt_day, alt_period)):
                         alternative_slots.append((alt_day, alt_period))
             
             suggestions.append({
@@ -159,8 +205,8 @@ def validate_timetable_integrity(sections):
     for section in sections:
         # Count periods for each subject
         subject_counts = {}
-        for day in range(6):
-            for period in range(7):
+        for day in range(section.week.days):
+            for period in range(section.week.periods_per_day):
                 subject = section.timetable[day][period]
                 if subject:
                     if subject.name not in subject_counts:
@@ -0,0 +1,66 @@
+"""
+Diff engine for stored timetables (saved versions or the current generated one).
+Finds per-section and per-teacher cell changes in a single pass over packed grids.
+"""
+
+
+def pack_grid(timetable, days, periods):
+    """Flatten a stored grid into a list of (subject, teacher) cells, None for free periods"""
+    packed = [None] * (days * periods)
+    for day, row in enumerate(timetable[:days]):
+        for period, cell in enumerate(row[:periods]):
+            if cell:
+                packed[day * periods + period] = (cell['name'], cell.get('teacher'))
+    return packed
+
+
+def cell_dict(cell):
+    return {'subject': cell[0], 'teacher': cell[1]} if cell else None
+
+
+def diff_timetables(old_sections, new_sections):
+    """
+    Compare two lists of stored sections.
+
+    Returns a dict with 'sections' (section name -> changes), 'teachers' (teacher
+    name -> changes affecting them), 'added_sections', 'removed_sections' and
+    'total' (number of changed cells). Each change is a dict with section, day,
+    period, before and after ({'subject', 'teacher'} or None).
+    """
+    old_by_name = {s['name']: s for s in old_sections}
+    new_by_name = {s['name']: s for s in new_sections}
+    result = {
+        'sections': {},
+        'teachers': {},
+        'added_sections': [name for name in new_by_name if name not in old_by_name],
+        'removed_sections': [name for name in old_by_name if name not in new_by_name],
+        'total': 0
+    }
+
+    for name, new in new_by_name.items():
+        old = old_by_name.get(name)
+        if old is None:
+            continue
+        # Pack both grids to the larger shape so week-shape changes show up as changes
+        days = max(len(old['timetable']), len(new['timetable']))
+        periods = max([len(row) for row in old['timetable'] + new['timetable']] or [0])
+        old_cells = pack_grid(old['timetable'], days, periods)
+        new_cells = pack_grid(new['timetable'], days, periods)
+
+        changes = []
+        for slot, (before, after) in enumerate(zip(old_cells, new_cells)):
+            if before == after:
+                continue
+            day, period = divmod(slot, periods)
+            change = {'section': name, 'day': day, 'period': period,
+                      'before': cell_dict(before), 'after': cell_dict(after)}
+            changes.append(change)
+            # The change affects the teacher losing the period and the one gaining it
+            for teacher in {cell[1] for cell in (before, after) if cell and cell[1]}:
+                result['teachers'].setdefault(teacher, []).append(change)
+        if changes:
+            result['sections'][name] = changes
+            result['total'] += len(changes)
+
+    result['teachers'] = dict(sorted(result['teachers'].items()))
+    return result
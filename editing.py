@@ -0,0 +1,166 @@
+"""
+Block-aware edits of stored (session format) timetables.
+
+Labs move and swap as whole blocks and only to starts allowed by the section's lunch
+position, and every cell landing in a new slot is checked against its teachers'
+availability and their other sections at that slot only, instead of re-running
+conflict detection over the whole timetable.
+"""
+from models import WeekConfig, allowed_lab_starts
+
+
+def find_block(row, period):
+    """(start, size) of the cell at ``period``: the whole lab block for labs, the cell itself otherwise"""
+    cell = row[period]
+    if not cell or not cell.get('is_lab'):
+        return period, 1
+    run_start = period
+    while run_start > 0 and row[run_start - 1] and row[run_start - 1]['name'] == cell['name']:
+        run_start -= 1
+    # Back-to-back blocks of the same lab form one run; split it by the block size
+    block_size = max(cell.get('block_size', 1), 1)
+    start = run_start + (period - run_start) // block_size * block_size
+    size = 1
+    while (start + size < len(row) and size < block_size and row[start + size] and
+           row[start + size]['name'] == cell['name']):
+        size += 1
+    return start, size
+
+
+def cell_teachers(section_data, cell):
+    """Every teacher taking a stored cell: the assigned teacher plus split-batch teachers"""
+    assignment = next((a for a in section_data.get('subject_assignments', []) if a['subject'] == cell['name']), None)
+    names = [assignment['teacher']] + assignment.get('batch_teachers', []) if assignment else [cell.get('teacher')]
+    return [name for name in names if name and name != 'Unassigned']
+
+
+def teacher_clash(data, section_data, cell, day, period):
+    """Why ``cell`` cannot be taught at (day, period), or None; only that slot is examined"""
+    teachers = cell_teachers(section_data, cell)
+    unavailable = {t['name']: {tuple(slot) for slot in t.get('unavailable', [])} for t in data['teachers']
+                   if t['name'] in teachers}
+    for name in teachers:
+        if (day, period) in unavailable.get(name, ()):
+            return f'{name} is unavailable at that time'
+    for other in data['sections']:
+        if other['name'] == section_data['name'] or day >= len(other['timetable']):
+            continue
+        other_cell = other['timetable'][day][period] if period < len(other['timetable'][day]) else None
+        if other_cell:
+            busy = set(teachers) & set(cell_teachers(other, other_cell))
+            if busy:
+                return f'{", ".join(sorted(busy))} already teaches {other["name"]} at that time'
+    return None
+
+
+def validate_window(section_data, week, day, start, size, lab_size=None):
+    """Why cells cannot occupy periods [start, start + size) of a day, or None"""
+    if start < 0 or start + size > week.periods_on(day):
+        return 'That block does not fit in the day'
+    if any(not week.is_teaching_slot(day, period) for period in range(start, start + size)):
+        return 'No classes are held in that period'
+    if lab_size:
+        lunch_position = week.lunch_position_for(section_data['year'])
+        if start not in allowed_lab_starts(lab_size, lunch_position, week.periods_on(day)):
+            return f'A {lab_size}-period lab cannot start there; it must fit entirely before or after lunch'
+    return None
+
+
+def locked_in(section_data, day, periods):
+    locked = {(slot['day'], slot['period']) for slot in section_data.get('locked_slots', [])}
+    return any((day, period) in locked for period in periods)
+
+
+def place_cells(data, section_data, placements):
+    """
+    Write {(day, period): cell} into the section after checking each cell landing in a
+    new slot; returns an error message (leaving the grid untouched) or None
+    """
+    grid = section_data['timetable']
+    for (day, period), cell in placements.items():
+        if cell and grid[day][period] is not cell:
+            clash = teacher_clash(data, section_data, cell, day, period)
+            if clash:
+                return f'Cannot place {cell["name"]} on {day_label(data, day)}, period {period + 1}: {clash}'
+    for (day, period), cell in placements.items():
+        grid[day][period] = cell
+    return None
+
+
+def day_label(data, day):
+    week = WeekConfig.from_dict(data.get('week'))
+    return week.day_names[day] if day < len(week.day_names) else f'Day {day + 1}'
+
+
+def move_block(section_data, data, from_day, from_period, to_day, to_period):
+    """
+    Move the cell (or whole lab block) at a timetable slot so it starts at another slot.
+    Returns (success, message, touched timetable slots).
+    """
+    week = WeekConfig.from_dict(data.get('week'))
+    grid = section_data['timetable']
+    cell = grid[from_day][from_period]
+    if not cell:
+        return False, 'No subject at source position', []
+    start, size = find_block(grid[from_day], from_period)
+    source = [(from_day, period) for period in range(start, start + size)]
+    target = [(to_day, period) for period in range(to_period, to_period + size)]
+    if locked_in(section_data, from_day, range(start, start + size)):
+        return False, 'This period is locked. Unlock it before moving.', []
+
+    error = validate_window(section_data, week, to_day, to_period, size, size if cell.get('is_lab') else None)
+    if error:
+        return False, error, []
+    # The block may slide over its own old periods, but nothing else may be in the way
+    if any(grid[day][period] and (day, period) not in source for day, period in target):
+        return False, 'Destination slot is occupied', []
+
+    placements = {slot: None for slot in source}
+    placements.update({slot: grid[from_day][start + offset] for offset, slot in enumerate(target)})
+    error = place_cells(data, section_data, placements)
+    if error:
+        return False, error, []
+    return True, f'Moved {cell["name"]} successfully', sorted(set(source) | set(target))
+
+
+def swap_blocks(section_data, data, day1, period1, day2, period2):
+    """
+    Swap the cells (or lab blocks) at two timetable slots. A lab swaps with the run of
+    periods of its own length starting at the other slot. Returns (success, message, touched slots).
+    """
+    week = WeekConfig.from_dict(data.get('week'))
+    grid = section_data['timetable']
+    start1, size1 = find_block(grid[day1], period1)
+    start2, size2 = find_block(grid[day2], period2)
+    lab1 = bool(grid[day1][period1] and grid[day1][period1].get('is_lab'))
+    lab2 = bool(grid[day2][period2] and grid[day2][period2].get('is_lab'))
+    if lab1 and lab2 and size1 != size2:
+        return False, 'Labs of different lengths cannot be swapped', []
+    size = max(size1, size2)
+    # A theory period (or free slot) swapped with a lab stands for the run starting there
+    start1 = start1 if lab1 else period1
+    start2 = start2 if lab2 else period2
+    window1 = [(day1, period) for period in range(start1, start1 + size)]
+    window2 = [(day2, period) for period in range(start2, start2 + size)]
+    if set(window1) & set(window2):
+        return False, 'The two blocks overlap; move the lab instead', []
+
+    for (day, start), lab_here in (((day1, start1), lab2), ((day2, start2), lab1)):
+        error = validate_window(section_data, week, day, start, size, size if lab_here else None)
+        if error:
+            return False, error, []
+    for window, own_lab in ((window1, lab1), (window2, lab2)):
+        # A window taken over by a lab may not cut through another lab
+        if not own_lab and any(grid[day][period] and grid[day][period].get('is_lab') for day, period in window):
+            return False, 'That would split another lab block', []
+    if locked_in(section_data, day1, range(start1, start1 + size)) or locked_in(section_data, day2, range(start2, start2 + size)):
+        return False, 'Cannot swap a locked period. Unlock it first.', []
+
+    placements = {}
+    for slot1, slot2 in zip(window1, window2):
+        placements[slot1] = grid[slot2[0]][slot2[1]]
+        placements[slot2] = grid[slot1[0]][slot1[1]]
+    error = place_cells(data, section_data, placements)
+    if error:
+        return False, error, []
+    return True, 'Subjects swapped successfully', sorted(set(window1) | set(window2))
@@ -1,25 +1,28 @@
 def print_section_timetable(section):
     """Original console printing function (preserved for compatibility)"""
     print(f"\nTimetable for {section.name} ({section.year})")
-    days = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat"]
-    for d in range(6):
+    days = [name[:3] for name in section.week.day_names]
+    for d in range(section.week.days):
         row = []
-        for p in range(7):
+        for p in range(section.week.periods_on(d)):
             subj = section.timetable[d][p]
             row.append(subj.name if subj else "--")
         print(days[d], " | ", " | ".join(row))
 
 def format_timetable_for_web(section):
     """Format timetable data for web display with lunch periods inserted and lab blocks merged"""
-    days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+    week = section.week
+    days = week.day_names
     lunch_position = section.get_lunch_period_position()
+    teaching_periods = week.periods_per_day
+    display_slots = teaching_periods + 1  # teaching periods + 1 lunch
     
     # Create period labels with lunch inserted at the right position
     periods = []
     display_schedule = []
     
     # Generate periods list with lunch inserted
-    for i in range(8):  # 7 teaching periods + 1 lunch = 8 slots
+    for i in range(display_slots):
         if i == lunch_position:
             periods.append("LUNCH")
         elif i < lunch_position:
@@ -36,26 +39,26 @@ def format_timetable_for_web(section):
         'lunch_position': lunch_position
     }
     
-    # Create schedule with lunch inserted at correct position and maintain exact 8-slot structure
-    for d in range(6):
+    # Create schedule with lunch inserted at correct position and maintain exact slot structure
+    for d in range(week.days):
         day_schedule = []
         
         # First pass: identify lab blocks
         lab_blocks = {}
-        for p in range(7):
+        for p in range(teaching_periods):
             subject = section.timetable[d][p]
             if subject and subject.is_lab:
                 # Check if this is the start of a lab block
                 if p == 0 or section.timetable[d][p-1] != subject:
                     # Count consecutive periods
                     span = 1
-                    while (p + span < 7 and section.timetable[d][p + span] == subject):
+                    while (p + span < teaching_periods and section.timetable[d][p + span] == subject):
                         span += 1
                     lab_blocks[p] = span
         
-        # Create display schedule ensuring exactly 8 slots
+        # Create display schedule ensuring exactly one slot per period plus lunch
         teaching_period_index = 0
-        for display_slot in range(8):
+        for display_slot in range(display_slots):
             if display_slot == lunch_position:
                 # Insert lunch break
                 day_schedule.append({
@@ -69,16 +72,29 @@ def format_timetable_for_web(section):
                 })
             else:
                 # Add teaching period
-                if teaching_period_index >= 7:
+                if teaching_period_index >= teaching_periods:
                     # Add empty slot if we've run out of teaching periods
                     day_schedule.append(None)
+                elif not week.is_teaching_slot(d, teaching_period_index):
+                    # No classes in this period (e.g. Saturday half-day)
+                    day_schedule.append({
+                        'name': '',
+                        'teacher': '',
+                        'is_lab': False,
+                        'is_lunch': False,
+                        'colspan': 1,
+                        'is_merged_lab': False,
+                        'is_hidden': False,
+                        'is_off': True
+                    })
+                    teaching_period_index += 1
                 else:
                     subject = section.timetable[d][teaching_period_index]
                     
                     if subject and subject.is_lab and teaching_period_index in lab_blocks:
                         # This is the start of a lab block
                         lab_span = lab_blocks[teaching_period_index]
-                        teacher_name = subject.teacher.name if subject.teacher else 'Unassigned'
+                        teacher_name = ' / '.join(t.name for t in subject.get_session_teachers()) or 'Unassigned'
                         day_schedule.append({
                             'name': f"{subject.name} (Lab)",
                             'teacher': teacher_name,
@@ -87,7 +103,9 @@ def format_timetable_for_web(section):
                             'colspan': lab_span,
                             'is_merged_lab': True,
                             'block_size': lab_span,
-                            'is_hidden': False
+                            'room': ' / '.join(room.name for room in subject.get_session_rooms()) or None,
+                            'is_hidden': False,
+                            'is_locked': section.is_locked(d, teaching_period_index)
                         })
                         teaching_period_index += 1  # Only advance by 1, not the full span
                     elif subject and subject.is_lab and teaching_period_index not in lab_blocks:
@@ -113,7 +131,9 @@ def format_timetable_for_web(section):
                             'is_lunch': False,
                             'colspan': 1,
                             'is_merged_lab': False,
-                            'is_hidden': False
+                            'room': subject.room.name if subject.room else None,
+                            'is_hidden': False,
+                            'is_locked': section.is_locked(d, teaching_period_index)
                         })
                         teaching_period_index += 1
                     else:
@@ -1,33 +1,131 @@
+import heapq
+import logging
 import random
 import time
+from concurrent.futures import Future
+
+from models import allowed_lab_starts
+from problem import Solution, build_problem, apply_solution, split_problem, merge_solutions
+from sampler import FenwickSampler
+from cache import problem_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# Marker stored in a teacher's schedule for slots the teacher is unavailable
+UNAVAILABLE = '__unavailable__'
+
+# Teacher load policies: how far above max_load theory periods and lab blocks may go
+# strict - never above max_load
+# soft - within max_load first, overloading only as a fallback; attempts with less overload win
+# flexible - up to the flexible limits, fallback theory placements ignore load (original behaviour)
+LOAD_POLICIES = ('strict', 'soft', 'flexible')
+THEORY_LOAD_FACTOR = 1.2
+LAB_LOAD_FACTOR = 1.5
+
+
+class LoadLedger:
+    """
+    Per-attempt teacher load accounting, kept apart from the shared Teacher objects
+    so an attempt never leaks load into the models (or into another attempt).
+    """
+    def __init__(self, policy='flexible'):
+        if policy not in LOAD_POLICIES:
+            raise ValueError(f"Unknown load policy '{policy}'. Use one of: {', '.join(LOAD_POLICIES)}")
+        self.policy = policy
+        self.loads = {}  # teacher name -> periods placed in this attempt
+        self.max_loads = {}  # teacher name -> max_load
+
+    def register(self, teacher):
+        if teacher.name not in self.loads:
+            self.loads[teacher.name] = 0
+            self.max_loads[teacher.name] = teacher.max_load
+
+    def add(self, teacher, periods=1):
+        self.register(teacher)
+        self.loads[teacher.name] += periods
+
+    def allows(self, teacher, periods, is_lab=False, fallback=False):
+        """Check whether the teacher may take ``periods`` more periods under the policy"""
+        self.register(teacher)
+        if self.policy == 'strict' or (self.policy == 'soft' and not fallback):
+            factor = 1.0
+        elif fallback and not is_lab:
+            return True
+        else:
+            factor = LAB_LOAD_FACTOR if is_lab else THEORY_LOAD_FACTOR
+        return self.loads[teacher.name] + periods <= self.max_loads[teacher.name] * factor
+
+    def allows_all(self, teachers, periods, is_lab=False, fallback=False):
+        """Check ``allows`` for every teacher of a subject (a plain theory subject has just one)"""
+        if len(teachers) == 1:
+            return self.allows(teachers[0], periods, is_lab, fallback)
+        return all(self.allows(teacher, periods, is_lab, fallback) for teacher in teachers)
+
+    def overload(self, teacher_name):
+        return max(self.loads[teacher_name] - self.max_loads[teacher_name], 0)
+
+    def total_overload(self):
+        return sum(self.overload(name) for name in self.loads)
+
+    def table(self):
+        """Final per-teacher load table: teacher, load, max_load and overload (periods above max_load)"""
+        return [{'teacher': name, 'load': self.loads[name], 'max_load': self.max_loads[name],
+                 'overload': self.overload(name)}
+                for name in sorted(self.loads)]
 
 # Old function removed - consolidated into improved version
 
-def generate_clash_free_timetable_improved(sections):
+def solve(problem, load_policy='flexible', rng=None, warm_start=None):
     """
-    Improved clash-free timetable generation with enhanced randomization,
-    better constraint handling, and robust backtracking.
+    Pure generation core: place every section of ``problem`` and return a new Solution.
+
+    Only local state is modified (section grids, teacher and room occupancy and the
+    attempt's LoadLedger) and all randomness comes from ``rng``, so concurrent calls
+    never interfere. Pinned sections keep their grids; their periods are only seeded
+    into the teacher schedule, room occupancy and loads so the solved sections are
+    placed around them. ``warm_start`` maps section names to a previous grid of
+    subject names; its still-valid placements are kept and only the rest is placed
+    again. Raises an Exception with guidance when a lab block or theory period cannot
+    be placed.
     """
-    days = 6
-    periods = 7  # 7 teaching periods
+    rng = rng or random.Random()
+    ledger = LoadLedger(load_policy)
+    days = problem.days
+    periods = problem.periods_per_day
+    teachers = {teacher.name: teacher for teacher in problem.teachers}
+    rooms = {room.name: room for room in problem.rooms}
+    # Subject name -> SubjectSpec per section, so seeding looks cells up in O(1)
+    subjects = {section.name: {subject.name: subject for subject in section.subjects}
+                for section in problem.sections + problem.pinned}
     
     # Global teacher availability tracker
-    teacher_schedule = {}
+    teacher_schedule = {name: new_teacher_schedule(teacher, problem) for name, teacher in teachers.items()}
+    for teacher in problem.teachers:
+        ledger.register(teacher)
+    # Shared room occupancy: room name -> day -> period -> list of section names
+    room_schedule = {name: [[[] for _ in range(periods)] for _ in range(days)] for name in rooms}
+    # Section grids of subject names, filled in by the phases below
+    grids = {section.name: [[None] * periods for _ in range(days)] for section in problem.sections}
     
-    # Initialize teacher schedules and clear existing timetables
-    for section in sections:
-        section.timetable = [[None for _ in range(periods)] for _ in range(days)]
-        for subject in section.subjects:
-            teacher_name = subject.teacher.name
-            if teacher_name not in teacher_schedule:
-                teacher_schedule[teacher_name] = [[None for _ in range(periods)] for _ in range(days)]
-            subject.teacher.current_load = 0
+    # Seed occupancy of pinned sections so their grids stay untouched
+    seed_pinned_occupancy(problem, subjects, teachers, teacher_schedule, room_schedule, ledger)
+    
+    # Pre-seed locked cells into the section grids and teacher occupancy
+    locked_counts = seed_locked_slots(problem, subjects, teachers, grids, teacher_schedule, room_schedule, ledger)
+    
+    # Keep the still-valid placements of a previous solution; they count like locked cells
+    if warm_start:
+        seed_warm_start(problem, subjects, teachers, rooms, grids, teacher_schedule, room_schedule, ledger,
+                        locked_counts, warm_start)
     
     # Phase 1: Enhanced lab placement with flexible constraints
     lab_tasks = []
-    for section in sections:
+    for section in problem.sections:
         lab_subjects = [s for s in section.subjects if s.is_lab]
         for lab_subject in lab_subjects:
+            # A locked lab block already satisfies the lab
+            if locked_counts.get((section.name, lab_subject.name)):
+                continue
             lab_tasks.append((section, lab_subject))
     
     # Sort by block size (largest first) for better placement success
@@ -35,158 +133,419 @@ def generate_clash_free_timetable_improved(sections):
     
     # Place lab subjects with improved flexibility
     for section, lab_subject in lab_tasks:
-        teacher_name = lab_subject.teacher.name
+        grid = grids[section.name]
         placed = False
         
         # Generate all possible placement positions
         candidates = []
-        allowed_starts = section.get_allowed_lab_starts(lab_subject.block_size)
         
         # Try with allowed starts (respecting lunch constraints) - be more flexible with teacher loads
-        for day in range(days):
-            for start in allowed_starts:
-                if start + lab_subject.block_size <= periods:
-                    if check_lab_placement_feasible_flexible(section, lab_subject, teacher_schedule, teacher_name, day, start):
-                        candidates.append((day, start, 'lunch_safe'))
+        # (soft load policy: only overload a teacher when no block fits within max load)
+        for fallback in ((False, True) if ledger.policy == 'soft' else (False,)):
+            for day in range(days):
+                for start in allowed_lab_starts(lab_subject.block_size, section.lunch_position, problem.periods_on(day)):
+                    if start + lab_subject.block_size <= periods:
+                        if check_lab_placement_feasible_flexible(section, grid, lab_subject, teacher_schedule, day, start,
+                                                                 room_schedule, rooms, teachers, ledger, fallback):
+                            candidates.append((day, start, 'lunch_safe'))
+            if candidates:
+                break
         
         # Place lab only in lunch-safe slots
         if candidates:
             # All candidates are lunch-safe, randomly select one
-            day, start, _ = random.choice(candidates)
+            day, start, _ = rng.choice(candidates)
             
-            # Place the lab subject
+            # Place the lab subject atomically for all of its batches
             for p in range(start, start + lab_subject.block_size):
-                section.timetable[day][p] = lab_subject
-                teacher_schedule[teacher_name][day][p] = section.name
-            lab_subject.teacher.current_load += lab_subject.block_size
+                grid[day][p] = lab_subject.name
+                for teacher_name in lab_subject.teachers:
+                    teacher_schedule[teacher_name][day][p] = section.name
+                book_room(room_schedule, lab_subject, section.name, day, p)
+            for teacher_name in lab_subject.teachers:
+                ledger.add(teachers[teacher_name], lab_subject.block_size)
             placed = True
         
         if not placed:
             # Provide specific guidance based on the lab configuration
-            lunch_period = section.get_lunch_period_position()
-            year_info = f"1st year (lunch after period {lunch_period})" if lunch_period == 3 else f"2nd+ year (lunch after period {lunch_period})"
+            lunch_period = section.lunch_position
+            year_info = f"{section.year} (lunch after period {lunch_period})"
             
-            if lab_subject.block_size == 4:
-                if lunch_period == 3:  # 1st year
-                    guidance = "For 1st year sections, 4-period labs must be placed in afternoon periods 3-6 (after lunch)."
-                else:  # 2nd+ year
-                    guidance = "For 2nd+ year sections, 4-period labs must be placed in morning periods 0-3 (before lunch)."
+            if lab_subject.block_size > max(lunch_period, periods - lunch_period):
+                guidance = (f"A {lab_subject.block_size}-period lab does not fit in the morning ({lunch_period} periods) "
+                            f"or afternoon ({periods - lunch_period} periods) of this section's day.")
+            elif lab_subject.block_size > min(lunch_period, periods - lunch_period):
+                half = "afternoon" if lunch_period < periods - lunch_period else "morning"
+                guidance = f"For this section, {lab_subject.block_size}-period labs must be placed in the {half} (they cannot span lunch)."
             else:
                 guidance = f"Lab block size {lab_subject.block_size} cannot span across lunch break at period {lunch_period}."
             
+            if len(lab_subject.teachers) > 1:
+                guidance += (f" All {len(lab_subject.teachers)} batch teachers "
+                             f"({', '.join(lab_subject.teachers)}) must be free in the same block.")
+            for room_name in lab_subject.rooms:
+                guidance += f" The lab also needs room '{room_name}' (capacity {rooms[room_name].capacity}), which may be fully booked."
+            for teacher_name in lab_subject.teachers:
+                if not ledger.allows(teachers[teacher_name], lab_subject.block_size, is_lab=True, fallback=True):
+                    guidance += (f" {teacher_name} has no load left for another {lab_subject.block_size}-period block "
+                                 f"({ledger.loads[teacher_name]}/{teachers[teacher_name].max_load}, {ledger.policy} load policy).")
+            
             raise Exception(f"Could not place lab subject '{lab_subject.name}' (block size {lab_subject.block_size}) in section '{section.name}' ({year_info}). {guidance} Try reducing teacher loads or using compatible lab block sizes.")
     
-    # Phase 2: Enhanced theory subject placement with smart distribution
-    for section in sections:
-        theory_subjects = [s for s in section.subjects if not s.is_lab]
+    # Phase 2: Theory placement interleaved across sections, most constrained task first
+    place_theory_subjects(problem, grids, teacher_schedule, ledger, locked_counts, teachers, rng)
+    
+    return Solution({name: tuple(tuple(row) for row in grid) for name, grid in grids.items()}, ledger.table())
+
+class TheoryTask:
+    """
+    Remaining periods of one theory subject in one section, with incrementally
+    maintained samplers over the slots it can still use.
+    """
+    def __init__(self, section, subject, grid, teacher_schedule, teachers, periods_to_place, days, periods):
+        self.section = section
+        self.subject = subject
+        self.teachers = [teachers[name] for name in subject.teachers]
+        self.grid = grid
+        # Schedule rows of the subject's teachers; a plain theory subject has exactly one
+        self.teacher_rows = [teacher_schedule[name] for name in subject.teachers]
+        self.periods = periods
+        self.periods_to_place = periods_to_place
+        self.periods_placed = 0
+        self.version = 0  # Bumped whenever the task's priority changes (lazy heap deletion)
+        self.index = None  # Position in the scheduler's task list
+        self.affected = []  # Tasks sharing the section or a teacher, filled in by the scheduler
         
-        # Randomize order of theory subjects for better distribution
-        random.shuffle(theory_subjects)
+        # Track used days for better distribution
+        self.days_used = {day for day in range(days) if subject.name in grid[day]}
+        self.day_counts = [grid[day].count(subject.name) for day in range(days)]
+        self.max_per_day = min(3, periods_to_place)  # Limit periods per day
         
-        for theory_subject in theory_subjects:
-            teacher_name = theory_subject.teacher.name
-            periods_to_place = theory_subject.periods_per_week
-            periods_placed = 0
-            
-            # Track used days for better distribution
-            days_used = set()
-            max_per_day = min(3, periods_to_place)  # Limit periods per day
-            
-            placement_attempts = 0
-            max_placement_attempts = periods_to_place * 50  # More generous attempts
-            
-            while periods_placed < periods_to_place and placement_attempts < max_placement_attempts:
-                placed = False
-                candidates = []
-                
-                # Generate weighted candidates
-                for day in range(days):
-                    day_count = sum(1 for p in range(periods) if section.timetable[day][p] == theory_subject)
-                    
-                    # Skip if already at max for this day
-                    if day_count >= max_per_day:
-                        continue
-                    
-                    for period in range(periods):
-                        if (section.timetable[day][period] is None and 
-                            teacher_schedule[teacher_name][day][period] is None):
-                            
-                            # Check teacher load more flexibly
-                            load_ok = (theory_subject.teacher.can_teach(1) or 
-                                     theory_subject.teacher.current_load < theory_subject.teacher.max_load * 1.2)  # 20% flexibility
-                            
-                            if load_ok:
-                                # Calculate weight for smart placement
-                                weight = calculate_placement_weight(day, period, days_used, day_count, max_per_day)
-                                candidates.append((day, period, weight))
-                
-                if candidates:
-                    # Weighted random selection
-                    total_weight = sum(w for _, _, w in candidates)
-                    if total_weight > 0:
-                        r = random.uniform(0, total_weight)
-                        cumulative = 0
-                        for day, period, weight in candidates:
-                            cumulative += weight
-                            if r <= cumulative:
-                                # Place the subject
-                                section.timetable[day][period] = theory_subject
-                                teacher_schedule[teacher_name][day][period] = section.name
-                                theory_subject.teacher.current_load += 1
-                                periods_placed += 1
-                                days_used.add(day)
-                                placed = True
-                                break
+        # Weighted sampler over all slots, plus a uniform one over every free slot for the fallback;
+        # both are updated incrementally as periods are placed instead of rescanning the grid
+        self.weighted = FenwickSampler(days * periods)
+        self.free = FenwickSampler(days * periods)
+        slots = [self.slot_weights(day, period) for day in range(days) for period in range(periods)]
+        self.weighted.load([weight for weight, _ in slots])
+        self.free.load([free for _, free in slots])
+    
+    def remaining(self):
+        return self.periods_to_place - self.periods_placed
+    
+    def slack(self):
+        """Free slots left beyond the periods still needed (lower means more constrained)"""
+        return self.free.active - self.remaining()
+    
+    def is_free(self, day, period):
+        if self.grid[day][period] is not None:
+            return False
+        if len(self.teacher_rows) == 1:
+            return self.teacher_rows[0][day][period] is None
+        return all(row[day][period] is None for row in self.teacher_rows)
+    
+    def slot_weights(self, day, period):
+        """Weighted and fallback sampler weights of a slot (the weight is 0 once the day is at max)"""
+        if not self.is_free(day, period):
+            return 0.0, 0.0
+        if self.day_counts[day] >= self.max_per_day:
+            return 0.0, 1.0
+        return calculate_placement_weight(day, period, self.days_used, self.day_counts[day], self.max_per_day,
+                                          self.periods), 1.0
+    
+    def refresh(self, day, period):
+        """Recompute both samplers for one slot after the grid or a teacher schedule changed"""
+        slot = day * self.periods + period
+        weight, free = self.slot_weights(day, period)
+        self.weighted.set(slot, weight)
+        self.free.set(slot, free)
+    
+    def block(self, day, period):
+        """Drop a slot another task just took (same section or a shared teacher)"""
+        slot = day * self.periods + period
+        # A slot without fallback weight has no placement weight either
+        if not self.free.weights[slot]:
+            return
+        self.weighted.set(slot, 0.0)
+        self.free.set(slot, 0.0)
+    
+    def placed(self, day):
+        """Account for a period of this task placed on ``day``"""
+        self.periods_placed += 1
+        self.day_counts[day] += 1
+        self.days_used.add(day)
+        # Only this day's weights depend on the placement
+        for p in range(self.periods):
+            self.refresh(day, p)
+
+def place_theory_subjects(problem, grids, teacher_schedule, ledger, locked_counts, teachers, rng):
+    """
+    Place the theory periods of all sections with a global priority queue.
+    
+    Every (section, subject) task is keyed by its slack (free slots minus periods still
+    needed); the most constrained task places one period, the tasks sharing its section
+    or a teacher have that slot removed, and their priorities are updated. Interleaving
+    sections this way keeps late sections from finding their teachers' slots used up.
+    """
+    periods = problem.periods_per_day
+    tasks = []
+    for section in problem.sections:
+        for subject in section.subjects:
+            if subject.is_lab:
+                continue
+            # Locked cells already count towards the weekly periods
+            periods_to_place = subject.periods_per_week - locked_counts.get((section.name, subject.name), 0)
+            if periods_to_place > 0:
+                tasks.append(TheoryTask(section, subject, grids[section.name], teacher_schedule, teachers,
+                                        periods_to_place, problem.days, periods))
+    
+    # Tasks affected by a placement: those of the same section and those sharing a teacher
+    tasks_by_section = {}
+    tasks_by_teacher = {}
+    for task in tasks:
+        tasks_by_section.setdefault(task.section.name, []).append(task)
+        for teacher_name in task.subject.teachers:
+            tasks_by_teacher.setdefault(teacher_name, []).append(task)
+    
+    # The affected tasks never change, so they are collected once per task (the task itself first)
+    for task in tasks:
+        affected = {id(task): task}
+        for other in tasks_by_section[task.section.name]:
+            affected[id(other)] = other
+        for teacher_name in task.subject.teachers:
+            for other in tasks_by_teacher[teacher_name]:
+                affected[id(other)] = other
+        task.affected = list(affected.values())
+    
+    # Heap entries: (slack, random tie-break, version, task index)
+    for i, task in enumerate(tasks):
+        task.index = i
+    heap = [(task.slack(), rng.random(), task.version, i) for i, task in enumerate(tasks)]
+    heapq.heapify(heap)
+    
+    while heap:
+        _, _, version, index = heapq.heappop(heap)
+        task = tasks[index]
+        if version != task.version or not task.remaining():
+            continue
+        subject_teachers = task.teachers
+        
+        # Weighted random selection; teacher load checked against the policy (20% flexibility unless strict)
+        if task.weighted and ledger.allows_all(subject_teachers, 1):
+            slot = task.weighted.sample(rng)
+        # Fallback: try any available slot with more flexibility
+        elif task.free and ledger.allows_all(subject_teachers, 1, fallback=True):
+            slot = task.free.sample(rng)
+        else:
+            teacher_name = task.subject.teachers[0]
+            load_info = ""
+            if not ledger.allows(teachers[teacher_name], 1, fallback=True):
+                load_info = (f" {teacher_name} reached the load limit ({ledger.loads[teacher_name]}/"
+                             f"{teachers[teacher_name].max_load}, {ledger.policy} load policy).")
+            raise Exception(f"Could not place all {task.periods_to_place} periods for {task.subject.name} in section {task.section.name}. Placed {task.periods_placed}.{load_info} Try adjusting teacher loads or periods per week.")
+        
+        day, period = divmod(slot, periods)
+        place_theory_period(task.grid, teacher_schedule, ledger, subject_teachers, task.subject,
+                            task.section.name, day, period)
+        task.placed(day)
+        
+        # Remove the slot from every other task of the section or of the same teachers
+        for other in task.affected:
+            if other is not task:
+                other.block(day, period)
+            if other.remaining():
+                other.version += 1
+                heapq.heappush(heap, (other.slack(), rng.random(), other.version, other.index))
+
+def generate_clash_free_timetable_improved(sections, pinned_sections=None, week=None, load_policy='flexible', rng=None):
+    """
+    Improved clash-free timetable generation with enhanced randomization,
+    better constraint handling, and robust backtracking.
+
+    Adapter around ``solve``: describes the Section objects as a Problem, solves it
+    once and writes the resulting grids back into ``sections``.
+    """
+    solution = solve(build_problem(sections, pinned_sections, week), load_policy, rng)
+    return apply_solution(solution, sections)
+
+def new_teacher_schedule(teacher, problem):
+    """
+    Create an empty teacher schedule with the teacher's unavailable slots and the
+    week's non-teaching slots (half-days) masked out up front.
+    """
+    schedule = [[None] * problem.periods_per_day for _ in range(problem.days)]
+    for day in range(problem.days):
+        for period in range(problem.periods_per_day):
+            if not problem.teaching_mask[day][period]:
+                schedule[day][period] = UNAVAILABLE
+    for day, period in teacher.unavailable:
+        if day < problem.days and period < problem.periods_per_day:
+            schedule[day][period] = UNAVAILABLE
+    return schedule
+
+def teachers_free(teacher_schedule, subject, day, period):
+    """Check that every teacher of the subject (all batches) is free at the given slot."""
+    return all(teacher_schedule[name][day][period] is None for name in subject.teachers)
+
+def place_theory_period(grid, teacher_schedule, ledger, subject_teachers, subject, section_name, day, period):
+    """Place one theory period into the section grid, its teachers' schedules and the load ledger."""
+    grid[day][period] = subject.name
+    for teacher in subject_teachers:
+        teacher_schedule[teacher.name][day][period] = section_name
+        ledger.add(teacher)
+
+def book_room(room_schedule, subject, section_name, day, period):
+    """Record that the section uses the subject's rooms (one booking per batch) at the given slot."""
+    for room_name in subject.rooms:
+        room_schedule[room_name][day][period].append(section_name)
+
+def room_has_space(room_schedule, rooms, subject, day, period):
+    """Check whether the subject's rooms still have capacity for all of its batches at the given slot."""
+    needed = {}
+    for room_name in subject.rooms:
+        needed[room_name] = needed.get(room_name, 0) + 1
+        if len(room_schedule[room_name][day][period]) + needed[room_name] > rooms[room_name].capacity:
+            return False
+    return True
+
+def seed_pinned_occupancy(problem, subjects, teachers, teacher_schedule, room_schedule, ledger):
+    """Mark every period of the pinned sections as taken for its teachers and count it towards their load."""
+    for section in problem.pinned:
+        section_subjects = subjects[section.name]
+        for day, row in enumerate(section.grid[:problem.days]):
+            for period, subject_name in enumerate(row[:problem.periods_per_day]):
+                subject = section_subjects.get(subject_name) if subject_name else None
+                if not subject:
+                    continue
+                for teacher_name in subject.teachers:
+                    teacher_schedule[teacher_name][day][period] = section.name
+                    ledger.add(teachers[teacher_name])
+                book_room(room_schedule, subject, section.name, day, period)
+
+def seed_locked_slots(problem, subjects, teachers, grids, teacher_schedule, room_schedule, ledger):
+    """
+    Place every locked cell into its section grid and teacher schedule before the
+    generation phases run. Returns the number of locked cells per (section, subject).
+    """
+    locked_counts = {}
+    for section in problem.sections:
+        for day, period, subject_name in section.locked:
+            subject = subjects[section.name][subject_name]
+            for teacher_name in subject.teachers:
+                occupant = teacher_schedule[teacher_name][day][period]
+                if occupant == UNAVAILABLE:
+                    raise Exception(f"Locked slot for {subject.name} in section {section.name} (day {day + 1}, period {period + 1}) "
+                                    f"falls in a period {teacher_name} is unavailable. Unlock it or update the teacher's availability.")
+                if occupant is not None:
+                    raise Exception(f"Locked slot for {subject.name} in section {section.name} (day {day + 1}, period {period + 1}) "
+                                    f"clashes with {teacher_name}'s period in section {occupant}. Unlock one of them and try again.")
+            grids[section.name][day][period] = subject.name
+            for teacher_name in subject.teachers:
+                teacher_schedule[teacher_name][day][period] = section.name
+                ledger.add(teachers[teacher_name])
+            book_room(room_schedule, subject, section.name, day, period)
+            key = (section.name, subject.name)
+            locked_counts[key] = locked_counts.get(key, 0) + 1
+    return locked_counts
+
+def seed_warm_start(problem, subjects, teachers, rooms, grids, teacher_schedule, room_schedule, ledger, locked_counts,
+                    warm_start):
+    """
+    Re-place the cells of previous grids that are still valid: the subject still belongs
+    to the section, the slot is a free teaching slot, every teacher is free and within
+    the load policy, rooms have space, lab blocks are whole and lunch-safe, and the
+    subject does not exceed its weekly periods (or 3 theory periods a day). Placements
+    are counted into ``locked_counts`` so the phases only place what is missing.
+    Returns the number of cells kept.
+    """
+    kept = 0
+    for section in problem.sections:
+        previous = warm_start.get(section.name)
+        if not previous:
+            continue
+        grid = grids[section.name]
+        section_subjects = subjects[section.name]
+        
+        def slot_usable(subject, day, period):
+            return (day < len(previous) and period < len(previous[day]) and problem.teaching_mask[day][period]
+                    and grid[day][period] is None and teachers_free(teacher_schedule, subject, day, period)
+                    and room_has_space(room_schedule, rooms, subject, day, period))
+        
+        for day in range(problem.days):
+            row = previous[day] if day < len(previous) else []
+            period = 0
+            while period < min(len(row), problem.periods_per_day):
+                subject = section_subjects.get(row[period]) if row[period] else None
+                key = (section.name, subject.name) if subject else None
+                if subject is None:
+                    period += 1
+                    continue
                 
-                if not placed:
-                    # Fallback: try any available slot with more flexibility
-                    fallback_candidates = []
-                    for day in range(days):
-                        for period in range(periods):
-                            if (section.timetable[day][period] is None and 
-                                teacher_schedule[teacher_name][day][period] is None):
-                                fallback_candidates.append((day, period))
-                    
-                    if fallback_candidates:
-                        day, period = random.choice(fallback_candidates)
-                        section.timetable[day][period] = theory_subject
-                        teacher_schedule[teacher_name][day][period] = section.name
-                        theory_subject.teacher.current_load += 1
-                        periods_placed += 1
-                        placed = True
+                if subject.is_lab:
+                    # Only a whole, lunch-safe block of a lab without a placed block is kept
+                    block = range(period, period + subject.block_size)
+                    starts = allowed_lab_starts(subject.block_size, section.lunch_position, problem.periods_on(day))
+                    if (not locked_counts.get(key) and period in starts and
+                            all(p < len(row) and row[p] == subject.name and slot_usable(subject, day, p) for p in block) and
+                            all(ledger.allows(teachers[name], subject.block_size, is_lab=True) for name in subject.teachers)):
+                        for p in block:
+                            grid[day][p] = subject.name
+                            for teacher_name in subject.teachers:
+                                teacher_schedule[teacher_name][day][p] = section.name
+                            book_room(room_schedule, subject, section.name, day, p)
+                        for teacher_name in subject.teachers:
+                            ledger.add(teachers[teacher_name], subject.block_size)
+                        locked_counts[key] = locked_counts.get(key, 0) + subject.block_size
+                        kept += subject.block_size
+                        period += subject.block_size
+                    else:
+                        period += 1
+                    continue
                 
-                placement_attempts += 1
-            
-            if periods_placed < periods_to_place:
-                raise Exception(f"Could not place all {periods_to_place} periods for {theory_subject.name} in section {section.name}. Placed {periods_placed}. Try adjusting teacher loads or periods per week.")
-    
-    return sections
+                if (locked_counts.get(key, 0) < subject.periods_per_week and grid[day].count(subject.name) < 3 and
+                        slot_usable(subject, day, period) and
+                        all(ledger.allows(teachers[name], 1) for name in subject.teachers)):
+                    place_theory_period(grid, teacher_schedule, ledger, [teachers[name] for name in subject.teachers],
+                                        subject, section.name, day, period)
+                    book_room(room_schedule, subject, section.name, day, period)
+                    locked_counts[key] = locked_counts.get(key, 0) + 1
+                    kept += 1
+                period += 1
+    return kept
 
-def check_lab_placement_feasible_flexible(section, lab_subject, teacher_schedule, teacher_name, day, start):
+def check_lab_placement_feasible_flexible(section, grid, lab_subject, teacher_schedule, day, start, room_schedule, rooms,
+                                          teachers, ledger, load_fallback=False):
     """Check if a lab can be placed at the given position without conflicts, with flexible teacher load constraints."""
     # Check section slots are free
     section_slots_free = all(
-        section.timetable[day][p] is None 
+        grid[day][p] is None 
         for p in range(start, start + lab_subject.block_size)
     )
     
-    # Check teacher availability
+    # Check availability of every teacher in the block (all batches of a split lab)
     teacher_available = all(
-        teacher_schedule[teacher_name][day][p] is None 
+        teachers_free(teacher_schedule, lab_subject, day, p)
         for p in range(start, start + lab_subject.block_size)
     )
     
-    # More flexible teacher load checking - allow up to 50% over capacity for labs to improve placement success
-    teacher_can_handle = (lab_subject.teacher.can_teach(lab_subject.block_size) or 
-                         lab_subject.teacher.current_load + lab_subject.block_size <= lab_subject.teacher.max_load * 1.5)
+    # Check the shared lab room still has capacity for every period of the block
+    room_available = all(
+        room_has_space(room_schedule, rooms, lab_subject, day, p)
+        for p in range(start, start + lab_subject.block_size)
+    )
+    
+    # Teacher load checking per the ledger's policy - up to 50% over capacity for labs unless strict
+    teacher_can_handle = all(
+        ledger.allows(teachers[teacher_name], lab_subject.block_size, is_lab=True, fallback=load_fallback)
+        for teacher_name in lab_subject.teachers
+    )
     
     # CRITICAL: Validate that this placement doesn't span across lunch for this section
-    lunch_position = section.get_lunch_period_position()
+    lunch_position = section.lunch_position
     spans_lunch = (start < lunch_position < start + lab_subject.block_size)
     
-    return section_slots_free and teacher_available and teacher_can_handle and not spans_lunch
+    return section_slots_free and teacher_available and room_available and teacher_can_handle and not spans_lunch
 
-def calculate_placement_weight(day, period, days_used, day_count, max_per_day):
+def calculate_placement_weight(day, period, days_used, day_count, max_per_day, periods=7):
     """Calculate placement weight for smart theory subject distribution."""
     weight = 1.0
     
@@ -200,71 +559,171 @@ def calculate_placement_weight(day, period, days_used, day_count, max_per_day):
         weight *= 1.5
     
     # Slight preference for middle periods (avoid first/last)
-    if 1 <= period <= 5:
+    if 1 <= period <= periods - 2:
         weight *= 1.1
     
     return weight
 
-def generate_timetable(sections):
+def generate_timetable(sections, pinned_sections=None, load_policy='flexible'):
     """
     Main timetable generation function.
+    Returns the generated sections; see generate_timetable_with_loads for the load table.
+    """
+    result_sections, _ = generate_timetable_with_loads(sections, pinned_sections, load_policy)
+    return result_sections
+
+def generate_timetable_with_loads(sections, pinned_sections=None, load_policy='flexible', cache=None,
+                                  prefer_cached=False, warm_start=None, executor=None, seed=None):
+    """
     Uses improved clash-free algorithm with multiple attempts, conflict verification,
     and guaranteed conflict-free results or clear failure with guidance.
+    Returns (sections, load table) where the load table comes from the winning
+    attempts' LoadLedgers.
+
+    The sections are described once as an immutable Problem and split into independent
+    components (departments that share no teacher or room). Every component gets its
+    own attempts, each solving it with its own random generator; a component that
+    fails is retried without re-solving the ones already accepted, and only the merged
+    Solution is written back into the Section objects. With an ``executor``
+    (concurrent.futures, e.g. a ProcessPoolExecutor) the components of a round are
+    solved in parallel.
+
+    When ``pinned_sections`` is given only ``sections`` are re-solved (incremental
+    mode); the pinned grids are left as they are and only conflicts involving a
+    re-solved section make an attempt fail. Under the soft load policy an attempt
+    with overloaded teachers is only kept if no later attempt does better.
+
+    With a ``cache`` (cache.ResultCache) the accepted solution is stored under the
+    problem's fingerprint when it beats the cached one, and ``prefer_cached`` serves
+    the cached best solution for an unchanged problem without searching again.
+
+    ``warm_start`` (section name -> previous grid of subject names) makes the first
+    half of the attempts repair the previous timetable, keeping its still-valid
+    placements; the remaining attempts start from scratch in case the repair is stuck.
+
+    A ``seed`` makes the attempts reproducible; without one every run is different.
     """
     # Import conflicts module for verification
     from conflicts import detect_teacher_conflicts
     
     max_attempts = 8
-    original_random_state = random.getstate()
     
-    print(f"Starting timetable generation with {len(sections)} sections...")
+    pinned_sections = pinned_sections or []
+    solved_names = {section.name for section in sections}
+    LoadLedger(load_policy)  # Reject an unknown policy before any attempt runs
+    problem = build_problem(sections, pinned_sections)
+    fingerprint = problem_fingerprint(problem, load_policy) if cache is not None else None
+    
+    def detect_solved_conflicts(result_sections, pinned):
+        # Pinned-only clashes are pre-existing manual edits
+        return [
+            conflict for conflict in detect_teacher_conflicts(result_sections + pinned)
+            if any(assign['section'].name in solved_names for assign in conflict['assignments'])
+        ]
+    
+    if cache is not None and prefer_cached:
+        cached = cache.get(fingerprint)
+        if cached is not None and set(cached.grids) == solved_names:
+            result_sections = apply_solution(cached, sections)
+            if not detect_solved_conflicts(result_sections, pinned_sections):
+                logger.info("Served cached timetable for problem %s", fingerprint[:12])
+                return result_sections, cached.load_table
     
+    components = split_problem(problem)
+    if pinned_sections:
+        logger.info("Starting incremental timetable generation: re-solving %d sections, keeping %d pinned, "
+                    "in %d independent groups", len(sections), len(pinned_sections), len(components))
+    else:
+        logger.info("Starting timetable generation with %d sections in %d independent groups",
+                    len(sections), len(components))
+    
+    # The Section objects of each component, for verifying its solutions
+    component_sections = []
+    for component in components:
+        names = {section.name for section in component.sections + component.pinned}
+        component_sections.append(([s for s in sections if s.name in names],
+                                   [s for s in pinned_sections if s.name in names]))
+    
+    accepted = {}  # Component index -> accepted Solution
+    best = {}  # Component index -> best overloaded Solution so far (soft policy)
     for attempt in range(max_attempts):
-        try:
+        pending = [index for index in range(len(components)) if index not in accepted]
+        if not pending:
+            break
+        
+        # Generate using improved clash-free algorithm (repairing the warm start first)
+        repair = warm_start if attempt < max_attempts // 2 else None
+        jobs = {}
+        for index in pending:
             # Use timestamp-based random seed for each attempt to ensure unique results every time
-            seed = int(time.time() * 1000000) + attempt * 1000 + random.randint(1, 10000)
-            random.seed(seed)
-            print(f"Attempt {attempt + 1}/{max_attempts} with seed {seed}")
-            
-            # Clear all state before generation attempt
-            clear_all_state(sections)
-            
-            # Generate using improved clash-free algorithm
-            result_sections = generate_clash_free_timetable_improved(sections)
+            base = seed if seed is not None else int(time.time() * 1000000) + random.randint(1, 10000)
+            attempt_seed = base + attempt * 1000 + index
+            jobs[index] = submit_solve(executor, components[index], load_policy, random.Random(attempt_seed), repair)
+        logger.debug("Attempt %d/%d: solving %d of %d groups", attempt + 1, max_attempts, len(pending), len(components))
+        
+        for index, job in jobs.items():
+            group = ', '.join(section.name for section in components[index].sections) or 'pinned sections'
+            try:
+                solution = job.result()
+            except Exception as e:
+                logger.debug("Attempt %d failed for %s with error: %s", attempt + 1, group, e)
+                continue
             
-            # Verify no conflicts exist
-            conflicts = detect_teacher_conflicts(result_sections)
+            # Verify no conflicts exist (pinned-only clashes are pre-existing manual edits)
+            result_sections = apply_solution(solution, component_sections[index][0])
+            conflicts = detect_solved_conflicts(result_sections, component_sections[index][1])
             
-            if not conflicts:
-                print(f"✓ Success! Generated conflict-free timetable on attempt {attempt + 1}")
-                # Restore original random state
-                random.setstate(original_random_state)
-                return result_sections
+            if conflicts:
+                logger.debug("Attempt %d failed for %s: %d conflicts detected", attempt + 1, group, len(conflicts))
+                continue
+            overload = solution.total_overload()
+            if load_policy == 'soft' and overload:
+                logger.debug("Attempt %d for %s is conflict-free but overloads teachers by %d periods",
+                             attempt + 1, group, overload)
+                if index not in best or overload < best[index].total_overload():
+                    best[index] = solution
             else:
-                print(f"✗ Attempt {attempt + 1} failed: {len(conflicts)} conflicts detected")
-                
-        except Exception as e:
-            print(f"✗ Attempt {attempt + 1} failed with error: {str(e)}")
-            
-        # Clear state before next attempt
-        clear_all_state(sections)
+                logger.info("Generated conflict-free timetable for %s on attempt %d", group, attempt + 1)
+                accepted[index] = solution
+    
+    # Soft policy: keep the least overloaded conflict-free attempt of the remaining components
+    for index, solution in best.items():
+        if index not in accepted:
+            logger.info("Keeping the least overloaded attempt (%d periods over max load)", solution.total_overload())
+            accepted[index] = solution
     
-    # All attempts failed
-    random.setstate(original_random_state)
+    if len(accepted) == len(components):
+        solution = merge_solutions(accepted.values())
+        if cache is not None:
+            cache.store(fingerprint, solution)
+        return apply_solution(solution, sections), solution.load_table
+    
+    # All attempts of some component failed
     clear_all_state(sections)
+    failed = [section.name for index, component in enumerate(components) if index not in accepted
+              for section in component.sections]
     
-    raise Exception(f"Could not generate conflict-free timetable after {max_attempts} attempts. "
+    raise Exception(f"Could not generate conflict-free timetable for {', '.join(failed)} after {max_attempts} attempts. "
                    f"This usually means:\n"
-                   f"1. Teacher loads are too restrictive (try increasing max_load)\n"
+                   f"1. Teacher loads are too restrictive (try increasing max_load or a less strict load policy)\n"
                    f"2. Too many periods per week for subjects (try reducing)\n"
                    f"3. Lab block sizes are too large (try smaller blocks)\n"
                    f"4. Not enough teachers for the workload (try adding more teachers or reducing subject assignments)")
 
+def submit_solve(executor, problem, load_policy, rng, warm_start):
+    """Run ``solve`` on the executor, or right here when there is none; returns a Future"""
+    if executor is not None:
+        return executor.submit(solve, problem, load_policy, rng, warm_start)
+    future = Future()
+    try:
+        future.set_result(solve(problem, load_policy, rng, warm_start))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
 def clear_all_state(sections):
-    """Clear all timetable and teacher load state for clean generation attempt."""
+    """Clear all timetables (loads live in each attempt's LoadLedger, never on the models)."""
     for section in sections:
-        section.timetable = [[None for _ in range(7)] for _ in range(6)]
-        for subject in section.subjects:
-            subject.teacher.current_load = 0
+        section.timetable = section.week.empty_grid()
 
 # Old original function removed - only conflict-free generation is now used
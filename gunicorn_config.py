@@ -0,0 +1,25 @@
+"""
+Gunicorn settings for deployments: gunicorn -c gunicorn_config.py main:app
+
+The app is loaded once in the master process, together with everything preload() warms
+(the lazily imported modules and compiled templates) and the built asset bundles, and
+workers are forked from it, so they share that memory and start serving immediately.
+Shared edit sessions and the generation queue live in a worker's memory, so keep one
+worker per instance (WEB_CONCURRENCY) and scale with threads or instances.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+preload_app = True
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+worker_class = "gthread"
+# Each open shared-editing event stream holds a thread, so leave room for them
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+keepalive = 5
+timeout = 120
+loglevel = os.environ.get("LOG_LEVEL", "warning").lower()
+
+
+def on_starting(server):
+    from app import preload
+    preload(server.app.wsgi())
@@ -0,0 +1,88 @@
+"""
+Generation job queue shared by all workspaces, with fair scheduling between them.
+
+Each workspace (or user without one) gets its own lane of queued jobs. A fixed pool of
+worker threads takes lanes in round-robin order, one job at a time, so a college that
+queues many generations only delays its own jobs and never the other tenants'.
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+# Worker threads running generations at the same time
+WORKERS = 2
+# Jobs a single lane may have waiting or running before new ones are refused
+MAX_QUEUED = 4
+
+
+class QueueFull(Exception):
+    """Raised when a lane already has MAX_QUEUED jobs"""
+
+
+class FairScheduler:
+    """Round-robin scheduler over per-lane job queues, run by a pool of worker threads"""
+    def __init__(self, workers=WORKERS, max_queued=MAX_QUEUED):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.lanes = OrderedDict()  # Lane key -> deque of (future, fn, args, kwargs); order is the rotation
+        self.pending = {}  # Lane key -> jobs waiting or running
+        self.condition = threading.Condition()
+        self.started_pid = None
+
+    def start(self):
+        """
+        Start the worker threads on first use. Threads do not survive a fork, so a
+        scheduler created before gunicorn forks its workers starts them in each worker.
+        """
+        if self.started_pid == os.getpid():
+            return
+        self.started_pid = os.getpid()
+        for index in range(self.workers):
+            threading.Thread(target=self.work, name=f'generation-worker-{index}', daemon=True).start()
+
+    def submit(self, lane, fn, *args, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` in a lane; returns a Future for its result"""
+        future = Future()
+        with self.condition:
+            self.start()
+            if self.pending.get(lane, 0) >= self.max_queued:
+                raise QueueFull('Too many timetable generations are already queued. Try again shortly.')
+            self.pending[lane] = self.pending.get(lane, 0) + 1
+            self.lanes.setdefault(lane, deque()).append((future, fn, args, kwargs))
+            self.condition.notify()
+        return future
+
+    def run(self, lane, fn, *args, timeout=None, **kwargs):
+        """Queue a job and wait for its result (re-raising its exception)"""
+        return self.submit(lane, fn, *args, **kwargs).result(timeout)
+
+    def next_job(self):
+        """The first job of the lane whose turn it is; that lane then goes to the back of the rotation"""
+        with self.condition:
+            while not self.lanes:
+                self.condition.wait()
+            lane, jobs = self.lanes.popitem(last=False)
+            job = jobs.popleft()
+            if jobs:
+                self.lanes[lane] = jobs
+            return lane, job
+
+    def work(self):
+        while True:
+            lane, (future, fn, args, kwargs) = self.next_job()
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(*args, **kwargs))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self.condition:
+                    self.pending[lane] -= 1
+                    if not self.pending[lane]:
+                        del self.pending[lane]
+
+    def queued(self, lane):
+        with self.condition:
+            return self.pending.get(lane, 0)
@@ -0,0 +1,237 @@
+"""
+Append-only operation journal for timetable edits, with undo/redo and compaction.
+
+Each working timetable (a user's own or a shared edit session's) has one journal file.
+It starts with a snapshot record and then appends one line per edit, undo or redo.
+An edit stores the before and after value of every cell it touched, so undo and redo
+only rewrite those cells. Once the journal grows past MAX_ENTRIES the oldest applied
+edits are folded into a new snapshot, leaving a short audit line for each of them.
+The journal keeps a checksum of the working timetable to notice when it was replaced;
+edits, undo and redo update it from the rows they touched rather than rehashing everything.
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Edits kept undoable; older ones are folded into the snapshot
+MAX_ENTRIES = 100
+# Journal lines written after the snapshot before the file is rewritten
+MAX_RECORDS = 4 * MAX_ENTRIES
+# Audit lines kept for edits folded into the snapshot
+MAX_AUDIT = 1000
+# Journals kept in memory per store; others are reopened from their file when needed
+MAX_OPEN = 128
+# Checksums are sums of 64-bit row digests
+CHECKSUM_MODULUS = 2 ** 64
+
+
+def row_digest(section_name, day, row):
+    payload = json.dumps([section_name, day, row], sort_keys=True, separators=(',', ':'))
+    return int.from_bytes(hashlib.sha256(payload.encode('utf-8')).digest()[:8], 'big')
+
+
+def sections_checksum(sections):
+    """
+    Short hash of stored sections, used to notice when the working timetable was replaced.
+    It sums one digest per timetable row and one of everything else, so an edit can update it
+    from the rows it touched (see shifted_checksum).
+    """
+    shells = [{key: value for key, value in s.items() if key != 'timetable'} for s in sections]
+    total = row_digest(None, None, shells)
+    for section_data in sections:
+        for day, row in enumerate(section_data['timetable']):
+            total += row_digest(section_data['name'], day, row)
+    return format(total % CHECKSUM_MODULUS, '016x')
+
+
+def shifted_checksum(checksum, sections, entry, side):
+    """Checksum of ``sections`` right after their cells of ``entry`` were set to ``side`` ('before' or 'after')"""
+    if checksum is None:
+        return sections_checksum(sections)
+    section_data = next(s for s in sections if s['name'] == entry['section'])
+    previous = 'after' if side == 'before' else 'before'
+    total = int(checksum, 16)
+    for day in {cell['day'] for cell in entry['cells']}:
+        row = section_data['timetable'][day]
+        old_row = list(row)
+        for cell in entry['cells']:
+            if cell['day'] == day:
+                old_row[cell['period']] = cell[previous]
+        total += row_digest(entry['section'], day, row) - row_digest(entry['section'], day, old_row)
+    return format(total % CHECKSUM_MODULUS, '016x')
+
+
+def write_cells(sections, entry, side):
+    """Write the 'before' or 'after' value of every cell an entry touched"""
+    section_data = next((s for s in sections if s['name'] == entry['section']), None)
+    if section_data is None:
+        return False
+    for cell in entry['cells']:
+        section_data['timetable'][cell['day']][cell['period']] = copy.deepcopy(cell[side])
+    return True
+
+
+def audit_line(entry):
+    return {key: entry.get(key) for key in ('section', 'message', 'author', 'at')}
+
+
+class EditJournal:
+    """Undo/redo history of one working timetable, persisted as a JSON-lines file"""
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = []  # Sections before the first journaled edit
+        self.audit = []  # Summaries of edits folded into the snapshot
+        self.entries = []  # Edits since the snapshot; entries[:position] are applied
+        self.position = 0
+        self.checksum = None  # Checksum of the working timetable after the last record
+        self.records = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return
+        for record in lines:
+            self.replay(record)
+        self.records = max(len(lines) - 1, 0)
+
+    def replay(self, record):
+        kind = record['type']
+        if kind == 'snapshot':
+            self.snapshot = record['sections']
+            self.audit = record.get('audit', [])
+            self.entries = record.get('entries', [])
+            self.position = record.get('position', len(self.entries))
+        elif kind == 'edit':
+            # A new edit discards whatever could have been redone
+            del self.entries[self.position:]
+            self.entries.append(record['entry'])
+            self.position += 1
+        elif kind == 'undo':
+            self.position -= 1
+        elif kind == 'redo':
+            self.position += 1
+        self.checksum = record.get('checksum', self.checksum)
+
+    def append(self, record):
+        self.replay(record)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        self.records += 1
+        if len(self.entries) > MAX_ENTRIES or self.records > MAX_RECORDS:
+            self.compact()
+
+    def rewrite(self):
+        """Replace the file with a single snapshot record of the current state"""
+        record = {'type': 'snapshot', 'sections': self.snapshot, 'audit': self.audit[-MAX_AUDIT:],
+                  'entries': self.entries, 'position': self.position, 'checksum': self.checksum}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        os.replace(tmp_path, self.path)
+        self.records = 0
+
+    def compact(self):
+        """Fold the oldest applied edits into the snapshot, keeping MAX_ENTRIES // 2 undoable"""
+        fold = max(min(len(self.entries) - MAX_ENTRIES // 2, self.position), 0)
+        for entry in self.entries[:fold]:
+            write_cells(self.snapshot, entry, 'after')
+            self.audit.append(audit_line(entry))
+        del self.entries[:fold]
+        self.position -= fold
+        self.rewrite()
+
+    def start(self, sections):
+        """Make ``sections`` the journal's starting point, dropping the history of an earlier timetable"""
+        self.snapshot = copy.deepcopy(sections)
+        self.audit = []
+        self.entries = []
+        self.position = 0
+        self.checksum = sections_checksum(sections)
+        self.rewrite()
+
+    def ensure(self, sections):
+        """Restart the journal when the working timetable is not the one it last saw (regenerated, loaded...)"""
+        if self.checksum != sections_checksum(sections):
+            self.start(sections)
+
+    # record, undo and redo expect ``sections`` to be the timetable the journal last saw
+    # (call ensure first when it may have been replaced); they only touch the edit's cells
+
+    def record(self, sections, section_name, cells, message, author=None):
+        """Journal an edit already applied to ``sections``; cells hold day, period, before and after"""
+        entry = {'section': section_name, 'cells': cells, 'message': message, 'author': author,
+                 'at': int(time.time())}
+        self.append({'type': 'edit', 'entry': entry,
+                     'checksum': shifted_checksum(self.checksum, sections, entry, 'after')})
+        return entry
+
+    def undo(self, sections):
+        """Revert the last applied edit in ``sections``; returns its entry or None"""
+        if not self.can_undo() or not write_cells(sections, self.entries[self.position - 1], 'before'):
+            return None
+        entry = self.entries[self.position - 1]
+        self.append({'type': 'undo', 'checksum': shifted_checksum(self.checksum, sections, entry, 'before')})
+        return entry
+
+    def redo(self, sections):
+        """Re-apply the last undone edit in ``sections``; returns its entry or None"""
+        if not self.can_redo() or not write_cells(sections, self.entries[self.position], 'after'):
+            return None
+        entry = self.entries[self.position]
+        self.append({'type': 'redo', 'checksum': shifted_checksum(self.checksum, sections, entry, 'after')})
+        return entry
+
+    def can_undo(self):
+        return self.position > 0
+
+    def can_redo(self):
+        return self.position < len(self.entries)
+
+    def history(self):
+        """Audit trail, oldest first: folded edits, then journaled ones with whether they are applied"""
+        folded = [dict(line, applied=True) for line in self.audit]
+        return folded + [dict(audit_line(entry), applied=index < self.position)
+                         for index, entry in enumerate(self.entries)]
+
+
+class JournalStore:
+    """
+    One journal per working timetable key, loaded lazily. The most recently used
+    journals stay in memory; every change is already in the file, so an evicted
+    journal is simply reloaded from it.
+    """
+    def __init__(self, directory, max_open=MAX_OPEN):
+        self.directory = directory
+        self.max_open = max_open
+        self.journals = OrderedDict()
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        # Keys are generated tokens; never let a crafted one escape the journal directory
+        key = os.path.basename(str(key))
+        with self.lock:
+            if key in self.journals:
+                self.journals.move_to_end(key)
+            else:
+                self.journals[key] = EditJournal(os.path.join(self.directory, f'{key}.jsonl'))
+                while len(self.journals) > self.max_open:
+                    self.journals.popitem(last=False)
+            return self.journals[key]
+
+    def discard(self, key):
+        key = os.path.basename(str(key))
+        with self.lock:
+            self.journals.pop(key, None)
+            try:
+                os.remove(os.path.join(self.directory, f'{key}.jsonl'))
+            except OSError:
+                pass
@@ -1,4 +1,12 @@
-from app import app
+import os
+
+from app import create_app
+
+if __name__ == '__main__':
+    # The development server runs with the development profile unless APP_PROFILE says otherwise
+    os.environ.setdefault('APP_PROFILE', 'development')
+
+app = create_app()
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    app.run(host='0.0.0.0', port=5000, debug=app.config['DEBUG'], use_reloader=app.config['USE_RELOADER'])
@@ -1,15 +1,95 @@
 from typing import Optional, List
 
+DEFAULT_DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday"]
+
+
+def year_level(year):
+    """Get the year level ('1', '2', ...) from a section year label such as '1st Year' or 'Second'"""
+    year_str = str(year).lower()
+    for word, level in (('first', '1'), ('second', '2'), ('third', '3'), ('fourth', '4')):
+        if word in year_str:
+            return level
+    for char in year_str:
+        if char.isdigit():
+            return char
+    return None
+
+
+def allowed_lab_starts(block_size, lunch_pos, periods):
+    """Start periods where a block fits entirely before or entirely after lunch within ``periods``"""
+    allowed_starts = []
+    for start in range(periods - block_size + 1):
+        end = start + block_size
+        if end <= lunch_pos or start >= lunch_pos:
+            allowed_starts.append(start)
+    return allowed_starts
+
+
+class WeekConfig:
+    """
+    Shape of the teaching week shared by every section: day names, teaching periods
+    per day, lunch position per year level and shortened (half) days.
+    """
+    def __init__(self, day_names=None, periods_per_day=7, lunch_positions=None, half_days=None):
+        self.day_names = list(day_names) if day_names else list(DEFAULT_DAY_NAMES)
+        self.days = len(self.day_names)
+        self.periods_per_day = periods_per_day
+        # Year level -> lunch position (lunch is after that many periods); 'default' covers other years
+        self.lunch_positions = dict(lunch_positions) if lunch_positions else {'1': 3, 'default': 4}
+        # Day index -> number of teaching periods on that day (e.g. Saturday half-day)
+        self.half_days = {int(day): periods for day, periods in (half_days or {}).items()}
+        # Precomputed teaching-slot mask, indexed [day][period]
+        self.teaching_mask = [[period < self.periods_on(day) for period in range(periods_per_day)]
+                              for day in range(self.days)]
+
+    def periods_on(self, day):
+        """Number of teaching periods on the given day"""
+        return min(self.half_days.get(day, self.periods_per_day), self.periods_per_day)
+
+    def is_teaching_slot(self, day, period):
+        return self.teaching_mask[day][period]
+
+    def lunch_position_for(self, year):
+        return self.lunch_positions.get(year_level(year), self.lunch_positions.get('default', 4))
+
+    def empty_grid(self, fill=None):
+        """Create a days x periods grid initialised with ``fill``"""
+        return [[fill for _ in range(self.periods_per_day)] for _ in range(self.days)]
+
+    def to_dict(self):
+        return {
+            'day_names': self.day_names,
+            'periods_per_day': self.periods_per_day,
+            'lunch_positions': self.lunch_positions,
+            'half_days': {str(day): periods for day, periods in self.half_days.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(data.get('day_names'), data.get('periods_per_day', 7),
+                   data.get('lunch_positions'), data.get('half_days'))
+
+
+DEFAULT_WEEK = WeekConfig()
+
+
 class Teacher:
-    def __init__(self, name, max_load=28, subjects=None):
+    def __init__(self, name, max_load=28, subjects=None, unavailable=None):
         self.name = name
         self.max_load = max_load
         self.current_load = 0
         self.subjects = subjects if subjects is not None else []  # List of subject names
+        # Set of (day, period) slots the teacher cannot be scheduled in (part-time / visiting faculty)
+        self.unavailable = {tuple(slot) for slot in unavailable} if unavailable else set()
 
     def can_teach(self, periods):
         return self.current_load + periods <= self.max_load
 
+    def is_available(self, day, period):
+        return (day, period) not in self.unavailable
+
     def can_teach_subject(self, subject_name):
         return subject_name in self.subjects
 
@@ -21,6 +101,13 @@ class Teacher:
         return False
 
 
+class Room:
+    def __init__(self, name, capacity=1, room_type='lab'):
+        self.name = name
+        self.capacity = capacity  # Number of sections that can use the room at the same time
+        self.room_type = room_type
+
+
 class Subject:
     def __init__(self, name, periods_per_week, is_lab=False, block_size=1):
         self.name = name
@@ -29,24 +116,51 @@ class Subject:
         self.block_size = block_size
         self.teachers: List[str] = []  # List of teacher names assigned to this subject
         self.teacher: Optional[Teacher] = None  # Currently assigned teacher object
+        self.room: Optional[Room] = None  # Shared room/resource the lab runs in
+        # Split-batch labs: teachers and rooms of batches 2..n, running in the same block as batch 1
+        self.batch_teachers: List[Teacher] = []
+        self.batch_rooms: List[Optional[Room]] = []
+
+    def get_session_teachers(self):
+        """All teachers occupied while this subject runs (the main teacher plus batch teachers)"""
+        teachers = [self.teacher] if self.teacher else []
+        for teacher in self.batch_teachers:
+            if teacher and all(teacher.name != t.name for t in teachers):
+                teachers.append(teacher)
+        return teachers
+
+    def get_session_rooms(self):
+        """All rooms occupied while this subject runs, one entry per batch using a room"""
+        return [room for room in [self.room] + self.batch_rooms if room]
 
 
 class Section:
-    def __init__(self, name, year, subject_assignments):
+    def __init__(self, name, year, subject_assignments, locked_slots=None, week=None):
         self.name = name
         self.year = year
+        self.week = week or DEFAULT_WEEK
         self.subject_assignments = subject_assignments  # List of (subject, teacher) pairs
-        self.timetable = [[None for _ in range(7)] for _ in range(6)]  # 7 teaching periods
+        self.timetable = self.week.empty_grid()  # days x teaching periods
         # For compatibility: subjects property is a list of subject objects
         self.subjects = [subj for subj, teacher in subject_assignments] if subject_assignments else []
+        # Cells fixed by hand: list of {'day', 'period', 'subject'} dicts kept across regenerations
+        self.locked_slots = locked_slots if locked_slots is not None else []
+    
+    def is_locked(self, day, period):
+        """Check whether a teaching period has been locked to a subject"""
+        return any(slot['day'] == day and slot['period'] == period for slot in self.locked_slots)
+    
+    def get_locked_subject_slots(self):
+        """Get (day, period, subject) for every locked cell whose subject belongs to this section"""
+        subjects_by_name = {subj.name: subj for subj in self.subjects}
+        return [(slot['day'], slot['period'], subjects_by_name[slot['subject']])
+                for slot in self.locked_slots
+                if slot['subject'] in subjects_by_name and slot['day'] < self.week.days
+                and slot['period'] < self.week.periods_per_day]
     
     def get_lunch_period_position(self):
         """Get lunch break position based on year level (for display purposes)"""
-        year_str = str(self.year).lower()
-        if '1st' in year_str or 'first' in year_str or '1' in year_str:
-            return 3  # Lunch after 3rd period (between period 3 and 4)
-        else:  # 2nd year and above
-            return 4  # Lunch after 4th period (between period 4 and 5)
+        return self.week.lunch_position_for(self.year)
     
     def get_morning_periods(self):
         """Get list of morning period indices (before lunch)"""
@@ -56,36 +170,17 @@ class Section:
     def get_evening_periods(self):
         """Get list of evening period indices (after lunch)"""
         lunch_pos = self.get_lunch_period_position()
-        return list(range(lunch_pos, 7))  # 7 total teaching periods
+        return list(range(lunch_pos, self.week.periods_per_day))
     
-    def get_allowed_lab_starts(self, block_size):
-        """Get allowed starting positions for lab blocks based on year and block size"""
-        year_str = str(self.year).lower()
-        is_first_year = '1st' in year_str or 'first' in year_str or '1' in year_str
+    def get_allowed_lab_starts(self, block_size, day=None):
+        """
+        Get allowed starting positions for lab blocks based on year and block size.
         
-        allowed_starts = []
-        
-        if is_first_year:
-            # 1st year: lunch after period 3 (periods 0,1,2 = morning; 3,4,5,6 = afternoon)
-            if block_size == 4:
-                # 4-block labs: only afternoon (periods 3,4,5,6)
-                allowed_starts.append(3)
-            elif block_size == 3:
-                # 3-block labs: morning (0,1,2) or afternoon (3,4,5) or (4,5,6)
-                allowed_starts.extend([0, 3, 4])
-            elif block_size == 2:
-                # 2-block labs: within morning (0,1) or (1,2) or afternoon (3,4) or (4,5) or (5,6)
-                allowed_starts.extend([0, 1, 3, 4, 5])
-        else:
-            # 2nd/3rd year: lunch after period 4 (periods 0,1,2,3 = morning; 4,5,6 = afternoon)
-            if block_size == 4:
-                # 4-block labs: only morning (periods 0,1,2,3)
-                allowed_starts.append(0)
-            elif block_size == 3:
-                # 3-block labs: morning (0,1,2) or (1,2,3) or afternoon (4,5,6)
-                allowed_starts.extend([0, 1, 4])
-            elif block_size == 2:
-                # 2-block labs: within morning (0,1) or (1,2) or (2,3) or afternoon (4,5) or (5,6)
-                allowed_starts.extend([0, 1, 2, 4, 5])
-        
-        return allowed_starts
+        A block must fit entirely before or entirely after lunch, e.g. with lunch after
+        period 3 (1st year) a 4-block lab can only start at 3, while with lunch after
+        period 4 (2nd/3rd year) it can only start at 0. When ``day`` is given the block
+        must also end before the day's last teaching period (half-days).
+        """
+        lunch_pos = self.get_lunch_period_position()
+        periods = self.week.periods_on(day) if day is not None else self.week.periods_per_day
+        return allowed_lab_starts(block_size, lunch_pos, periods)
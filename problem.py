@@ -0,0 +1,167 @@
+"""
+Immutable problem and solution descriptions for the timetable generator.
+
+The generator core only reads a Problem and returns a new Solution, so attempts
+can run concurrently (threads, pools) without sharing Section or Teacher objects.
+The adapters below convert between these descriptions and the model objects, and
+split_problem/merge_solutions cut a problem into independently solvable parts.
+"""
+from typing import NamedTuple, Optional, Tuple, FrozenSet, Dict, List
+
+from models import DEFAULT_WEEK
+
+
+class TeacherSpec(NamedTuple):
+    name: str
+    max_load: int
+    unavailable: FrozenSet[Tuple[int, int]]
+
+
+class RoomSpec(NamedTuple):
+    name: str
+    capacity: int
+
+
+class SubjectSpec(NamedTuple):
+    name: str
+    periods_per_week: int
+    is_lab: bool
+    block_size: int
+    teachers: Tuple[str, ...]  # Main teacher first, then split-batch teachers
+    rooms: Tuple[str, ...]  # One entry per batch using a room
+
+
+class SectionSpec(NamedTuple):
+    name: str
+    year: str
+    lunch_position: int
+    subjects: Tuple[SubjectSpec, ...]
+    locked: Tuple[Tuple[int, int, str], ...]  # (day, period, subject name)
+    grid: Optional[Tuple[Tuple[Optional[str], ...], ...]] = None  # Fixed grid of pinned sections
+
+
+class Problem(NamedTuple):
+    days: int
+    periods_per_day: int
+    teaching_mask: Tuple[Tuple[bool, ...], ...]  # [day][period], False for non-teaching slots
+    teachers: Tuple[TeacherSpec, ...]
+    rooms: Tuple[RoomSpec, ...]
+    sections: Tuple[SectionSpec, ...]  # Sections to solve
+    pinned: Tuple[SectionSpec, ...] = ()  # Sections whose grids stay as they are
+
+    def periods_on(self, day):
+        """Number of teaching periods on the given day"""
+        return sum(self.teaching_mask[day])
+
+
+class Solution(NamedTuple):
+    grids: Dict[str, Tuple[Tuple[Optional[str], ...], ...]]  # Section name -> grid of subject names
+    load_table: List[dict]  # Per-teacher load rows from the LoadLedger
+
+    def total_overload(self):
+        return sum(row['overload'] for row in self.load_table)
+
+
+def section_spec(section, pinned=False):
+    """Describe a Section (its subjects, locks and, when pinned, its current grid)"""
+    subjects = tuple(
+        SubjectSpec(subject.name, subject.periods_per_week, subject.is_lab, subject.block_size,
+                    tuple(teacher.name for teacher in subject.get_session_teachers()),
+                    tuple(room.name for room in subject.get_session_rooms()))
+        for subject in section.subjects
+    )
+    locked = tuple((day, period, subject.name) for day, period, subject in section.get_locked_subject_slots())
+    grid = None
+    if pinned:
+        grid = tuple(tuple(cell.name if cell and cell.teacher else None for cell in row) for row in section.timetable)
+    return SectionSpec(section.name, str(section.year), section.get_lunch_period_position(), subjects, locked, grid)
+
+
+def build_problem(sections, pinned_sections=None, week=None):
+    """Build an immutable Problem from Section objects (the models are not modified)"""
+    pinned_sections = pinned_sections or []
+    all_sections = list(sections) + list(pinned_sections)
+    week = week or (all_sections[0].week if all_sections else DEFAULT_WEEK)
+
+    teachers = {}
+    rooms = {}
+    for section in all_sections:
+        for subject in section.subjects:
+            for teacher in subject.get_session_teachers():
+                teachers.setdefault(teacher.name, TeacherSpec(teacher.name, teacher.max_load, frozenset(teacher.unavailable)))
+            for room in subject.get_session_rooms():
+                rooms.setdefault(room.name, RoomSpec(room.name, room.capacity))
+
+    return Problem(
+        days=week.days,
+        periods_per_day=week.periods_per_day,
+        teaching_mask=tuple(tuple(row) for row in week.teaching_mask),
+        teachers=tuple(teachers[name] for name in sorted(teachers)),
+        rooms=tuple(rooms[name] for name in sorted(rooms)),
+        sections=tuple(section_spec(section) for section in sections),
+        pinned=tuple(section_spec(section, pinned=True) for section in pinned_sections)
+    )
+
+
+def apply_solution(solution, sections):
+    """Write the solution's grids into the Section objects, using each section's own subject instances"""
+    for section in sections:
+        grid = solution.grids.get(section.name)
+        if grid is None:
+            continue
+        subjects_by_name = {subject.name: subject for subject in section.subjects}
+        section.timetable = [[subjects_by_name.get(name) if name else None for name in row] for row in grid]
+    return sections
+
+
+def split_problem(problem):
+    """
+    Split a problem into independent sub-problems, one per connected component of the
+    graph linking sections (solved and pinned) that share a teacher or a room. No
+    placement in one component can clash with another, so each can be solved on its
+    own. Components with the most sections to solve come first.
+    """
+    all_sections = problem.sections + problem.pinned
+    parent = list(range(len(all_sections)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    # Union every section with the first section using each of its teachers and rooms
+    first_user = {}
+    for index, section in enumerate(all_sections):
+        for subject in section.subjects:
+            for resource in [('teacher', name) for name in subject.teachers] + [('room', name) for name in subject.rooms]:
+                if resource in first_user:
+                    parent[find(index)] = find(first_user[resource])
+                else:
+                    first_user[resource] = index
+
+    components = {}
+    for index in range(len(all_sections)):
+        components.setdefault(find(index), []).append(index)
+    problems = []
+    for indices in components.values():
+        members = [all_sections[index] for index in indices]
+        teacher_names = {name for section in members for subject in section.subjects for name in subject.teachers}
+        room_names = {name for section in members for subject in section.subjects for name in subject.rooms}
+        problems.append(problem._replace(
+            teachers=tuple(teacher for teacher in problem.teachers if teacher.name in teacher_names),
+            rooms=tuple(room for room in problem.rooms if room.name in room_names),
+            sections=tuple(all_sections[index] for index in indices if index < len(problem.sections)),
+            pinned=tuple(all_sections[index] for index in indices if index >= len(problem.sections))
+        ))
+    return sorted(problems, key=lambda part: -len(part.sections))
+
+
+def merge_solutions(solutions):
+    """Combine the solutions of split_problem's components into one Solution"""
+    grids = {}
+    load_table = []
+    for solution in solutions:
+        grids.update(solution.grids)
+        load_table.extend(solution.load_table)
+    return Solution(grids, sorted(load_table, key=lambda row: row['teacher']))
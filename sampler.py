@@ -0,0 +1,75 @@
+"""
+Weighted random sampling over a fixed set of slots with incremental weight updates.
+Used by theory placement to draw (day, period) slots in O(log n) per draw.
+"""
+
+
+class FenwickSampler:
+    """Fenwick (binary indexed) tree over slot weights supporting O(log n) updates and weighted draws"""
+    def __init__(self, size):
+        self.size = size
+        self.weights = [0.0] * size
+        self.tree = [0.0] * (size + 1)
+        self.active = 0  # Number of slots with a positive weight
+        # Highest power of two not above size, for the top-down search
+        self.top = 1
+        while self.top * 2 <= size:
+            self.top *= 2
+
+    def load(self, weights):
+        """Set every slot weight at once, building the tree in O(n) instead of n updates"""
+        self.weights = [weight if weight > 0 else 0.0 for weight in weights]
+        self.active = sum(1 for weight in self.weights if weight > 0)
+        tree = [0.0] + self.weights
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self.tree = tree
+
+    def set(self, index, weight):
+        """Set the weight of a slot (0 removes it from the draw)"""
+        if weight < 0:
+            weight = 0.0
+        delta = weight - self.weights[index]
+        if not delta:
+            return
+        self.active += (weight > 0) - (self.weights[index] > 0)
+        self.weights[index] = weight
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def total(self):
+        """Sum of all slot weights"""
+        total = 0.0
+        i = self.size
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def __bool__(self):
+        return self.active > 0
+
+    def sample(self, rng):
+        """Draw a slot index with probability proportional to its weight"""
+        if not self.active:
+            raise ValueError("Cannot sample from an empty sampler")
+        remaining = rng.random() * self.total()
+        # Descend the tree to the first slot whose prefix sum exceeds ``remaining``
+        index = 0
+        step = self.top
+        while step:
+            nxt = index + step
+            if nxt <= self.size and self.tree[nxt] <= remaining:
+                index = nxt
+                remaining -= self.tree[nxt]
+            step //= 2
+        # Guard against floating point drift landing on an emptied slot
+        if index >= self.size or self.weights[index] <= 0:
+            index = min(index, self.size - 1)
+            forward = [i for i in range(index, self.size) if self.weights[i] > 0]
+            index = forward[0] if forward else max(i for i in range(index) if self.weights[i] > 0)
+        return index
@@ -0,0 +1,258 @@
+"""
+Conversion between the stored data format (session, saved timetables, /export_data files)
+and the model objects, shared by the web app and the command-line generator.
+"""
+from models import Teacher, Subject, Section, Room
+
+
+def build_teacher(teacher_data):
+    """Create a Teacher object from stored teacher data, including their unavailable slots"""
+    return Teacher(teacher_data['name'], teacher_data['max_load'],
+                   unavailable=teacher_data.get('unavailable', []))
+
+
+def build_rooms(room_data_list):
+    """Create Room objects keyed by name from stored room data"""
+    return {r['name']: Room(r['name'], r.get('capacity', 1), r.get('room_type', 'lab')) for r in room_data_list}
+
+
+def build_subject_instance(template, teacher, rooms=None, batch_teachers=None):
+    """Create a section-specific subject instance from a stored subject template"""
+    subject_instance = Subject(
+        template['name'],
+        template['periods_per_week'],
+        template['is_lab'],
+        template['block_size']
+    )
+    subject_instance.teacher = teacher
+    subject_instance.room = (rooms or {}).get(template.get('room'))
+    # Split-batch labs: extra batches run in the same block with their own teacher and room
+    subject_instance.batch_teachers = list(batch_teachers or [])
+    subject_instance.batch_rooms = [(rooms or {}).get(room_name) for room_name in template.get('batch_rooms', [])]
+    return subject_instance
+
+
+def assignment_teacher_names(assignment):
+    """All teacher names of a stored subject assignment (main teacher plus batch teachers)"""
+    names = [assignment['teacher']] if assignment.get('teacher') else []
+    return names + [name for name in assignment.get('batch_teachers', []) if name not in names]
+
+
+def build_sections_from_config(section_configs, teachers, subject_templates, rooms=None, week=None):
+    """Create empty Section objects from the configured sections and their subject-teacher assignments"""
+    sections = []
+    for section_data in section_configs:
+        subject_assignments = []
+        for assignment in section_data.get('subject_assignments', []):
+            subject_name = assignment['subject']
+            teacher_name = assignment['teacher']
+            
+            # Create a NEW subject instance for this specific section assignment
+            if subject_name in subject_templates and teacher_name:
+                teacher_obj = teachers.get(teacher_name)
+                if teacher_obj:
+                    batch_teachers = [teachers[name] for name in assignment.get('batch_teachers', []) if name in teachers]
+                    subject_instance = build_subject_instance(subject_templates[subject_name], teacher_obj, rooms, batch_teachers)
+                    subject_assignments.append((subject_instance, teacher_obj))
+        
+        sections.append(Section(section_data['name'], section_data['year'], subject_assignments,
+                                section_data.get('locked_slots', []), week))
+    return sections
+
+
+def restore_sections(stored_sections, teachers, subject_templates, rooms=None, week=None):
+    """Rebuild Section objects (including their timetables) from serialized generated sections"""
+    sections = []
+    for section_data in stored_sections:
+        # Create subject assignments with proper teacher assignments from stored data
+        section_subject_instances = {}  # Track subject instances for this specific section
+        subject_assignments = []
+        
+        for assignment in section_data.get('subject_assignments', []):
+            subject_name = assignment['subject']
+            teacher_name = assignment['teacher']
+            
+            if subject_name in subject_templates and teacher_name in teachers:
+                batch_teachers = [teachers[name] for name in assignment.get('batch_teachers', []) if name in teachers]
+                subject_instance = build_subject_instance(subject_templates[subject_name], teachers[teacher_name], rooms,
+                                                          batch_teachers)
+                section_subject_instances[subject_name] = subject_instance
+                subject_assignments.append((subject_instance, teachers[teacher_name]))
+        
+        section = Section(section_data['name'], section_data['year'], subject_assignments,
+                          section_data.get('locked_slots', []), week)
+        
+        # Reconstruct timetable from stored data with proper section-specific subject instances
+        # (only the part that still fits the current week shape)
+        for day, day_schedule in enumerate(section_data['timetable'][:section.week.days]):
+            for period, stored_subject in enumerate(day_schedule[:section.week.periods_per_day]):
+                if stored_subject:
+                    subject_name = stored_subject['name']
+                    teacher_name = stored_subject.get('teacher', '')
+                    
+                    # Use the section-specific subject instance
+                    if subject_name in section_subject_instances:
+                        subject_instance = section_subject_instances[subject_name]
+                        # Ensure teacher is properly assigned from stored data
+                        if teacher_name and teacher_name in teachers:
+                            subject_instance.teacher = teachers[teacher_name]
+                        section.timetable[day][period] = subject_instance
+        sections.append(section)
+    return sections
+
+
+def grid_names(stored_sections):
+    """Previous grids of subject names per section, used to warm-start generation"""
+    return {s['name']: [[cell['name'] if cell else None for cell in row] for row in s['timetable']]
+            for s in stored_sections}
+
+
+def count_unchanged_cells(old_sections, new_sections):
+    """Number of scheduled cells with the same subject in both versions"""
+    old_grids = grid_names(old_sections)
+    unchanged = 0
+    for name, grid in grid_names(new_sections).items():
+        old = old_grids.get(name, [])
+        for day, row in enumerate(grid):
+            for period, subject_name in enumerate(row):
+                if (subject_name and day < len(old) and period < len(old[day]) and
+                        old[day][period] == subject_name):
+                    unchanged += 1
+    return unchanged
+
+
+def serialize_sections(sections):
+    """Convert generated Section objects into the session format used for editing and saving"""
+    serialized = []
+    for section in sections:
+        # Convert section to serializable format with complete teacher assignments
+        subject_assignments = []
+        for subject in section.subjects:
+            if subject.teacher:
+                subject_assignments.append({
+                    'subject': subject.name,
+                    'teacher': subject.teacher.name,
+                    'batch_teachers': [t.name for t in subject.batch_teachers]
+                })
+        
+        section_data = {
+            'name': section.name,
+            'year': section.year,
+            'subject_names': [s.name for s in section.subjects],
+            'subject_assignments': subject_assignments,
+            'locked_slots': list(section.locked_slots),
+            'timetable': []
+        }
+        
+        # Store timetable with complete subject and teacher data
+        for day in range(section.week.days):
+            day_schedule = []
+            for period in range(section.week.periods_per_day):
+                subject = section.timetable[day][period]
+                if subject:
+                    day_schedule.append({
+                        'name': subject.name,
+                        'teacher': subject.teacher.name if subject.teacher else 'Unassigned',
+                        'is_lab': subject.is_lab,
+                        'block_size': getattr(subject, 'block_size', 1),
+                        'room': subject.room.name if subject.room else None,
+                        'batch_rooms': [room.name if room else None for room in subject.batch_rooms]
+                    })
+                else:
+                    day_schedule.append(None)
+            section_data['timetable'].append(day_schedule)
+        
+        serialized.append(section_data)
+    return serialized
+
+
+def find_affected_sections(section_configs, generated_sections, subject_templates, teachers=None, week=None):
+    """
+    Work out which configured sections must be re-solved after a configuration change.
+    
+    A section is affected when it is new, its subject-teacher assignments or locks
+    changed, the stored grid no longer matches the week shape or a subject's periods
+    per week (one block for labs), lab flag or block size, or a stored period falls in a slot its teacher
+    is now unavailable. Sections sharing a teacher with an affected section are re-solved as well so
+    the freed and newly needed teacher slots can be redistributed.
+    """
+    generated_by_name = {s['name']: s for s in generated_sections}
+    changed = set()
+    touched_teachers = set()
+    
+    for section_data in section_configs:
+        assignments = {a['subject']: tuple(assignment_teacher_names(a)) for a in section_data.get('subject_assignments', [])
+                       if a.get('teacher') and a['subject'] in subject_templates}
+        stored = generated_by_name.get(section_data['name'])
+        if not stored or stored.get('year') != section_data['year']:
+            changed.add(section_data['name'])
+            touched_teachers.update(name for names in assignments.values() for name in names)
+            continue
+        
+        stored_assignments = {a['subject']: tuple(assignment_teacher_names(a)) for a in stored.get('subject_assignments', [])}
+        is_changed = (stored_assignments != assignments or
+                      stored.get('locked_slots', []) != section_data.get('locked_slots', []))
+        if week and (len(stored['timetable']) != week.days or
+                     any(len(row) != week.periods_per_day for row in stored['timetable'])):
+            is_changed = True
+        
+        if not is_changed:
+            # Compare the stored grid against the current subject definitions
+            cell_counts = {}
+            for day, day_schedule in enumerate(stored['timetable']):
+                for period, cell in enumerate(day_schedule):
+                    if cell:
+                        if week and day < week.days and period < week.periods_per_day and not week.is_teaching_slot(day, period):
+                            is_changed = True
+                        # Every teacher of the cell counts, batch teachers of a split lab included
+                        for name in {cell.get('teacher'), *stored_assignments.get(cell['name'], ())}:
+                            teacher = (teachers or {}).get(name)
+                            if teacher and not teacher.is_available(day, period):
+                                is_changed = True
+                        cell_counts[cell['name']] = cell_counts.get(cell['name'], 0) + 1
+                        template = subject_templates.get(cell['name'])
+                        if (template and (cell.get('is_lab') != template['is_lab'] or
+                                          cell.get('block_size', template['block_size']) != template['block_size'] or
+                                          cell.get('room') != template.get('room') or
+                                          cell.get('batch_rooms', []) != template.get('batch_rooms', []))):
+                            is_changed = True
+            for subject_name in assignments:
+                # A lab is placed as a single block, so its grid holds block_size cells
+                template = subject_templates[subject_name]
+                expected = template['block_size'] if template['is_lab'] else template['periods_per_week']
+                if cell_counts.get(subject_name, 0) != expected:
+                    is_changed = True
+        
+        if is_changed:
+            changed.add(section_data['name'])
+            touched_teachers.update(name for names in assignments.values() for name in names)
+            touched_teachers.update(name for names in stored_assignments.values() for name in names)
+    
+    # Sections sharing a teacher with a changed section are re-solved too
+    affected = set(changed)
+    for section_data in section_configs:
+        teacher_names = {name for a in section_data.get('subject_assignments', [])
+                         for name in assignment_teacher_names(a)}
+        if teacher_names & touched_teachers:
+            affected.add(section_data['name'])
+    return affected
+
+
+def section_teacher_names(section_data):
+    """Subject name -> every teacher of it in a stored section (main teacher first, then batch teachers)"""
+    names = {}
+    for assignment in section_data.get('subject_assignments', []):
+        names[assignment['subject']] = assignment_teacher_names(assignment)
+    return names
+
+
+def teacher_grid(stored_sections, teacher_name, week):
+    """A teacher's week across stored sections: [day][period] -> [[section, subject], ...] or None"""
+    grid = [[None] * week.periods_per_day for _ in range(week.days)]
+    for section_data in stored_sections:
+        teacher_names = section_teacher_names(section_data)
+        for day, row in enumerate(section_data['timetable'][:week.days]):
+            for period, cell in enumerate(row[:week.periods_per_day]):
+                if cell and teacher_name in teacher_names.get(cell['name'], [cell.get('teacher')]):
+                    grid[day][period] = (grid[day][period] or []) + [[section_data['name'], cell['name']]]
+    return grid
@@ -0,0 +1,36 @@
+function showLoadingSpinner() {
+    document.getElementById('loadingSpinner').classList.add('active');
+}
+
+function hideLoadingSpinner() {
+    document.getElementById('loadingSpinner').classList.remove('active');
+}
+
+window.addEventListener('load', function() {
+    hideLoadingSpinner();
+});
+
+function confirmReset() {
+    if (confirm('⚠️ WARNING: This will delete ALL your data including teachers, subjects, sections, and saved timetables.\n\nAre you absolutely sure you want to continue?')) {
+        if (confirm('⚠️ FINAL WARNING: This action CANNOT be undone!\n\nAll your work will be permanently deleted.\n\nClick OK to proceed with deletion, or Cancel to keep your data.')) {
+            fetch(document.body.dataset.resetUrl, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                }
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    window.location.href = document.body.dataset.homeUrl;
+                } else {
+                    alert('Error resetting data: ' + data.message);
+                }
+            })
+            .catch(error => {
+                console.error('Error:', error);
+                alert('An error occurred while resetting data');
+            });
+        }
+    }
+}
@@ -0,0 +1,116 @@
+"""
+Server-side storage for saved timetables.
+Each owner gets a small metadata index for listing plus one JSON file per timetable,
+so listing never reads section grids and a timetable is loaded by id only when opened.
+"""
+import json
+import os
+import shutil
+import threading
+
+
+def timetable_metadata(saved):
+    """The listing fields of a saved timetable (everything except the section grids)"""
+    return {
+        'id': saved['id'],
+        'name': saved['name'],
+        'created_at': saved['created_at'],
+        'sections': [{'name': s['name'], 'year': s.get('year')} for s in saved['sections']]
+    }
+
+
+class TimetableStore:
+    """Saved timetables per owner (a session's store id) as an id-indexed directory of JSON files"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def owner_dir(self, owner):
+        # Owner ids are generated hex tokens; never let a crafted one escape the store directory
+        return os.path.join(self.directory, os.path.basename(str(owner)))
+
+    def path(self, owner, saved_id):
+        return os.path.join(self.owner_dir(owner), f'{int(saved_id)}.json')
+
+    def read_json(self, path, default):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def write_json(self, path, data):
+        # Write to a temporary file first so readers never see a partial file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def index(self, owner):
+        """Metadata of all saved timetables of an owner, keyed by id"""
+        return self.read_json(os.path.join(self.owner_dir(owner), 'index.json'), {})
+
+    def write_index(self, owner, index):
+        self.write_json(os.path.join(self.owner_dir(owner), 'index.json'), index)
+
+    def count(self, owner):
+        return len(self.index(owner))
+
+    def list(self, owner, page=1, per_page=None):
+        """Metadata newest first, optionally one page of it; returns (items, total)"""
+        items = sorted(self.index(owner).values(), key=lambda x: x['created_at'], reverse=True)
+        if per_page:
+            start = (max(page, 1) - 1) * per_page
+            return items[start:start + per_page], len(items)
+        return items, len(items)
+
+    def get(self, owner, saved_id):
+        """The full saved timetable (with section grids) or None"""
+        try:
+            return self.read_json(self.path(owner, saved_id), None)
+        except (TypeError, ValueError):
+            return None
+
+    def add(self, owner, saved):
+        """
+        Store a timetable and return its id. The requested id (a creation timestamp) is
+        kept when free; otherwise the next free id is used so two saves in the same
+        second never overwrite each other.
+        """
+        with self.lock:
+            index = self.index(owner)
+            if str(saved['id']) in index:
+                saved['id'] = max(int(saved_id) for saved_id in index) + 1
+            self.write_json(self.path(owner, saved['id']), saved)
+            index[str(saved['id'])] = timetable_metadata(saved)
+            self.write_index(owner, index)
+            return saved['id']
+
+    def delete(self, owner, saved_id):
+        with self.lock:
+            index = self.index(owner)
+            if index.pop(str(saved_id), None) is None:
+                return False
+            self.write_index(owner, index)
+            try:
+                os.remove(self.path(owner, saved_id))
+            except OSError:
+                pass
+        return True
+
+    def all(self, owner):
+        """Every saved timetable with its grids, newest first (used for export)"""
+        items, _ = self.list(owner)
+        return [saved for saved in (self.get(owner, meta['id']) for meta in items) if saved]
+
+    def replace_all(self, owner, saved_timetables):
+        """Replace an owner's saved timetables (used for import)"""
+        self.clear(owner)
+        for saved in saved_timetables:
+            self.add(owner, saved)
+
+    def clear(self, owner):
+        with self.lock:
+            shutil.rmtree(self.owner_dir(owner), ignore_errors=True)
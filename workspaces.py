@@ -0,0 +1,211 @@
+"""
+Institution workspaces: one configuration and working timetable shared by everyone who joined.
+
+A browser that joined a workspace keeps only per-browser state (flash messages, page
+versions, its shared edit session) in its cookie. The institution's data lives on the
+server in the workspace directory, next to the workspace's own saved timetables,
+generation cache and edit journals, so colleges hosted on one deployment never share
+or contend for each other's storage.
+"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import uuid
+
+from flask.sessions import SecureCookieSessionInterface
+
+from cache import MemoCache, ResultCache
+from journal import JournalStore
+from storage import TimetableStore
+
+# Session keys holding the institution's data; everything else stays per browser
+SHARED_KEYS = ('teachers', 'subjects', 'sections', 'rooms', 'week', 'load_policy',
+               'generated_sections', 'load_report', 'store_id')
+WORKSPACE_ID = re.compile(r'^[0-9a-f]{12}$')
+
+
+class Workspace:
+    """An institution's storage, caches and scheduling lane; ``directory`` holds its shared data"""
+    def __init__(self, workspace_id, name, store, cache, journals, directory=None, join_code=None):
+        self.id = workspace_id
+        self.name = name
+        self.store = store  # Saved timetables
+        self.cache = cache  # Generated solutions
+        self.journals = journals  # Undo/redo journals
+        self.directory = directory
+        self.join_code = join_code
+        self.conflicts = MemoCache(64)  # Conflict messages per timetable
+        self.fragments = MemoCache(256)  # Rendered edit-page section cards
+        self.lock = threading.Lock()
+        self.data = {}
+        self.data_stamp = None  # (mtime, size) of the data file the cached data was read from
+
+    @classmethod
+    def open(cls, directory, meta, cache_size=256):
+        return cls(meta['id'], meta['name'], TimetableStore(os.path.join(directory, 'saved_timetables')),
+                   ResultCache(os.path.join(directory, 'generation_cache'), cache_size),
+                   JournalStore(os.path.join(directory, 'edit_journals')), directory, meta['join_code'])
+
+    @property
+    def lane(self):
+        return f'workspace-{self.id}'
+
+    def data_path(self):
+        return os.path.join(self.directory, 'data.json')
+
+    def load_data(self):
+        """The shared session data; re-read only when the file changed (possibly in another process)"""
+        with self.lock:
+            return json.loads(json.dumps(self.read_data()))
+
+    def read_data(self):
+        try:
+            stat = os.stat(self.data_path())
+        except OSError:
+            return self.data
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self.data_stamp:
+            try:
+                with open(self.data_path(), 'r', encoding='utf-8') as f:
+                    self.data = json.load(f)
+                self.data_stamp = stamp
+            except (OSError, ValueError):
+                pass
+        return self.data
+
+    def save_data(self, changed, removed=()):
+        """
+        Write the keys a request changed or removed into the latest shared data. Requests
+        touching different keys (say teachers and the week) both keep their change; for
+        the same key the last request wins.
+        """
+        with self.lock:
+            data = dict(self.read_data())
+            data.update(changed)
+            for key in removed:
+                data.pop(key, None)
+            tmp_path = f'{self.data_path()}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.data_path())
+            self.data = data
+            stat = os.stat(self.data_path())
+            self.data_stamp = (stat.st_mtime_ns, stat.st_size)
+
+
+class WorkspaceRegistry:
+    """All workspaces of the deployment, one directory each, kept open in memory once used"""
+    def __init__(self, directory, cache_size=256):
+        self.directory = directory
+        self.cache_size = cache_size
+        self.workspaces = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def meta_path(self, workspace_id):
+        return os.path.join(self.directory, workspace_id, 'workspace.json')
+
+    def get(self, workspace_id):
+        """The workspace with this id, or None"""
+        if not isinstance(workspace_id, str) or not WORKSPACE_ID.match(workspace_id):
+            return None
+        with self.lock:
+            if workspace_id not in self.workspaces:
+                try:
+                    with open(self.meta_path(workspace_id), 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                except (OSError, ValueError):
+                    return None
+                self.workspaces[workspace_id] = Workspace.open(os.path.join(self.directory, workspace_id), meta,
+                                                               self.cache_size)
+            return self.workspaces[workspace_id]
+
+    def find(self, join_code):
+        """The workspace a join code belongs to, or None"""
+        join_code = (join_code or '').strip()
+        if not join_code:
+            return None
+        for workspace_id in os.listdir(self.directory):
+            workspace = self.get(workspace_id)
+            if workspace and secrets.compare_digest(workspace.join_code, join_code):
+                return workspace
+        return None
+
+    def create(self, name, data):
+        """Create a workspace seeded with shared session ``data``"""
+        workspace_id = uuid.uuid4().hex[:12]
+        meta = {'id': workspace_id, 'name': name, 'join_code': secrets.token_urlsafe(9),
+                'created_at': int(time.time())}
+        os.makedirs(os.path.join(self.directory, workspace_id))
+        with open(self.meta_path(workspace_id), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        workspace = self.get(workspace_id)
+        workspace.save_data(dict(data, store_id=workspace_id))
+        return workspace
+
+
+def enter_workspace(session, workspace):
+    """Switch a session to a workspace's data, putting the browser's own data aside until it leaves"""
+    session['personal'] = {key: session.pop(key) for key in SHARED_KEYS if key in session}
+    session.pop('collab_room', None)
+    session.pop('content_versions', None)
+    session['workspace'] = workspace.id
+
+
+def leave_workspace(session):
+    """Switch a session back to the browser's own data"""
+    for key in SHARED_KEYS:
+        session.pop(key, None)
+    session.pop('workspace', None)
+    session.pop('collab_room', None)
+    session.pop('content_versions', None)
+    session.update(session.pop('personal', {}))
+
+
+class WorkspaceSessionInterface(SecureCookieSessionInterface):
+    """
+    Signed-cookie sessions whose shared keys are stored in the workspace when the browser
+    joined one. Views keep using ``session`` as before; only where the data lives changes.
+    """
+    def __init__(self, registry):
+        self.registry = registry
+
+    def open_session(self, app, request):
+        session = super().open_session(app, request)
+        if session is None:
+            return None
+        session.workspace_id = None
+        session.loaded = {}  # Shared key -> JSON it was loaded as, to write back only what changed
+        workspace_id = session.get('workspace')
+        workspace = self.registry.get(workspace_id)
+        if workspace:
+            data = workspace.load_data()
+            session.update(data)
+            session.modified = False
+            session.workspace_id = workspace.id
+            session.loaded = {key: json.dumps(value, sort_keys=True) for key, value in data.items()}
+        elif workspace_id:
+            # The workspace was removed from the server
+            leave_workspace(session)
+        return session
+
+    def save_session(self, app, session, response):
+        workspace_id = session.get('workspace')
+        if not workspace_id:
+            return super().save_session(app, session, response)
+
+        # A session that just entered or switched workspaces has nothing of this workspace to write
+        if session.modified and session.workspace_id == workspace_id:
+            current = {key: json.dumps(session[key], sort_keys=True) for key in SHARED_KEYS if key in session}
+            changed = {key: session[key] for key, dumped in current.items() if session.loaded.get(key) != dumped}
+            removed = [key for key in session.loaded if key not in current]
+            if changed or removed:
+                self.registry.get(workspace_id).save_data(changed, removed)
+
+        browser = self.session_class({key: value for key, value in session.items() if key not in SHARED_KEYS})
+        browser.modified = session.modified
+        browser.accessed = session.accessed
+        return super().save_session(app, browser, response)